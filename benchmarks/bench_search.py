@@ -0,0 +1,220 @@
+"""Performance benchmarks for the search engine and its building blocks.
+
+Sweeps beam width, branching factor and depth over ``nmlr_search`` driven by
+synthetic expand functions and scorers with injected latency, plus
+micro-benchmarks of ``Candidate.extend``, ``blended_scorer`` (scalar and
+vectorized) and the
+verifiers. For each case it reports wall-clock, LLM-equivalent calls, peak
+traced memory and per-phase time, and writes everything to JSON.
+
+    python benchmarks/bench_search.py --out runs/bench.json
+    python benchmarks/bench_search.py --compare runs/bench.json --threshold 0.10
+
+With ``--compare`` the run exits non-zero if any case got slower (wall-clock)
+or hungrier (peak memory) than the baseline file by more than ``--threshold``.
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from nmlr.candidate import Candidate
+from nmlr.scoring import blended_scorer
+from nmlr.search import async_nmlr_search, nmlr_search
+from nmlr.vectorized import Blend, LengthPenalty
+from nmlr.verifier import NoContradiction, NonEmptyAnswer, Verifier
+
+class PhaseTimer:
+    def __init__(self):
+        self.seconds = {"expand": 0.0, "verify": 0.0, "score": 0.0}
+        self.calls = {"expand": 0, "score": 0}
+        # The async engine runs expand and score calls in worker threads.
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, dt: float, calls: int = 0) -> None:
+        with self._lock:
+            self.seconds[phase] += dt
+            if phase in self.calls:
+                self.calls[phase] += calls
+
+class TimedVerifier(Verifier):
+    def __init__(self, inner: Verifier, timer: PhaseTimer):
+        self.inner = inner
+        self.timer = timer
+
+    def check(self, candidate) -> bool:
+        return self.check_many([candidate])[0]
+
+    def check_many(self, candidates):
+        t0 = time.perf_counter()
+        out = self.inner.check_many(candidates)
+        self.timer.add("verify", time.perf_counter() - t0)
+        return out
+
+def stable_hash(state: str) -> int:
+    # Unlike hash(), the same in every process, so runs are comparable.
+    return int.from_bytes(hashlib.blake2b(state.encode("utf-8"), digest_size=8).digest(), "big")
+
+def synthetic_expand(branching: int, latency: float, timer: PhaseTimer):
+    def expand_fn(state: str):
+        t0 = time.perf_counter()
+        if latency:
+            time.sleep(latency)
+        h = stable_hash(state)
+        out = [(f"{state[-24:]}|{(h >> (4 * j)) & 0xFFFF:x}", 0.01 * j) for j in range(branching)]
+        timer.add("expand", time.perf_counter() - t0, 1)
+        return out
+    return expand_fn
+
+def synthetic_scorer(latency: float, timer: PhaseTimer):
+    def llm_eval(task: str, state: str):
+        if latency:
+            time.sleep(latency)
+        return (stable_hash(state) % 1000) / 1000.0, "synthetic"
+
+    def scorer(task: str, state: str):
+        t0 = time.perf_counter()
+        out = blended_scorer(task, state, llm_eval)
+        timer.add("score", time.perf_counter() - t0, 1)
+        return out
+    return scorer
+
+def measure(fn) -> dict:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    wall = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"wall_s": wall, "peak_kb": peak / 1024, "out": out}
+
+def fastest(fn, repeat: int) -> dict:
+    # Keep the quickest of ``repeat`` runs; the slower ones are mostly noise.
+    return min((fn() for _ in range(max(1, repeat))), key=lambda row: row["wall_s"])
+
+def bench_search(beam: int, branching: int, depth: int, latency: float, engine: str) -> dict:
+    timer = PhaseTimer()
+    expand_fn = synthetic_expand(branching, latency, timer)
+    scorer = synthetic_scorer(latency, timer)
+    verifiers = [TimedVerifier(NonEmptyAnswer(), timer), TimedVerifier(NoContradiction(), timer)]
+
+    def run():
+        if engine == "async":
+            return asyncio.run(async_nmlr_search(Candidate("root"), "task", expand_fn, verifiers, scorer,
+                                                 max_steps=depth, beam_size=beam, concurrency=64))
+        return nmlr_search(Candidate("root"), "task", expand_fn, verifiers, scorer,
+                           max_steps=depth, beam_size=beam)
+
+    m = measure(run)
+    return {
+        "name": f"search/{engine}/b{beam}_k{branching}_d{depth}",
+        "wall_s": m["wall_s"],
+        "peak_kb": m["peak_kb"],
+        "llm_calls": timer.calls["expand"] + timer.calls["score"],
+        "phases_s": timer.seconds,
+        "results": len(m["out"]),
+    }
+
+def bench_micro(n: int, repeat: int = 1) -> list:
+    rows = []
+
+    def extend_chain():
+        node = Candidate("root")
+        for i in range(n):
+            node = node.extend(f"s{i}", 0.0)
+        return node
+
+    states = [f"candidate answer number {i}" + (" contradiction" if i % 7 == 0 else "") for i in range(n)]
+    cands = [Candidate(s) for s in states]
+    cases = {
+        "micro/candidate_extend": extend_chain,
+        "micro/blended_scorer": lambda: [blended_scorer("t", s, lambda t, c: (0.5, "")) for s in states],
+        "micro/blend_vectorized": lambda: Blend([lambda t, xs: np.full(len(xs), 0.5), LengthPenalty()],
+                                                [0.9, 0.1])("t", states),
+        "micro/verifiers_check": lambda: [NoContradiction().check(c) for c in cands],
+        "micro/verifiers_check_many": lambda: NoContradiction().check_many(cands),
+    }
+    for name, fn in cases.items():
+        m = fastest(lambda: measure(fn), repeat)
+        rows.append({"name": f"{name}_{n}", "wall_s": m["wall_s"], "peak_kb": m["peak_kb"],
+                     "llm_calls": 0, "phases_s": {}})
+    return rows
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def compare(current: list, baseline_path: str, threshold: float) -> list:
+    with open(baseline_path) as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for row in current:
+        base = baseline.get(row["name"])
+        if base is None:
+            continue
+        for metric in ("wall_s", "peak_kb"):
+            # Ignore noise on cases too small to time reliably.
+            if base[metric] <= (1e-3 if metric == "wall_s" else 1.0):
+                continue
+            change = row[metric] / base[metric] - 1.0
+            if change > threshold:
+                regressions.append(f"{row['name']} {metric}: {base[metric]:.4g} -> {row[metric]:.4g} (+{change:.0%})")
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--beams", type=int, nargs="+", default=[4, 16, 64])
+    ap.add_argument("--branching", type=int, nargs="+", default=[3, 6])
+    ap.add_argument("--depths", type=int, nargs="+", default=[4, 8])
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds injected into every expand/score call")
+    ap.add_argument("--engines", nargs="+", choices=["sync", "async"], default=["sync"])
+    ap.add_argument("--micro-n", type=int, default=10000)
+    ap.add_argument("--repeat", type=int, default=3, help="runs per case; the fastest is reported")
+    ap.add_argument("--out", type=str, default=os.path.join("runs", "bench.json"))
+    ap.add_argument("--compare", type=str, default=None, help="baseline JSON from an earlier run")
+    ap.add_argument("--threshold", type=float, default=0.10, help="allowed relative regression")
+    args = ap.parse_args()
+
+    results = []
+    for engine, beam, branching, depth in itertools.product(args.engines, args.beams, args.branching, args.depths):
+        row = fastest(lambda: bench_search(beam, branching, depth, args.latency, engine), args.repeat)
+        results.append(row)
+        phases = " ".join(f"{k}={v * 1000:.1f}ms" for k, v in row["phases_s"].items())
+        print(f"{row['name']:<34} {row['wall_s'] * 1000:9.1f} ms {row['peak_kb']:9.1f} KiB "
+              f"{row['llm_calls']:6d} calls  {phases}")
+    for row in bench_micro(args.micro_n, args.repeat):
+        results.append(row)
+        print(f"{row['name']:<34} {row['wall_s'] * 1000:9.1f} ms {row['peak_kb']:9.1f} KiB")
+
+    regressions = compare(results, args.compare, args.threshold) if args.compare else []
+
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    meta = {"commit": git_commit(), "python": platform.python_version(), "latency": args.latency,
+            "repeat": args.repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    with open(args.out, "w") as w:
+        json.dump({"meta": meta, "results": results}, w, indent=2)
+    print(f"Wrote {args.out}")
+
+    if regressions:
+        print("Regressions over threshold:")
+        for r in regressions:
+            print(f"  {r}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Memory comparison: copied-history candidates vs parent-pointer candidates.
+
+Runs a synthetic 20-step, beam-64 search (3 children per node, no LLM) and
+reports the tracemalloc peak and the memory still held by the results.
+
+    python benchmarks/candidate_memory.py --steps 20 --beam 64
+"""
+import argparse
+import gc
+import tracemalloc
+
+from nmlr.candidate import Candidate
+
+class ListHistoryCandidate:
+    # The pre-__slots__ implementation, kept here as the comparison baseline.
+    def __init__(self, state, score=0.0, history=None):
+        self.state = state
+        self.score = score
+        self.history = history or []
+
+    def extend(self, new_state, delta_score):
+        return ListHistoryCandidate(
+            state=new_state,
+            score=self.score + delta_score,
+            history=self.history + [self.state],
+        )
+
+def synthetic_search(cls, steps: int, beam: int, branching: int):
+    frontier = [cls("root")]
+    results = []
+    for step in range(steps):
+        children = []
+        for i, cand in enumerate(frontier):
+            for j in range(branching):
+                child = cand.extend(f"s{step}-{i}-{j}", 0.0)
+                child.score = ((i * 31 + j * 17 + step) % 97) / 97.0
+                children.append(child)
+        children.sort(key=lambda c: c.score)
+        frontier = children[:beam]
+        results.extend(frontier)
+    return results
+
+def measure(cls, steps: int, beam: int, branching: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    results = synthetic_search(cls, steps, beam, branching)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(results[-1].history) == steps
+    return {"retained_kb": retained / 1024, "peak_kb": peak / 1024, "results": len(results)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--steps", type=int, default=20)
+    ap.add_argument("--beam", type=int, default=64)
+    ap.add_argument("--branching", type=int, default=3)
+    args = ap.parse_args()
+
+    old = measure(ListHistoryCandidate, args.steps, args.beam, args.branching)
+    new = measure(Candidate, args.steps, args.beam, args.branching)
+    print(f"{'':<22}{'retained KiB':>14}{'peak KiB':>12}")
+    print(f"{'list history':<22}{old['retained_kb']:>14.1f}{old['peak_kb']:>12.1f}")
+    print(f"{'parent pointer':<22}{new['retained_kb']:>14.1f}{new['peak_kb']:>12.1f}")
+    print(f"retained ratio: {old['retained_kb'] / new['retained_kb']:.1f}x, "
+          f"peak ratio: {old['peak_kb'] / new['peak_kb']:.1f}x")
+
+if __name__ == "__main__":
+    main()
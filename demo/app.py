@@ -1,9 +1,11 @@
 import gradio as gr
 from nmlr.candidate import Candidate
-from nmlr.search import nmlr_search
+from nmlr.search import iter_nmlr_search
 from nmlr.verifier import NonEmptyAnswer, NoContradiction
-from nmlr.scoring import LLMEvaluator, blended_scorer
+from nmlr.scoring import LLMEvaluator, BlendedScorer
 from nmlr.llm_adapters import get_llm
+from nmlr.streaming import stop_after_lines
+from nmlr.transposition import memoize_expand
 import random
 
 def expand_fn_factory(llm):
@@ -14,24 +16,34 @@ def expand_fn_factory(llm):
             "without preamble. Keep each under 20 words. Current guess:\n"
             f"{base}"
         )
-        resp = llm.complete(prompt, system="Generate alternatives only. No explanations.")
+        resp = llm.complete_until(prompt, system="Generate alternatives only. No explanations.",
+                                  stop=stop_after_lines(3))
         lines = [ln.strip("- ").strip() for ln in resp.text.strip().splitlines() if ln.strip()]
         return [(ln, 0.0) for ln in lines[:3]] or [("No Answer", -1.0)]
     return expand_fn
 
+def cached_expand_fn(provider, model):
+    # One memo per search request: states repeat within a search, and a
+    # fresh memo keeps expansions from leaking across tasks and requests.
+    return memoize_expand(expand_fn_factory(get_llm(provider=provider, model=model)))
+
 def run_nmlr(task, beam, steps, provider, model):
     try:
-        llm_gen = get_llm(provider=provider, model=model)
-        expand_fn = expand_fn_factory(llm_gen)
+        expand_fn = cached_expand_fn(provider, model)
         verifiers = [NonEmptyAnswer(), NoContradiction()]
         llm_eval = LLMEvaluator(provider=provider, model=model)
-        scorer = lambda t, s: blended_scorer(t, s, llm_eval)
+        scorer = BlendedScorer(llm_eval)
         initial = Candidate(state="")
-        results = nmlr_search(initial, task, expand_fn, verifiers, scorer, max_steps=steps, beam_size=beam)
-        top10 = results[:10]
-        return "\n".join([f"{c.state}: {c.score:.3f}" for c in top10])
+        seen = []
+        for layer in iter_nmlr_search(initial, task, expand_fn, verifiers, scorer,
+                                      max_steps=int(steps), beam_size=int(beam),
+                                      transpositions=True):
+            seen.extend(layer.frontier)
+            top10 = seen[:10]
+            yield (f"Layer {layer.step + 1}/{int(steps)} - best: {layer.best.state} ({layer.best.score:.3f})\n\n"
+                   + "\n".join([f"{c.state}: {c.score:.3f}" for c in top10]))
     except Exception as e:
-        return f"Error: {str(e)}"
+        yield f"Error: {str(e)}"
 
 iface = gr.Interface(
     fn=run_nmlr,
@@ -1,26 +1,29 @@
-import json, os, statistics, argparse
-from collections import Counter
-from tqdm import tqdm
+import os, argparse
+from functools import partial
+from nmlr.consistency import self_consistency
 from nmlr.llm_adapters import get_llm
+from runner import add_runner_args, load_examples, run_dataset
 
-def ask_cot(llm, prompt: str) -> str:
-    sys = "Reason step-by-step. Then provide a final answer after the word 'Answer:'."
-    resp = llm.complete(prompt, system=sys).text
+SYSTEM = "Reason step-by-step. Then provide a final answer after the word 'Answer:'."
+
+def extract_answer(resp: str) -> str:
     return resp.split("Answer:")[-1].strip() if "Answer:" in resp else resp.strip()
 
 def normalize(x: str) -> str:
     return (x or "").strip().lower()
 
-def self_consistency_answers(llm, prompt: str, k: int):
-    outs = [ask_cot(llm, prompt) for _ in range(k)]
-    # choose modal (normalized) answer; break ties by shortest
-    norm = [normalize(o) for o in outs]
-    counts = Counter(norm)
-    best_norm, _ = counts.most_common(1)[0]
-    # pick a representative original string with that normalized form (prefer shortest)
-    candidates = [o for o in outs if normalize(o) == best_norm]
-    rep = min(candidates, key=len)
-    return rep, outs
+def self_consistency_answers(llm, prompt: str, k: int, confidence: float = None, min_samples: int = 1):
+    # Modal normalized answer, ties to the first seen, shortest representative.
+    # Samples are requested in waves (one n-choice request where supported)
+    # and stop once the remaining ones cannot change the vote.
+    def draw(n):
+        return [extract_answer(r.text) for r in llm.sample(prompt, system=SYSTEM, n=n)]
+    return self_consistency(draw, k, normalize=normalize, confidence=confidence, min_samples=min_samples)
+
+def solve_example(ex: dict, provider: str, model: str, k: int, confidence: float = None, min_samples: int = 1) -> dict:
+    llm = get_llm(provider=provider, model=model)
+    pred, outs = self_consistency_answers(llm, ex["prompt"], k, confidence=confidence, min_samples=min_samples)
+    return {"id": ex["id"], "pred": pred, "gold": ex["gold"], "all": outs}
 
 def main():
     ap = argparse.ArgumentParser()
@@ -28,38 +31,36 @@ def main():
     ap.add_argument("--provider", type=str, default=None)
     ap.add_argument("--model", type=str, default=None)
     ap.add_argument("--runs-dir", type=str, default="runs")
+    ap.add_argument("--confidence", type=float, default=None, help="also stop once the leading answer has this share of the samples")
+    ap.add_argument("--min-samples", type=int, default=1, help="samples to draw before --confidence can stop")
+    add_runner_args(ap)
     args = ap.parse_args()
 
-    llm = get_llm(provider=args.provider, model=args.model)
     base = os.path.dirname(__file__)
     data = os.path.join(base, "data.jsonl")
 
     os.makedirs(args.runs_dir, exist_ok=True)
     import time, json as _json
     stamp = time.strftime("%Y%m%d-%H%M%S")
-    out_dir = os.path.join(args.runs_dir, f"cot_sc_k{args.k}_{stamp}")
+    out_dir = args.run_dir or os.path.join(args.runs_dir, f"cot_sc_k{args.k}_{stamp}")
     os.makedirs(out_dir, exist_ok=True)
 
-    rows = []
-    with open(data) as f:
-        for line in tqdm(f):
-            ex = json.loads(line)
-            pred, outs = self_consistency_answers(llm, ex["prompt"], args.k)
-            rows.append({"id": ex["id"], "pred": pred, "gold": ex["gold"], "all": outs})
-
-    outp = os.path.join(out_dir, "baseline_sc_results.jsonl")
-    with open(outp, "w") as w:
-        for r in rows: w.write(json.dumps(r) + "\n")
-
     cfg = {
         "method": "cot_self_consistency",
         "k": args.k,
         "provider": args.provider,
         "model": args.model,
+        "confidence": args.confidence,
+        "min_samples": args.min_samples,
     }
     with open(os.path.join(out_dir, "config.json"), "w") as w:
         _json.dump(cfg, w, indent=2)
 
+    outp = os.path.join(out_dir, "baseline_sc_results.jsonl")
+    solve = partial(solve_example, provider=args.provider, model=args.model, k=args.k,
+                    confidence=args.confidence, min_samples=args.min_samples)
+    run_dataset(load_examples(data), solve, outp, workers=args.workers, executor=args.executor)
+
     print(f"Wrote {outp}")
 
 if __name__ == "__main__":
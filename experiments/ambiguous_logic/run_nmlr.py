@@ -1,10 +1,19 @@
-import json, os, argparse, time
-from tqdm import tqdm
+import os, argparse, time
+from functools import lru_cache, partial
 from nmlr.candidate import Candidate
 from nmlr.search import nmlr_search
+from nmlr.best_first import best_first_search
 from nmlr.verifier import NonEmptyAnswer, NoContradiction, Verifier
-from nmlr.scoring import LLMEvaluator, blended_scorer
+from nmlr.scoring import LLMEvaluator, BlendedScorer, heuristic_len_penalty
+from nmlr.cascade import CascadeScorer, CascadeStage, state_scorer
 from nmlr.llm_adapters import get_llm
+from nmlr.cache import ResponseCache, CachedLLM
+from nmlr.budget import Budget
+from nmlr.dedup import Deduplicator
+from nmlr.streaming import stop_after_lines
+from nmlr.lockstep import SearchJob, run_lockstep
+from nmlr.batching import BatchingLLM, OpenAIBatchSubmitter
+from runner import add_runner_args, load_examples, run_dataset
 import random
 
 def expand_fn_factory(llm, seed=None):
@@ -16,7 +25,8 @@ def expand_fn_factory(llm, seed=None):
             "without preamble. Keep each under 20 words. Current guess:\n"
             f"{base}"
         )
-        resp = llm.complete(prompt, system="Generate alternatives only. No explanations.")
+        resp = llm.complete_until(prompt, system="Generate alternatives only. No explanations.",
+                                  stop=stop_after_lines(3))
         lines = [ln.strip("- ").strip() for ln in resp.text.strip().splitlines() if ln.strip()]
         rng.shuffle(lines)
         return [(ln, 0.0) for ln in lines[:3]] or [("No Answer", -1.0)]
@@ -26,21 +36,78 @@ class AlwaysTrue(Verifier):
     def check(self, candidate) -> bool:
         return True
 
-def solve_one(task: str, beam: int, steps: int, provider: str, model: str, use_verifiers: bool, seed: int):
-    llm_gen = get_llm(provider=provider, model=model)
+def make_search(task: str, beam: int, steps: int, provider: str, model: str, use_verifiers: bool, seed: int,
+                cache: ResponseCache = None, score_threshold: float = None, patience: int = None,
+                max_calls: int = None, max_tokens: int = None, max_usd: float = None,
+                dedup: float = None, score_mode: str = "json", transpositions: bool = False,
+                cascade_keep: float = None, cheap_model: str = None, llm=None) -> SearchJob:
+    llm_gen = llm or get_llm(provider=provider, model=model)
+    if cache is not None:
+        llm_gen = CachedLLM(llm_gen, cache)
     expand_fn = expand_fn_factory(llm_gen, seed=seed)
 
     verifiers = [NonEmptyAnswer(), NoContradiction()] if use_verifiers else [AlwaysTrue()]
 
-    llm_eval = LLMEvaluator(provider=provider, model=model)
-    def scorer(task_txt, cand_state):
-        return blended_scorer(task_txt, cand_state, llm_eval)
+    llm_eval = LLMEvaluator(provider=provider, model=model, cache=cache, mode=score_mode, llm=llm)
+    scorer = BlendedScorer(llm_eval)
+    if cascade_keep is not None:
+        # Length heuristic, then the cheap model (if any), then the judge.
+        stages = [CascadeStage(state_scorer(heuristic_len_penalty), keep=cascade_keep)]
+        if cheap_model:
+            cheap = LLMEvaluator(provider=provider, model=cheap_model, cache=cache, mode=score_mode)
+            stages.append(CascadeStage(cheap, keep=cascade_keep, name=cheap_model))
+        scorer = CascadeScorer(stages + [CascadeStage(scorer, name="judge")])
 
-    initial = Candidate(state="")
-    results = nmlr_search(initial, task, expand_fn, verifiers, scorer,
-                          max_steps=steps, beam_size=beam)
+    budget = None
+    if max_calls is not None or max_tokens is not None or max_usd is not None:
+        budget = Budget(max_calls=max_calls, max_tokens=max_tokens, max_usd=max_usd)
+    options = dict(max_steps=steps, beam_size=beam, score_threshold=score_threshold, patience=patience,
+                   budget=budget, dedup=Deduplicator(threshold=dedup) if dedup is not None else None,
+                   transpositions=transpositions)
+    return SearchJob(Candidate(state=""), task, expand_fn, verifiers, scorer, options=options)
+
+def solve_one(task: str, engine: str = "beam", max_expansions: int = None, **kwargs) -> str:
+    job = make_search(task, **kwargs)
+    o = job.options
+    if engine == "best-first":
+        # Same node allowance as a full beam run unless capped explicitly.
+        results = best_first_search(job.initial, task, job.expand_fn, job.verifiers, job.scorer,
+                                    max_expansions=max_expansions or 1 + o["beam_size"] * (o["max_steps"] - 1),
+                                    max_depth=o["max_steps"], score_threshold=o["score_threshold"],
+                                    budget=o["budget"], dedup=o["dedup"], transpositions=o["transpositions"])
+    else:
+        results = nmlr_search(job.initial, task, job.expand_fn, job.verifiers, job.scorer, **o)
     return results[0].state if results else ""
 
+@lru_cache(maxsize=None)
+def open_cache(path: str, max_age: float = None) -> ResponseCache:
+    # One connection per process; the SQLite store itself is shared.
+    return ResponseCache(path, max_age=max_age)
+
+def solve_example(ex: dict, cache_path: str = None, cache_max_age: float = None, **kwargs) -> dict:
+    cache = open_cache(cache_path, cache_max_age) if cache_path else None
+    pred = solve_one(ex["prompt"], cache=cache, **kwargs)
+    return {"id": ex["id"], "pred": pred, "gold": ex["gold"]}
+
+def solve_lockstep(examples: list, record, window: int = None, batch_api: bool = False,
+                   batch_base_url: str = None, cache_path: str = None, cache_max_age: float = None,
+                   **kwargs) -> None:
+    # One wave per layer across all examples; with batch_api each wave's
+    # completions go out as Batch API jobs instead of separate requests.
+    cache = open_cache(cache_path, cache_max_age) if cache_path else None
+    llm = None
+    if batch_api:
+        # Requests the batch has no response for are sent directly instead.
+        llm = BatchingLLM(OpenAIBatchSubmitter(model=kwargs.get("model"), base_url=batch_base_url),
+                          fallback=get_llm(provider=kwargs.get("provider"), model=kwargs.get("model")))
+    jobs = [make_search(ex["prompt"], cache=cache, llm=llm, **kwargs) for ex in examples]
+
+    def done(i, results):
+        ex = examples[i]
+        record({"id": ex["id"], "pred": results[0].state if results else "", "gold": ex["gold"]})
+
+    run_lockstep(jobs, window=window, on_done=done)
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--beam", type=int, default=6)
@@ -50,6 +117,25 @@ def main():
     ap.add_argument("--model", type=str, default=None)
     ap.add_argument("--seed", type=int, default=42)
     ap.add_argument("--runs-dir", type=str, default="runs")
+    ap.add_argument("--cache", type=str, default=None, help="SQLite file for caching scores and expansions across runs")
+    ap.add_argument("--cache-max-age", type=float, default=None, help="ignore cached entries older than this many seconds")
+    ap.add_argument("--score-threshold", type=float, default=None, help="stop once a candidate scores at least this much")
+    ap.add_argument("--patience", type=int, default=None, help="stop after this many layers without a new best score")
+    ap.add_argument("--max-calls", type=int, default=None, help="per-example cap on LLM calls")
+    ap.add_argument("--max-tokens", type=int, default=None, help="per-example cap on LLM tokens")
+    ap.add_argument("--max-usd", type=float, default=None, help="per-example cap on estimated LLM cost")
+    ap.add_argument("--dedup", type=float, default=None, help="drop near-duplicate children at this MinHash similarity (1.0 = exact only)")
+    ap.add_argument("--score-mode", choices=["json", "logprob"], default="json", help="logprob: one-token 0-9 scores from logprobs (OpenAI-compatible providers)")
+    ap.add_argument("--transpositions", action="store_true", help="score and expand each distinct state once per search")
+    ap.add_argument("--engine", choices=["beam", "best-first"], default="beam", help="best-first: expand the highest-scoring open candidate next")
+    ap.add_argument("--max-expansions", type=int, default=None, help="best-first: cap on node expansions (default: as many as a full beam run)")
+    ap.add_argument("--cascade-keep", type=float, default=None, help="score through a cascade keeping this fraction per stage (length heuristic, --cheap-model, judge)")
+    ap.add_argument("--cheap-model", type=str, default=None, help="cascade: cheaper model scoring the heuristic's survivors before the judge")
+    ap.add_argument("--lockstep", action="store_true", help="advance all examples' beam searches layer by layer together")
+    ap.add_argument("--window", type=int, default=None, help="lockstep: searches open at once (default: all)")
+    ap.add_argument("--batch-api", action="store_true", help="lockstep: send each wave's completions as OpenAI Batch API jobs")
+    ap.add_argument("--batch-base-url", type=str, default=None, help="batch API server (default: OpenAI), e.g. a local stand-in")
+    add_runner_args(ap)
     args = ap.parse_args()
 
     random.seed(args.seed)
@@ -60,28 +146,9 @@ def main():
     os.makedirs(args.runs_dir, exist_ok=True)
     stamp = time.strftime("%Y%m%d-%H%M%S")
     tag = f"nmlr_b{args.beam}_s{args.steps}_{'nov' if args.no_verifiers else 'ver'}_{stamp}"
-    out_dir = os.path.join(args.runs_dir, tag)
+    out_dir = args.run_dir or os.path.join(args.runs_dir, tag)
     os.makedirs(out_dir, exist_ok=True)
 
-    rows = []
-    with open(inp) as f:
-        for line in tqdm(f):
-            ex = json.loads(line)
-            pred = solve_one(
-                ex["prompt"],
-                beam=args.beam,
-                steps=args.steps,
-                provider=args.provider,
-                model=args.model,
-                use_verifiers=not args.no_verifiers,
-                seed=args.seed
-            )
-            rows.append({"id": ex["id"], "pred": pred, "gold": ex["gold"]})
-
-    outp = os.path.join(out_dir, "nmlr_results.jsonl")
-    with open(outp, "w") as w:
-        for r in rows: w.write(json.dumps(r) + "\n")
-
     import json as _json
     cfg = {
         "method": "nmlr",
@@ -90,12 +157,62 @@ def main():
         "use_verifiers": (not args.no_verifiers),
         "provider": args.provider,
         "model": args.model,
-        "seed": args.seed
+        "seed": args.seed,
+        "score_threshold": args.score_threshold,
+        "patience": args.patience,
+        "max_calls": args.max_calls,
+        "max_tokens": args.max_tokens,
+        "max_usd": args.max_usd,
+        "dedup": args.dedup,
+        "score_mode": args.score_mode,
+        "transpositions": args.transpositions,
+        "engine": args.engine,
+        "max_expansions": args.max_expansions,
+        "cascade_keep": args.cascade_keep,
+        "cheap_model": args.cheap_model,
+        "lockstep": args.lockstep,
+        "window": args.window,
+        "batch_api": args.batch_api
     }
     with open(os.path.join(out_dir, "config.json"), "w") as w:
         _json.dump(cfg, w, indent=2)
 
+    # Every example gets the same seed, so results do not depend on the order
+    # (or the worker) in which examples are solved.
+    common = dict(
+        cache_path=args.cache,
+        cache_max_age=args.cache_max_age,
+        beam=args.beam,
+        steps=args.steps,
+        provider=args.provider,
+        model=args.model,
+        use_verifiers=not args.no_verifiers,
+        seed=args.seed,
+        score_threshold=args.score_threshold,
+        patience=args.patience,
+        max_calls=args.max_calls,
+        max_tokens=args.max_tokens,
+        max_usd=args.max_usd,
+        dedup=args.dedup,
+        score_mode=args.score_mode,
+        transpositions=args.transpositions,
+        cascade_keep=args.cascade_keep,
+        cheap_model=args.cheap_model
+    )
+    solve = partial(solve_example, engine=args.engine, max_expansions=args.max_expansions, **common)
+    solve_many = None
+    if args.lockstep:
+        if args.engine != "beam":
+            ap.error("--lockstep runs the beam engine only")
+        solve_many = partial(solve_lockstep, window=args.window, batch_api=args.batch_api,
+                             batch_base_url=args.batch_base_url, **common)
+    outp = os.path.join(out_dir, "nmlr_results.jsonl")
+    run_dataset(load_examples(inp), solve, outp, workers=args.workers, executor=args.executor,
+                solve_many=solve_many)
+
     print(f"Wrote {outp}")
+    if args.cache and args.executor == "thread":
+        print(f"Cache: {open_cache(args.cache, args.cache_max_age).stats()}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
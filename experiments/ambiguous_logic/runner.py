@@ -0,0 +1,95 @@
+"""Shared dataset runner for the ambiguous_logic experiment scripts.
+
+Results are appended to the output JSONL as soon as each example finishes,
+so an interrupted run loses at most the examples in flight. Rerunning with
+the same run dir skips every id already in the file. When the run completes
+the file is rewritten in dataset order, so parallel output matches serial.
+"""
+import json, os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+from tqdm import tqdm
+
+def load_examples(path: str) -> List[dict]:
+    with open(path) as f:
+        return [json.loads(ln) for ln in f if ln.strip()]
+
+def load_done(out_path: str) -> Dict[str, dict]:
+    done = {}
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path) as f:
+        for ln in f:
+            try:
+                row = json.loads(ln)
+            except json.JSONDecodeError:
+                continue  # line cut short by a crash; that example reruns
+            done[row["id"]] = row
+    return done
+
+def _rewrite(out_path: str, rows: List[dict]) -> None:
+    # Write a tmp file and swap it in, so a crash mid-write keeps the old file.
+    tmp = out_path + ".tmp"
+    with open(tmp, "w") as w:
+        for r in rows: w.write(json.dumps(r) + "\n")
+    os.replace(tmp, out_path)
+
+def run_dataset(examples: List[dict], solve: Callable[[dict], dict], out_path: str,
+                workers: int = 1, executor: str = "thread",
+                solve_many: Optional[Callable[[List[dict], Callable[[dict], None]], None]] = None) -> List[dict]:
+    """Run ``solve`` over ``examples`` and stream each row to ``out_path``.
+
+    ``solve`` takes one example and returns its result row (with ``"id"``).
+    With ``executor="process"`` it must be picklable, e.g. a module-level
+    function or a ``functools.partial`` of one. ``solve_many``, if given,
+    replaces ``solve``: it gets every example still to do and a callback to
+    pass each result row to as soon as it is ready.
+    """
+    done = load_done(out_path)
+    todo = [ex for ex in examples if ex["id"] not in done]
+    if done:
+        print(f"Resuming: {len(done)} done, {len(todo)} to go")
+
+    # Drop any truncated tail before appending.
+    _rewrite(out_path, list(done.values()))
+
+    with open(out_path, "a") as w:
+        def record(row):
+            w.write(json.dumps(row) + "\n")
+            w.flush()
+            done[row["id"]] = row
+
+        if solve_many is not None:
+            with tqdm(total=len(todo)) as bar:
+                def record_many(row):
+                    record(row)
+                    bar.update()
+                solve_many(todo, record_many)
+        elif workers <= 1:
+            for ex in tqdm(todo):
+                record(solve(ex))
+        else:
+            pool_cls = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+            pool = pool_cls(max_workers=workers)
+            futures = [pool.submit(solve, ex) for ex in todo]
+            try:
+                for fut in tqdm(as_completed(futures), total=len(futures)):
+                    record(fut.result())
+            finally:
+                # On failure, drop the queued examples instead of solving them,
+                # but keep whatever finished before the error surfaced.
+                pool.shutdown(wait=True, cancel_futures=True)
+                for fut in futures:
+                    if fut.done() and not fut.cancelled() and fut.exception() is None:
+                        row = fut.result()
+                        if row["id"] not in done:
+                            record(row)
+
+    rows = [done[ex["id"]] for ex in examples if ex["id"] in done]
+    _rewrite(out_path, rows)
+    return rows
+
+def add_runner_args(ap) -> None:
+    ap.add_argument("--run-dir", type=str, default=None, help="existing run dir to resume (default: new timestamped dir)")
+    ap.add_argument("--workers", type=int, default=1, help="examples to solve in parallel")
+    ap.add_argument("--executor", choices=["thread", "process"], default="thread")
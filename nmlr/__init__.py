@@ -1,3 +1,3 @@
 from .candidate import Candidate
-from .search import nmlr_search
-from .verifier import Verifier
+from .search import nmlr_search, async_nmlr_search, iter_nmlr_search, aiter_nmlr_search, SearchLayer
+from .verifier import Verifier, VerifierPipeline
@@ -0,0 +1,169 @@
+import atexit
+import csv
+import io
+import logging
+import os
+from multiprocessing.util import Finalize, register_after_fork
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: rely on single-write appends only.
+    fcntl = None
+
+def _default_sink() -> str:
+    return os.getenv("NMLR_TOKEN_LOG", os.path.join("runs", "token_log.csv"))
+
+class TokenAccountant:
+    """In-memory token totals per (run, provider, model), flushed to a CSV sink
+    in batches by a background thread.
+
+    ``record`` only takes a lock and appends to a list, so it is cheap on the
+    request path. Rows are written with one locked append per flush, so
+    several processes can share a sink without interleaving rows. Each row
+    is ``timestamp, provider, model, input, output, run``.
+    """
+
+    def __init__(self, sink_path: Optional[str] = None, flush_interval: float = 1.0,
+                 max_pending: int = 1000):
+        self.sink_path = sink_path or _default_sink()
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.run = os.getenv("NMLR_RUN_ID", "")
+        self._totals: Dict[Tuple[str, str, str], List[int]] = {}
+        self._pending: List[list] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._warned = False
+
+    def _after_fork(self) -> None:
+        # Rows and totals recorded before the fork belong to the parent.
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._totals = {}
+        self._pending = []
+        self._thread = None
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None and not self._closed:
+            self._thread = threading.Thread(target=self._loop, name="nmlr-token-flush", daemon=True)
+            self._thread.start()
+
+    def _loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def record(self, provider: str, model: str, usage: Optional[dict], run: Optional[str] = None) -> None:
+        usage = usage or {}
+        inp, out = usage.get("input"), usage.get("output")
+        run = self.run if run is None else run
+        with self._lock:
+            totals = self._totals.setdefault((run, provider, model), [0, 0, 0])
+            totals[0] += 1
+            totals[1] += inp or 0
+            totals[2] += out or 0
+            self._pending.append([int(time.time()), provider, model, inp, out, run])
+            full = len(self._pending) >= self.max_pending
+            self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def totals(self, provider: Optional[str] = None, model: Optional[str] = None,
+               run: Optional[str] = None) -> dict:
+        calls = inp = out = 0
+        with self._lock:
+            for (r, p, m), (c, i, o) in self._totals.items():
+                if (provider is None or p == provider) and (model is None or m == model) \
+                        and (run is None or r == run):
+                    calls += c
+                    inp += i
+                    out += o
+        return {"calls": calls, "input": inp, "output": out}
+
+    def breakdown(self) -> List[dict]:
+        with self._lock:
+            return [{"run": r, "provider": p, "model": m, "calls": c, "input": i, "output": o}
+                    for (r, p, m), (c, i, o) in self._totals.items()]
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return
+            buf = io.StringIO()
+            csv.writer(buf).writerows(rows)
+            try:
+                if os.path.dirname(self.sink_path):
+                    os.makedirs(os.path.dirname(self.sink_path), exist_ok=True)
+                with open(self.sink_path, "a", newline="") as f:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_EX)
+                    f.write(buf.getvalue())
+                    f.flush()
+            except OSError as e:
+                with self._lock:
+                    self._pending[:0] = rows
+                if not self._warned:
+                    logger.warning("token log flush to %s failed: %s", self.sink_path, e)
+                    self._warned = True
+
+    def close(self) -> None:
+        self._closed = True
+        self._wake.set()
+        self.flush()
+
+_accountant: Optional[TokenAccountant] = None
+_accountant_lock = threading.Lock()
+
+def get_accountant() -> TokenAccountant:
+    global _accountant
+    if _accountant is None:
+        with _accountant_lock:
+            if _accountant is None:
+                _accountant = TokenAccountant()
+    return _accountant
+
+def _close_current() -> None:
+    if _accountant is not None:
+        _accountant.close()
+
+def _after_fork_in_child() -> None:
+    global _accountant_lock
+    _accountant_lock = threading.Lock()
+    if _accountant is not None:
+        _accountant._after_fork()
+
+def _close_in_worker(_=None) -> None:
+    # atexit does not run in multiprocessing workers; their exit runs
+    # finalizers, which are cleared as each worker starts, hence the re-arm.
+    Finalize(None, _close_current, exitpriority=10)
+
+# Registered once, acting on whichever accountant is current at exit.
+atexit.register(_close_current)
+_close_in_worker()
+register_after_fork(_close_in_worker, _close_in_worker)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+def configure_accounting(sink_path: Optional[str] = None, flush_interval: float = 1.0,
+                         run: Optional[str] = None) -> TokenAccountant:
+    """Replace the process-wide accountant, flushing the old one first."""
+    global _accountant
+    with _accountant_lock:
+        if _accountant is not None:
+            _accountant.close()
+        _accountant = TokenAccountant(sink_path=sink_path, flush_interval=flush_interval)
+        if run is not None:
+            _accountant.run = run
+    return _accountant
@@ -0,0 +1,161 @@
+"""Pool concurrent completions into batch submissions.
+
+``BatchingLLM`` is an ``LLM`` whose ``complete`` calls, made from many
+threads at once (as ``nmlr.lockstep`` does for a whole wave of searches),
+are queued and handed to a ``submit`` function together: once ``max_batch``
+requests are waiting, or ``linger`` seconds after the first one arrived.
+``OpenAIBatchSubmitter`` sends each batch through the OpenAI Batch API
+(upload JSONL, create the batch, poll, download the output); point
+``base_url`` at any server implementing those endpoints, such as a local
+stand-in, to run it offline. A request the batch returns no response for
+(an errored or missing output line) fails on its own, or is sent directly
+to ``fallback`` when one is given; the rest of the batch still resolves.
+
+Usage is recorded in the calling thread, so budgets, token accounting and
+tracing see each request as if it had been sent on its own.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+from .llm_adapters import LLM, LLMResponse, _openai_usage, _record_usage
+from .tracing import span
+
+Request = Tuple[str, Optional[str]]  # (prompt, system)
+Submit = Callable[[List[Request]], List[Optional[LLMResponse]]]  # None: no response
+
+class BatchingLLM(LLM):
+    def __init__(self, submit: Submit, provider: str = "openai", model: Optional[str] = None,
+                 max_batch: int = 256, linger: float = 0.05, fallback: Optional[LLM] = None):
+        self.submit = submit
+        self.fallback = fallback
+        self.provider = provider
+        self.model = model or getattr(submit, "model", None)
+        self.max_batch = max_batch
+        self.linger = linger
+        self.batches = 0
+        self._queue: List[Tuple[str, Optional[str], Future]] = []
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def _take(self) -> list:
+        # Caller holds the lock.
+        batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._queue:
+            self._arm()
+        return batch
+
+    def _arm(self) -> None:
+        self._timer = threading.Timer(self.linger, self._flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush(self) -> None:
+        with self._lock:
+            self._timer = None
+            batch = self._take() if self._queue else []
+        if batch:
+            self._run(batch)
+
+    def _run(self, batch: list) -> None:
+        self.batches += 1
+        try:
+            responses = self.submit([(prompt, system) for prompt, system, _ in batch])
+            if len(responses) != len(batch):
+                raise RuntimeError(f"batch returned {len(responses)} responses for {len(batch)} requests")
+        except Exception as e:
+            for _, _, fut in batch:
+                fut.set_exception(e)
+            return
+        for (_, _, fut), resp in zip(batch, responses):
+            fut.set_result(resp)
+
+    def complete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
+        fut: Future = Future()
+        batch = None
+        with self._lock:
+            self._queue.append((prompt, system, fut))
+            if len(self._queue) >= self.max_batch:
+                batch = self._take()
+            elif self._timer is None:
+                self._arm()
+        if batch:
+            self._run(batch)
+        with span("llm", provider=self.provider, model=self.model, batched=True):
+            resp = fut.result()
+            if resp is not None:
+                _record_usage(self.provider, self.model, resp.token_usage or {})
+        if resp is None:
+            if self.fallback is None:
+                raise RuntimeError("batch returned no response for this request")
+            # Sent on its own, in this thread, so it records its own usage.
+            return self.fallback.complete(prompt, system)
+        return resp
+
+class OpenAIBatchSubmitter:
+    """Submit a list of chat requests as one OpenAI Batch API job and wait
+    for it. ``base_url`` and ``api_key_env`` select the server, as for
+    ``OpenAIClient``."""
+
+    _DONE = ("completed", "failed", "expired", "cancelled")
+
+    def __init__(self, model: Optional[str] = None, base_url: Optional[str] = None,
+                 api_key_env: Optional[str] = "OPENAI_API_KEY", poll_interval: float = 10.0,
+                 completion_window: str = "24h", endpoint: str = "/v1/chat/completions"):
+        import openai
+        api_key = "" if api_key_env is None else os.getenv(api_key_env, "")
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
+        self.model = model or os.getenv("NMLR_MODEL", "gpt-4o-mini")
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.endpoint = endpoint
+
+    def _lines(self, requests: List[Request]) -> bytes:
+        rows = []
+        for i, (prompt, system) in enumerate(requests):
+            messages = ([{"role": "system", "content": system}] if system else []) + [{"role": "user", "content": prompt}]
+            rows.append({"custom_id": f"req-{i}", "method": "POST", "url": self.endpoint,
+                         "body": {"model": self.model, "messages": messages}})
+        return "".join(json.dumps(r) + "\n" for r in rows).encode("utf-8")
+
+    def _wait(self, batch):
+        while batch.status not in self._DONE:
+            time.sleep(self.poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+        if batch.status != "completed":
+            raise RuntimeError(f"batch {batch.id} ended with status {batch.status}")
+        return batch
+
+    def _parse(self, text: str, n: int) -> List[Optional[LLMResponse]]:
+        from openai.types.chat import ChatCompletion
+        from pydantic import ValidationError
+        out: List[Optional[LLMResponse]] = [None] * n
+        for ln in text.splitlines():
+            if not ln.strip():
+                continue
+            row = json.loads(ln)
+            response = row.get("response") or {}
+            body = response.get("body")
+            if not body or row.get("error") or response.get("status_code", 200) != 200:
+                continue
+            try:
+                resp = ChatCompletion.model_validate(body)
+            except ValidationError:
+                continue
+            out[int(row["custom_id"].split("-", 1)[1])] = LLMResponse(
+                text=resp.choices[0].message.content or "", token_usage=_openai_usage(resp.usage))
+        return out
+
+    def __call__(self, requests: List[Request]) -> List[Optional[LLMResponse]]:
+        upload = self.client.files.create(file=("nmlr_batch.jsonl", self._lines(requests)), purpose="batch")
+        batch = self.client.batches.create(input_file_id=upload.id, endpoint=self.endpoint,
+                                           completion_window=self.completion_window)
+        batch = self._wait(batch)
+        if not batch.output_file_id:  # every request errored
+            return [None] * len(requests)
+        return self._parse(self.client.files.content(batch.output_file_id).text, len(requests))
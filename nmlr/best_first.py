@@ -0,0 +1,193 @@
+"""Best-first (A*-style) search over the same ``expand_fn``, verifiers and
+``scorer`` as ``nmlr_search``.
+
+Instead of expanding a whole beam layer by layer, every scored candidate goes
+into one priority queue and the most promising open candidate is expanded
+next, so a fixed expansion (or ``Budget``) allowance is spent on the best
+branches first. Priority is the candidate's score plus an optional
+``heuristic(candidate)`` term, e.g. ``lambda c: -0.05 * c.depth`` to favour
+shallow answers; ties go to the candidate scored first.
+"""
+import asyncio
+import heapq
+from typing import Callable, List, Optional, Tuple
+from .budget import Budget, metered
+from .candidate import Candidate
+from .dedup import Deduplicator
+from .search import (ExpandFn, ScorerFn, VerifierFn, _by_score, _call, _dedup, _expand_list, _workers,
+                     _pipeline, _spent, _TopK)
+from .tracing import Tracer, current_tracer, trace_span
+from .transposition import TranspositionTable
+
+Heuristic = Callable[[Candidate], float]
+
+class _Frontier:
+    """Open queue, scored results and the per-search filters shared by the
+    sync and async engines."""
+
+    def __init__(self, initial: Candidate, verifiers, heuristic: Optional[Heuristic],
+                 max_depth: Optional[int], dedup: Optional[Deduplicator], transpositions: bool,
+                 score_threshold: Optional[float], tracer: Optional[Tracer]):
+        self.pipeline = _pipeline(verifiers)
+        self.heuristic = heuristic
+        self.max_depth = max_depth
+        self.dedup = dedup
+        self.table = TranspositionTable() if transpositions else None
+        if self.table is not None:
+            self.table.add_root(initial.state)
+        self.score_threshold = score_threshold
+        self.tracer = tracer
+        self.scored: List[Candidate] = []
+        self.best: Optional[Candidate] = None
+        self._open: list = []
+        self._seq = 0
+        self._push(initial)
+
+    def _push(self, cand: Candidate) -> None:
+        if self.max_depth is not None and cand.depth >= self.max_depth:
+            return
+        priority = cand.score + (self.heuristic(cand) if self.heuristic is not None else 0.0)
+        heapq.heappush(self._open, (-priority, self._seq, cand))
+        self._seq += 1
+
+    def pop(self) -> Optional[Candidate]:
+        return heapq.heappop(self._open)[2] if self._open else None
+
+    def children(self, parent: Candidate, expanded) -> List[Tuple[Candidate, float]]:
+        children = [(parent.extend(new_state, 0.0), local_bonus) for new_state, local_bonus in expanded]
+        with trace_span(self.tracer, "verify", n=len(children)) as verify_span:
+            verdicts = self.pipeline.check_many([child for child, _ in children])
+            children = [pair for pair, ok in zip(children, verdicts) if ok]
+            verify_span.set(kept=len(children))
+        if self.table is not None:
+            children = self.table.filter(children)
+        return _dedup(self.dedup, children, self.tracer)
+
+    def add(self, child: Candidate, score: float) -> None:
+        child.score = score
+        self.scored.append(child)
+        if self.best is None or score > self.best.score:
+            self.best = child
+        self._push(child)
+
+    @property
+    def done(self) -> bool:
+        return (self.score_threshold is not None and self.best is not None
+                and self.best.score >= self.score_threshold)
+
+    def results(self, max_results: Optional[int]) -> List[Candidate]:
+        top = _TopK(len(self.scored) if max_results is None else max_results, _by_score, reverse=True)
+        for cand in self.scored:
+            top.push(cand)
+        return top.items()
+
+def best_first_search(initial: Candidate,
+                      task: str,
+                      expand_fn: ExpandFn,
+                      verifiers: List[VerifierFn],
+                      scorer: ScorerFn,
+                      max_expansions: int = 32,
+                      max_depth: Optional[int] = None,
+                      heuristic: Optional[Heuristic] = None,
+                      max_results: Optional[int] = None,
+                      score_threshold: Optional[float] = None,
+                      budget: Optional[Budget] = None,
+                      dedup: Optional[Deduplicator] = None,
+                      transpositions: bool = False,
+                      tracer: Optional[Tracer] = None) -> List[Candidate]:
+    """Expand the open candidate with the highest ``score + heuristic`` until
+    ``max_expansions`` nodes have been expanded, the queue is empty, the best
+    score reaches ``score_threshold`` or ``budget`` runs out. Candidates at
+    ``max_depth`` are scored but not expanded.
+
+    Returns every scored candidate, highest score first (ties in the order
+    scored), or only the ``max_results`` best. ``dedup``, ``transpositions``
+    and ``tracer`` work as in ``iter_nmlr_search``; each expansion is traced
+    as a "layer" span for the depth of the expanded node.
+    """
+    batch = getattr(scorer, "score_batch", None)
+    tracer = tracer or current_tracer()
+    frontier = _Frontier(initial, verifiers, heuristic, max_depth, dedup, transpositions,
+                         score_threshold, tracer)
+
+    for expansion in range(max_expansions):
+        cand = frontier.pop()
+        if cand is None or _spent(budget):
+            break
+        with trace_span(tracer, "layer", layer=cand.depth, expansion=expansion):
+            with metered(budget), trace_span(tracer, "expand"):
+                expanded = list(expand_fn(cand.state))
+            children = frontier.children(cand, expanded)
+            if batch is None:
+                for child, local_bonus in children:
+                    if _spent(budget):
+                        break
+                    with metered(budget), trace_span(tracer, "score"):
+                        s, _ = scorer(task, child.state)
+                    frontier.add(child, s + local_bonus)
+            elif children and not _spent(budget):
+                with metered(budget), trace_span(tracer, "score", n=len(children)):
+                    scores = batch(task, [child.state for child, _ in children])
+                for (child, local_bonus), (s, _) in zip(children, scores):
+                    frontier.add(child, s + local_bonus)
+        if frontier.done:
+            break
+    return frontier.results(max_results)
+
+async def async_best_first_search(initial: Candidate,
+                                  task: str,
+                                  expand_fn: ExpandFn,
+                                  verifiers: List[VerifierFn],
+                                  scorer: ScorerFn,
+                                  max_expansions: int = 32,
+                                  max_depth: Optional[int] = None,
+                                  heuristic: Optional[Heuristic] = None,
+                                  concurrency: int = 8,
+                                  max_results: Optional[int] = None,
+                                  score_threshold: Optional[float] = None,
+                                  budget: Optional[Budget] = None,
+                                  dedup: Optional[Deduplicator] = None,
+                                  transpositions: bool = False,
+                                  tracer: Optional[Tracer] = None) -> List[Candidate]:
+    """Concurrent counterpart of ``best_first_search``: expansions stay in
+    priority order, one at a time, while each expansion's children are scored
+    together with at most ``concurrency`` calls in flight. Returns the same
+    candidates as ``best_first_search`` when the budget does not run out."""
+    sem = asyncio.Semaphore(concurrency)
+    pool = _workers(concurrency)
+    tracer = tracer or current_tracer()
+
+    async def limited(phase: str, fn: Callable, *args, **attrs):
+        async with sem:
+            if _spent(budget):
+                return None
+            with metered(budget), trace_span(tracer, phase, **attrs):
+                return await _call(fn, *args, executor=pool)
+
+    abatch = getattr(scorer, "ascore_batch", None) or getattr(scorer, "score_batch", None)
+    frontier = _Frontier(initial, verifiers, heuristic, max_depth, dedup, transpositions,
+                         score_threshold, tracer)
+
+    try:
+        for expansion in range(max_expansions):
+            cand = frontier.pop()
+            if cand is None or _spent(budget):
+                break
+            with trace_span(tracer, "layer", layer=cand.depth, expansion=expansion):
+                expanded = await limited("expand", _expand_list, expand_fn, cand.state, pool)
+                children = frontier.children(cand, expanded or ())
+                if not children:
+                    scores = []
+                elif abatch is not None:
+                    scores = await limited("score", abatch, task, [child.state for child, _ in children],
+                                           n=len(children)) or []
+                else:
+                    scores = await asyncio.gather(*[limited("score", scorer, task, child.state) for child, _ in children])
+                for (child, local_bonus), scored in zip(children, scores):
+                    if scored is not None:
+                        frontier.add(child, scored[0] + local_bonus)
+            if frontier.done:
+                break
+    finally:
+        pool.shutdown(wait=False)
+    return frontier.results(max_results)
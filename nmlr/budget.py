@@ -0,0 +1,83 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+PRICES: Dict[Tuple[str, str, str], float] = {
+    # Example placeholder CPM ($ per 1K tokens) — adjust to your actual rates.
+    ("openai","gpt-4o-mini","input"): 0.150,
+    ("openai","gpt-4o-mini","output"): 0.600,
+    ("anthropic","claude-3-5-sonnet-latest","input"): 3.00,
+    ("anthropic","claude-3-5-sonnet-latest","output"): 15.00,
+}
+
+# Price of prompt-cache hits as a fraction of the input price, unless PRICES
+# has a (provider, model, "cached") entry.
+CACHED_INPUT_RATE: Dict[str, float] = {"openai": 0.5, "anthropic": 0.1, "gemini": 0.25}
+
+def estimate_cost(provider: str, model: str, usage: Optional[dict],
+                  prices: Optional[Dict[Tuple[str, str, str], float]] = None) -> float:
+    prices = PRICES if prices is None else prices
+    usage = usage or {}
+    inp = usage.get("input") or 0
+    cached = min(usage.get("cached") or 0, inp)
+    pin = prices.get((provider, model, "input"), 0.0)
+    pcached = prices.get((provider, model, "cached"), pin * CACHED_INPUT_RATE.get(provider, 1.0))
+    cin = (pin * (inp - cached) + pcached * cached) / 1000.0
+    cout = prices.get((provider, model, "output"), 0.0) * ((usage.get("output") or 0) / 1000.0)
+    return cin + cout
+
+class Budget:
+    """Caps on LLM calls, tokens and estimated dollars for one search.
+
+    A search meters every ``expand_fn`` and ``scorer`` call against its budget;
+    the adapters in ``nmlr.llm_adapters`` report each completion's
+    ``token_usage`` to whichever budgets are active in the calling context.
+    """
+
+    def __init__(self, max_calls: Optional[int] = None, max_tokens: Optional[int] = None,
+                 max_usd: Optional[float] = None,
+                 prices: Optional[Dict[Tuple[str, str, str], float]] = None):
+        self.max_calls = max_calls
+        self.max_tokens = max_tokens
+        self.max_usd = max_usd
+        self.prices = prices
+        self.calls = 0
+        self.tokens = 0
+        self.usd = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, model: str, usage: Optional[dict]) -> None:
+        usage = usage or {}
+        with self._lock:
+            self.calls += 1
+            self.tokens += (usage.get("input") or 0) + (usage.get("output") or 0)
+            self.usd += estimate_cost(provider, model, usage, self.prices)
+
+    @property
+    def exhausted(self) -> bool:
+        return ((self.max_calls is not None and self.calls >= self.max_calls)
+                or (self.max_tokens is not None and self.tokens >= self.max_tokens)
+                or (self.max_usd is not None and self.usd >= self.max_usd))
+
+    def spent(self) -> dict:
+        return {"calls": self.calls, "tokens": self.tokens, "usd": self.usd}
+
+_active: ContextVar[Tuple[Budget, ...]] = ContextVar("nmlr_active_budgets", default=())
+
+@contextmanager
+def metered(budget: Optional[Budget]) -> Iterator[None]:
+    """Charge completions made inside the block to ``budget``. Context-local,
+    so concurrent searches (threads or asyncio tasks) are metered separately."""
+    if budget is None:
+        yield
+        return
+    token = _active.set(_active.get() + (budget,))
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+def record_usage(provider: str, model: str, usage: Optional[dict]) -> None:
+    for budget in _active.get():
+        budget.record(provider, model, usage)
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .llm_adapters import LLM, LLMResponse
+
+class ResponseCache:
+    """Content-addressed cache: an in-memory LRU in front of a SQLite file.
+
+    Keys are hashes of the fields that determine an LLM output (see
+    ``make_key``). The SQLite store runs in WAL mode with a busy timeout, so
+    several processes can point at the same file. Entries older than
+    ``max_age`` seconds are ignored and purged, and the store is trimmed to
+    its newest ``max_entries`` rows.
+    """
+
+    def __init__(self, path: Optional[str] = None, memory_size: int = 1024,
+                 max_entries: int = 100_000, max_age: Optional[float] = None):
+        self.path = path or os.getenv("NMLR_CACHE_PATH", os.path.join("runs", "cache.sqlite"))
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries(created)")
+
+    @staticmethod
+    def make_key(**fields: Any) -> str:
+        blob = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _fresh(self, created: float) -> bool:
+        return self.max_age is None or time.time() - created <= self.max_age
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None and self._fresh(hit[1]):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return hit[0]
+            row = self._conn.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or not self._fresh(row[1]):
+                self.misses += 1
+                return None
+            value = json.loads(row[0])
+            self._remember(key, value, row[1])
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now),
+            )
+            self._puts += 1
+            if self._puts % 256 == 0:
+                self._evict()
+
+    def _remember(self, key: str, value: Any, created: float) -> None:
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _evict(self) -> None:
+        if self.max_age is not None:
+            self._conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.max_age,))
+        self._conn.execute(
+            "DELETE FROM entries WHERE key IN ("
+            "SELECT key FROM entries ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def evict(self) -> None:
+        with self._lock:
+            self._evict()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class CachedLLM(LLM):
+    """Wraps an ``LLM`` so identical (provider, model, system, prompt) calls are
+    served from a ``ResponseCache``. Pass ``use_cache=False`` to force a fresh
+    completion, e.g. for sampling runs."""
+
+    def __init__(self, llm: LLM, cache: ResponseCache):
+        self.llm = llm
+        self.cache = cache
+
+    @property
+    def provider(self) -> str:
+        return getattr(self.llm, "provider", type(self.llm).__name__)
+
+    @property
+    def model(self) -> Optional[str]:
+        return getattr(self.llm, "model", None)
+
+    @property
+    def supports_logprobs(self) -> bool:
+        return getattr(self.llm, "supports_logprobs", False)
+
+    def _key(self, prompt: str, system: Optional[str]) -> str:
+        return ResponseCache.make_key(kind="complete", provider=self.provider, model=self.model,
+                                      system=system, prompt=prompt)
+
+    def complete(self, prompt: str, system: Optional[str] = None, use_cache: bool = True) -> LLMResponse:
+        key = self._key(prompt, system)
+        if use_cache:
+            hit = self.cache.get(key)
+            if hit is not None:
+                return LLMResponse(text=hit["text"], token_usage=hit.get("token_usage"))
+        resp = self.llm.complete(prompt, system=system)
+        self.cache.put(key, {"text": resp.text, "token_usage": resp.token_usage})
+        return resp
+
+    def complete_until(self, prompt: str, system: Optional[str] = None, stop=None,
+                       use_cache: bool = True) -> LLMResponse:
+        # Cut-off completions are cached per stop condition; a condition
+        # without a ``key`` cannot be told apart from others, so it bypasses the cache.
+        stop_key = getattr(stop, "key", None)
+        if stop is not None and stop_key is None:
+            return self.llm.complete_until(prompt, system=system, stop=stop)
+        key = ResponseCache.make_key(kind="complete_until", provider=self.provider, model=self.model,
+                                     system=system, prompt=prompt, stop=stop_key)
+        if use_cache:
+            hit = self.cache.get(key)
+            if hit is not None:
+                return LLMResponse(text=hit["text"], token_usage=hit.get("token_usage"))
+        resp = self.llm.complete_until(prompt, system=system, stop=stop)
+        self.cache.put(key, {"text": resp.text, "token_usage": resp.token_usage})
+        return resp
+
+    def sample(self, prompt: str, system: Optional[str] = None, n: int = 1) -> List[LLMResponse]:
+        # Samples must differ, so they always go to the wrapped LLM.
+        return self.llm.sample(prompt, system=system, n=n)
+
+    async def acomplete(self, prompt: str, system: Optional[str] = None, use_cache: bool = True) -> LLMResponse:
+        key = self._key(prompt, system)
+        if use_cache:
+            hit = self.cache.get(key)
+            if hit is not None:
+                return LLMResponse(text=hit["text"], token_usage=hit.get("token_usage"))
+        resp = await self.llm.acomplete(prompt, system=system)
+        self.cache.put(key, {"text": resp.text, "token_usage": resp.token_usage})
+        return resp
+
+    # Logprob scores are cached by ``LLMEvaluator``; the calls themselves go
+    # straight to the wrapped LLM.
+    def next_token_logprobs(self, prompt: str, system: Optional[str] = None, top: int = 10) -> Dict[str, float]:
+        return self.llm.next_token_logprobs(prompt, system=system, top=top)
+
+    async def anext_token_logprobs(self, prompt: str, system: Optional[str] = None, top: int = 10) -> Dict[str, float]:
+        return await self.llm.anext_token_logprobs(prompt, system=system, top=top)
@@ -1,12 +1,31 @@
 class Candidate:
-    def __init__(self, state, score=0.0, history=None):
+    # A search-tree node: children point at their parent instead of copying
+    # its history, so each state is stored once however deep the search goes.
+    __slots__ = ("state", "score", "parent", "depth", "_root_history")
+
+    def __init__(self, state, score=0.0, history=None, parent=None):
         self.state = state
         self.score = score
-        self.history = history or []
+        self.parent = parent
+        self._root_history = tuple(history) if history else ()
+        self.depth = len(self._root_history) if parent is None else parent.depth + 1
+
+    @property
+    def history(self):
+        states = []
+        node = self.parent
+        while node is not None:
+            states.append(node.state)
+            root = node
+            node = node.parent
+        states.reverse()
+        if self.parent is None:
+            return list(self._root_history)
+        return list(root._root_history) + states
 
     def extend(self, new_state, delta_score):
         return Candidate(
             state=new_state,
             score=self.score + delta_score,
-            history=self.history + [self.state],
+            parent=self,
         )
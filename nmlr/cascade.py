@@ -0,0 +1,115 @@
+"""Multi-fidelity cascade scoring.
+
+A ``CascadeScorer`` runs ordered stages over a layer, cheapest first (e.g.
+``heuristic_len_penalty``, then a small model, then the judge), and after
+each stage keeps only the top ``keep`` fraction of the children it scored,
+successive-halving style. Only the survivors of every earlier stage reach the
+expensive judge.
+
+Stage scores are expected in 0-1. A child last scored at stage ``level`` of
+``n`` gets ``(level + score) / n``, so the final scores are comparable across
+stages: surviving one more stage always ranks a child above every child
+pruned earlier, and children pruned at the same stage keep that stage's
+order. ``CascadeScorer`` sets ``higher_is_better``, so ``nmlr_search``'s beam
+keeps its highest scores.
+"""
+import asyncio
+import math
+from typing import Callable, List, Optional, Sequence, Tuple
+from .scoring import Reason, Score
+from .tracing import span
+
+ScorerFn = Callable[[str, str], Tuple[Score, Reason]]
+
+class CascadeStage:
+    def __init__(self, scorer: ScorerFn, keep: float = 0.5, min_keep: int = 1, name: Optional[str] = None):
+        if not 0.0 < keep <= 1.0:
+            raise ValueError("keep must be in (0, 1]")
+        self.scorer = scorer
+        self.keep = keep
+        self.min_keep = min_keep
+        self.name = name or getattr(scorer, "__name__", type(scorer).__name__)
+
+    def survivors(self, n: int) -> int:
+        return min(n, max(self.min_keep, math.ceil(self.keep * n)))
+
+def state_scorer(fn: Callable[[str], float]) -> ScorerFn:
+    """Adapt a task-independent ``fn(state) -> float`` (e.g.
+    ``heuristic_len_penalty``) to a stage scorer."""
+    def scorer(task: str, candidate_state: str) -> Tuple[Score, Reason]:
+        return fn(candidate_state), ""
+    scorer.__name__ = getattr(fn, "__name__", "state_scorer")
+    return scorer
+
+def _clamp(s: float) -> float:
+    return min(1.0, max(0.0, s))
+
+class CascadeScorer:
+    """Search ``scorer`` that runs ``stages`` in order, pruning between them.
+
+    ``score_batch`` / ``ascore_batch`` cascade over the whole layer; a stage
+    scorer's own ``score_batch`` / ``ascore_batch`` is used when it has one.
+    Scoring a single state runs every stage on it. ``calls`` counts the
+    states each stage has scored.
+    """
+
+    higher_is_better = True
+
+    def __init__(self, stages: Sequence[CascadeStage]):
+        if not stages:
+            raise ValueError("a cascade needs at least one stage")
+        self.stages = list(stages)
+        self.calls = [0] * len(self.stages)
+
+    def _final(self, level: int, scored: Tuple[Score, Reason]) -> Tuple[Score, Reason]:
+        return (level + _clamp(scored[0])) / len(self.stages), scored[1]
+
+    def _prune(self, level: int, alive: List[int], scored: List[Tuple[Score, Reason]],
+               results: List[Optional[Tuple[Score, Reason]]]) -> List[int]:
+        self.calls[level] += len(alive)
+        for i, s in zip(alive, scored):
+            results[i] = self._final(level, s)
+        if level == len(self.stages) - 1:
+            return []
+        n = self.stages[level].survivors(len(alive))
+        ranked = sorted(range(len(alive)), key=lambda j: -scored[j][0])[:n]
+        return [alive[j] for j in sorted(ranked)]
+
+    def __call__(self, task: str, candidate_state: str) -> Tuple[Score, Reason]:
+        return self.score_batch(task, [candidate_state])[0]
+
+    def score_batch(self, task: str, states: Sequence[str]) -> List[Tuple[Score, Reason]]:
+        results: List[Optional[Tuple[Score, Reason]]] = [None] * len(states)
+        alive = list(range(len(states)))
+        for level, stage in enumerate(self.stages):
+            if not alive:
+                break
+            subset = [states[i] for i in alive]
+            with span("cascade", stage=stage.name, n=len(subset)):
+                scored = self._sync_stage(stage, task, subset)
+            alive = self._prune(level, alive, list(scored), results)
+        return results
+
+    async def ascore_batch(self, task: str, states: Sequence[str]) -> List[Tuple[Score, Reason]]:
+        results: List[Optional[Tuple[Score, Reason]]] = [None] * len(states)
+        alive = list(range(len(states)))
+        for level, stage in enumerate(self.stages):
+            if not alive:
+                break
+            subset = [states[i] for i in alive]
+            with span("cascade", stage=stage.name, n=len(subset)):
+                abatch = getattr(stage.scorer, "ascore_batch", None)
+                ascore = getattr(stage.scorer, "ascore", None)
+                if abatch is not None:
+                    scored = await abatch(task, subset)
+                elif ascore is not None:
+                    scored = await asyncio.gather(*[ascore(task, s) for s in subset])
+                else:
+                    scored = await asyncio.to_thread(self._sync_stage, stage, task, subset)
+            alive = self._prune(level, alive, list(scored), results)
+        return results
+
+    @staticmethod
+    def _sync_stage(stage: CascadeStage, task: str, subset: List[str]) -> List[Tuple[Score, Reason]]:
+        batch = getattr(stage.scorer, "score_batch", None)
+        return batch(task, subset) if batch is not None else [stage.scorer(task, s) for s in subset]
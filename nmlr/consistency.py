@@ -0,0 +1,75 @@
+"""Self-consistency voting with early stopping.
+
+Answers are drawn in waves and voted on by normalized form. The modal answer
+wins; ties go to the answer seen first, and the returned representative is
+the shortest original string with the winning form. Sampling stops as soon
+as the remaining draws can no longer change the winner, so the result is the
+same as drawing all ``k`` answers in order. A ``confidence`` threshold stops
+earlier still, once the leader holds that share of the answers drawn.
+"""
+from collections import Counter
+from typing import Callable, List, Optional, Tuple
+
+def _normalize(x: str) -> str:
+    return (x or "").strip().lower()
+
+def majority_vote(outs: List[str], normalize: Callable[[str], str] = _normalize) -> str:
+    norm = [normalize(o) for o in outs]
+    best_norm, _ = Counter(norm).most_common(1)[0]
+    return min((o for o, n in zip(outs, norm) if n == best_norm), key=len)
+
+def decided(counts: Counter, remaining: int) -> bool:
+    """True once no ``remaining`` draws can change ``counts``' winner.
+    ``counts`` must be in first-seen order, as a ``Counter`` built by
+    counting draws in order is."""
+    if not counts:
+        return remaining == 0
+    leader, lead = counts.most_common(1)[0]
+    before = True
+    for answer, c in counts.items():
+        if answer == leader:
+            before = False
+        elif c + remaining > lead or (before and c + remaining == lead):
+            return False
+    # An answer not seen yet would rank after the leader on a tie.
+    return remaining <= lead
+
+def _needed(counts: Counter, remaining: int) -> int:
+    # Fewest further draws that could decide the vote (all for the leader).
+    lead = counts.most_common(1)[0][0] if counts else None
+    for x in range(1, remaining + 1):
+        best = counts.copy()
+        best[lead] += x
+        if decided(best, remaining - x):
+            return x
+    return remaining
+
+def self_consistency(draw: Callable[[int], List[str]], k: int,
+                     normalize: Callable[[str], str] = _normalize,
+                     confidence: Optional[float] = None,
+                     min_samples: int = 1) -> Tuple[str, List[str]]:
+    """Vote over up to ``k`` answers from ``draw(n)`` (which returns ``n``
+    answers, e.g. from ``LLM.sample``). Returns ``(answer, drawn)``."""
+    outs: List[str] = []
+    counts: Counter = Counter()
+    while len(outs) < k:
+        remaining = k - len(outs)
+        n = _needed(counts, remaining)
+        if confidence is not None:
+            # Small waves, so the confidence check gets a chance to stop early.
+            n = min(n, max(min_samples - len(outs), 1))
+        else:
+            n = max(n, min(min_samples - len(outs), remaining))
+        wave = draw(n)[:n]
+        if not wave:
+            break
+        for o in wave:
+            outs.append(o)
+            counts[normalize(o)] += 1
+        if len(outs) < min_samples:
+            continue
+        if decided(counts, k - len(outs)):
+            break
+        if confidence is not None and counts.most_common(1)[0][1] >= confidence * len(outs):
+            break
+    return majority_vote(outs, normalize), outs
@@ -0,0 +1,78 @@
+"""Duplicate and near-duplicate pruning for a layer of expanded states.
+
+Exact duplicates are caught by normalizing (case, punctuation, whitespace)
+and hashing. Near-duplicates are caught with MinHash signatures over
+character shingles, computed with NumPy for the whole layer at once; two
+states whose estimated Jaccard similarity reaches ``threshold`` are treated
+as copies. Each group keeps its highest-bonus member.
+"""
+import re
+import zlib
+from typing import List, Sequence
+
+import numpy as np
+
+_PRIME = (1 << 31) - 1
+_PUNCT = re.compile(r"[^\w\s]+")
+_SPACE = re.compile(r"\s+")
+
+def normalize(text: str) -> str:
+    return _SPACE.sub(" ", _PUNCT.sub(" ", text.lower())).strip()
+
+class Deduplicator:
+    """``threshold=1.0`` keeps exact-after-normalization dedup only.
+
+    ``num_perm`` MinHash permutations over ``shingle``-character shingles;
+    more permutations give a tighter similarity estimate at a linear cost.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, shingle: int = 3, seed: int = 0,
+                 block: int = 256):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle = shingle
+        self.block = block
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+    def _shingles(self, text: str) -> np.ndarray:
+        k = self.shingle
+        grams = {text[i:i + k] for i in range(max(1, len(text) - k + 1))}
+        return np.fromiter((zlib.crc32(g.encode("utf-8")) & _PRIME for g in grams),
+                           dtype=np.uint64, count=len(grams))
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """MinHash signature matrix, one row of ``num_perm`` values per text."""
+        sigs = np.empty((len(texts), self.num_perm), dtype=np.uint64)
+        for i, text in enumerate(texts):
+            sigs[i] = ((self._a * self._shingles(text) + self._b) % _PRIME).min(axis=1)
+        return sigs
+
+    def similarity(self, sigs: np.ndarray, rows: slice) -> np.ndarray:
+        # Estimated Jaccard similarity of ``sigs[rows]`` against every signature.
+        return (sigs[rows, None, :] == sigs[None, :, :]).mean(axis=2)
+
+    def keep(self, states: Sequence[str], bonuses: Sequence[float]) -> List[int]:
+        """Indices of the states to keep, in their original order."""
+        order = sorted(range(len(states)), key=lambda i: -bonuses[i])
+        first = {}
+        for i in order:
+            first.setdefault(normalize(states[i]), i)
+        reps = list(first.values())  # distinct texts, highest bonus first
+        if self.threshold >= 1.0 or len(reps) < 2:
+            return sorted(reps)
+
+        texts = [normalize(states[i]) for i in reps]
+        sigs = self.signatures(texts)
+        dropped = np.zeros(len(reps), dtype=bool)
+        for start in range(0, len(reps), self.block):
+            sim = self.similarity(sigs, slice(start, start + self.block))
+            for r in range(sim.shape[0]):
+                i = start + r
+                if dropped[i]:
+                    continue
+                later = sim[r] >= self.threshold
+                later[:i + 1] = False
+                dropped |= later
+        return sorted(rep for rep, gone in zip(reps, dropped) if not gone)
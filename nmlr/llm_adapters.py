@@ -1,8 +1,16 @@
+import asyncio
 import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
 from dataclasses import dataclass
-from typing import Optional
-from tenacity import retry, stop_after_attempt, wait_exponential
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
+from .accounting import get_accountant
+from .budget import record_usage
+from .scheduler import estimate_tokens, get_scheduler, last_attempts
+from .tracing import annotate, span
 
 load_dotenv()
 
@@ -15,88 +23,460 @@ class LLM:
     def complete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
         raise NotImplementedError
 
+    async def acomplete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
+        # Providers without a native async SDK fall back to a worker thread.
+        return await asyncio.to_thread(self.complete, prompt, system)
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        """Yield the completion as text chunks. Closing the generator early
+        closes the underlying stream; usage is recorded either way."""
+        yield self.complete(prompt, system).text
+
+    def complete_until(self, prompt: str, system: Optional[str] = None,
+                       stop: Optional[Callable[[str], Optional[int]]] = None) -> LLMResponse:
+        """Stream a completion and stop reading once ``stop`` (see
+        ``nmlr.streaming``) says enough has arrived; the text is cut there.
+        Providers without streaming complete in full and are cut afterwards."""
+        if type(self).stream is LLM.stream:
+            resp = self.complete(prompt, system)
+            cut = stop(resp.text) if stop is not None else None
+            return LLMResponse(text=resp.text if cut is None else resp.text[:cut], token_usage=resp.token_usage)
+        _last_usage.set(None)
+        text = ""
+        with span("llm", provider=getattr(self, "provider", None), model=getattr(self, "model", None),
+                  stream=True) as s:
+            chunks = self.stream(prompt, system)
+            try:
+                for chunk in chunks:
+                    text += chunk
+                    cut = stop(text) if stop is not None else None
+                    if cut is not None:
+                        text = text[:cut]
+                        s.set(stopped_early=True)
+                        break
+            finally:
+                chunks.close()
+                s.set(retries=max(0, last_attempts.get() - 1))
+        # The stream records its usage when closed; see ``_record_usage``.
+        return LLMResponse(text=text, token_usage=_last_usage.get())
+
+    supports_logprobs = False
+
+    def next_token_logprobs(self, prompt: str, system: Optional[str] = None, top: int = 10) -> Dict[str, float]:
+        """Log-probabilities of the ``top`` most likely first tokens of a
+        one-token completion; empty if the server returned none. Only
+        available where ``supports_logprobs`` is true."""
+        raise NotImplementedError(f"{type(self).__name__} does not expose logprobs")
+
+    async def anext_token_logprobs(self, prompt: str, system: Optional[str] = None, top: int = 10) -> Dict[str, float]:
+        return await asyncio.to_thread(self.next_token_logprobs, prompt, system, top)
+
+    def sample(self, prompt: str, system: Optional[str] = None, n: int = 1) -> List[LLMResponse]:
+        """``n`` independent completions of the same prompt. Run as concurrent
+        requests unless the provider can return several choices per request."""
+        if n <= 1:
+            return [self.complete(prompt, system)]
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            # copy_context keeps budget metering and tracing in the workers.
+            futures = [pool.submit(copy_context().run, self.complete, prompt, system) for _ in range(n)]
+            return [f.result() for f in futures]
+
+    def _scheduled(self, request, tokens: int, parse=None, **attrs):
+        # Send ``request`` through the provider's scheduler inside an "llm" span.
+        with span("llm", provider=self.provider, model=self.model, **attrs) as s:
+            try:
+                return (parse or self._response)(get_scheduler(self.provider).call(request, tokens=tokens))
+            finally:
+                s.set(retries=max(0, last_attempts.get() - 1))
+
+    async def _ascheduled(self, request, tokens: int, parse=None, **attrs):
+        with span("llm", provider=self.provider, model=self.model, **attrs) as s:
+            try:
+                return (parse or self._response)(await get_scheduler(self.provider).acall(request, tokens=tokens))
+            finally:
+                s.set(retries=max(0, last_attempts.get() - 1))
+
+def _openai_usage(usage) -> dict:
+    out = {"input": getattr(usage, "prompt_tokens", None), "output": getattr(usage, "completion_tokens", None)}
+    # Automatic prefix caching reports reused prompt tokens here.
+    cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    if isinstance(cached, int):
+        out["cached"] = cached
+    return out
+
+def _anthropic_usage(usage, output=None) -> dict:
+    # input_tokens excludes cache reads and writes; "input" counts the whole
+    # prompt, as for the other providers, and "cached" the part read from cache.
+    out = {"input": getattr(usage, "input_tokens", None),
+           "output": getattr(usage, "output_tokens", None) if output is None else output}
+    read = getattr(usage, "cache_read_input_tokens", None)
+    written = getattr(usage, "cache_creation_input_tokens", None)
+    if isinstance(out["input"], int):
+        out["input"] += sum(n for n in (read, written) if isinstance(n, int))
+    if isinstance(read, int):
+        out["cached"] = read
+    return out
+
+def _add_gemini_cached(usage: dict, meta) -> None:
+    # Implicit and explicit context caching both report cached_content_token_count.
+    cached = getattr(meta, "cached_content_token_count", None)
+    if isinstance(cached, int) and cached:
+        usage["cached"] = cached
+
+def _estimated_usage(prompt: str, system: Optional[str], text: str) -> dict:
+    # Streams closed early never receive the provider's usage report.
+    return {"input": estimate_tokens(prompt, system, output=0), "output": estimate_tokens(text, output=0)}
+
+def _env_number(name: str, cast):
+    value = os.getenv(name)
+    return cast(value) if value not in (None, "") else None
+
+def _sdk_options(sdk, timeout: Optional[float], max_connections: Optional[int],
+                 max_keepalive: Optional[int], is_async: bool = False) -> dict:
+    # Keyword arguments shared by the openai and anthropic SDK constructors.
+    # Each SDK client already keeps a keep-alive pool; a custom httpx client
+    # is only built when the pool size is configured. SDK-level retries are
+    # off because nmlr.scheduler owns retrying.
+    opts = {"max_retries": 0}
+    if timeout is not None:
+        opts["timeout"] = timeout
+    if max_connections is not None or max_keepalive is not None:
+        import httpx
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_keepalive)
+        http_cls = sdk.DefaultAsyncHttpxClient if is_async else sdk.DefaultHttpxClient
+        opts["http_client"] = http_cls(limits=limits)
+    return opts
+
+def _loop_client(clients: "weakref.WeakKeyDictionary", build):
+    # Async SDK clients keep connections bound to the event loop that opened
+    # them, so a pooled LLM keeps one per running loop: a script may call
+    # asyncio.run once per example.
+    loop = asyncio.get_running_loop()
+    client = clients.get(loop)
+    if client is None:
+        client = clients[loop] = build()
+    return client
+
 class OpenAIClient(LLM):
-    def __init__(self, model: Optional[str] = None, base_url: Optional[str] = None, api_key_env: Optional[str] = "OPENAI_API_KEY", provider: str = "openai"):
-        from openai import OpenAI
+    def __init__(self, model: Optional[str] = None, base_url: Optional[str] = None, api_key_env: Optional[str] = "OPENAI_API_KEY", provider: str = "openai",
+                 timeout: Optional[float] = None, max_connections: Optional[int] = None, max_keepalive: Optional[int] = None):
+        import openai
         api_key = "" if api_key_env is None else os.getenv(api_key_env, "")
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self._pool = (timeout, max_connections, max_keepalive)
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url, **_sdk_options(openai, *self._pool))
         self.model = model or os.getenv("NMLR_MODEL", "gpt-4o-mini")
         self.provider = provider
+        self._api_key = api_key
+        self._base_url = base_url
+        self._aclients = weakref.WeakKeyDictionary()
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
-    def complete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
+    @property
+    def aclient(self):
+        def build():
+            import openai
+            return openai.AsyncOpenAI(api_key=self._api_key, base_url=self._base_url,
+                                      **_sdk_options(openai, *self._pool, is_async=True))
+        return _loop_client(self._aclients, build)
+
+    def _messages(self, prompt: str, system: Optional[str]) -> list:
         msgs = []
         if system:
             msgs.append({"role": "system", "content": system})
         msgs.append({"role": "user", "content": prompt})
-        resp = self.client.chat.completions.create(model=self.model, messages=msgs)
+        return msgs
+
+    def complete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
+        return self._scheduled(
+            lambda: self.client.chat.completions.create(model=self.model, messages=self._messages(prompt, system)),
+            tokens=estimate_tokens(prompt, system))
+
+    async def acomplete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
+        return await self._ascheduled(
+            lambda: self.aclient.chat.completions.create(model=self.model, messages=self._messages(prompt, system)),
+            tokens=estimate_tokens(prompt, system))
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        resp, release = get_scheduler(self.provider).hold(
+            lambda: self.client.chat.completions.create(model=self.model, messages=self._messages(prompt, system),
+                                                        stream=True, stream_options={"include_usage": True}),
+            tokens=estimate_tokens(prompt, system))
+        parts, usage = [], None
+        try:
+            for chunk in resp:
+                if getattr(chunk, "usage", None) is not None:
+                    usage = _openai_usage(chunk.usage)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            resp.close()
+            release()
+            _record_usage(self.provider, self.model, usage or _estimated_usage(prompt, system, "".join(parts)))
+
+    supports_logprobs = True
+
+    def _logprob_request(self, prompt: str, system: Optional[str], top: int) -> dict:
+        return dict(model=self.model, messages=self._messages(prompt, system), max_tokens=1,
+                    temperature=0, logprobs=True, top_logprobs=top)
+
+    def next_token_logprobs(self, prompt: str, system: Optional[str] = None, top: int = 10) -> Dict[str, float]:
+        return self._scheduled(
+            lambda: self.client.chat.completions.create(**self._logprob_request(prompt, system, top)),
+            tokens=estimate_tokens(prompt, system, output=1), parse=self._logprobs)
+
+    async def anext_token_logprobs(self, prompt: str, system: Optional[str] = None, top: int = 10) -> Dict[str, float]:
+        return await self._ascheduled(
+            lambda: self.aclient.chat.completions.create(**self._logprob_request(prompt, system, top)),
+            tokens=estimate_tokens(prompt, system, output=1), parse=self._logprobs)
+
+    def _logprobs(self, resp) -> Dict[str, float]:
+        _record_usage(self.provider, self.model, _openai_usage(resp.usage))
+        content = getattr(resp.choices[0].logprobs, "content", None) if resp.choices else None
+        if not content:
+            return {}
+        first = content[0]
+        out = {t.token: t.logprob for t in (first.top_logprobs or [])}
+        out.setdefault(first.token, first.logprob)
+        return out
+
+    def sample(self, prompt: str, system: Optional[str] = None, n: int = 1) -> List[LLMResponse]:
+        # One request with ``n`` choices; the prompt is billed once. The first
+        # response carries the request's usage, the others report zero.
+        if n <= 1:
+            return [self.complete(prompt, system)]
+        out = self._scheduled(
+            lambda: self.client.chat.completions.create(model=self.model, messages=self._messages(prompt, system), n=n),
+            tokens=estimate_tokens(prompt, system, output=512 * n), parse=self._responses, n=n)
+        if len(out) < n:  # servers that ignore ``n`` (e.g. some local ones) return one choice
+            out += super().sample(prompt, system, n - len(out))
+        return out
+
+    def _response(self, resp) -> LLMResponse:
         text = resp.choices[0].message.content
-        usage = {"input": getattr(resp.usage, "prompt_tokens", None),
-                 "output": getattr(resp.usage, "completion_tokens", None)}
-        _append_token_log(self.provider, self.model, usage)
+        usage = _openai_usage(resp.usage)
+        _record_usage(self.provider, self.model, usage)
         return LLMResponse(text=text, token_usage=usage)
 
+    def _responses(self, resp) -> List[LLMResponse]:
+        first = self._response(resp)
+        return [first] + [LLMResponse(text=c.message.content, token_usage={"input": 0, "output": 0})
+                          for c in resp.choices[1:]]
+
 class AnthropicClient(LLM):
-    def __init__(self, model: Optional[str] = None):
+    provider = "anthropic"
+
+    def __init__(self, model: Optional[str] = None, timeout: Optional[float] = None,
+                 max_connections: Optional[int] = None, max_keepalive: Optional[int] = None,
+                 prompt_cache: bool = True):
         import anthropic
-        self.client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        self.prompt_cache = prompt_cache
+        self._pool = (timeout, max_connections, max_keepalive)
+        self.client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"), **_sdk_options(anthropic, *self._pool))
         self.model = model or os.getenv("NMLR_MODEL", "claude-3-5-sonnet-latest")
+        self._aclients = weakref.WeakKeyDictionary()
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
-    def complete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
-        msgs = [{"role": "user", "content": prompt}]
-        resp = self.client.messages.create(
+    @property
+    def aclient(self):
+        def build():
+            import anthropic
+            return anthropic.AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"),
+                                            **_sdk_options(anthropic, *self._pool, is_async=True))
+        return _loop_client(self._aclients, build)
+
+    def _request(self, prompt: str, system: Optional[str]) -> dict:
+        # A cache breakpoint on the system block lets calls that share it
+        # (e.g. every scoring call in a search) reuse the cached prefix.
+        if system and self.prompt_cache:
+            system = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        return dict(
             model=self.model,
             system=system or "",
             max_tokens=512,
-            messages=msgs,
+            messages=[{"role": "user", "content": prompt}],
         )
+
+    def complete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
+        return self._scheduled(
+            lambda: self.client.messages.create(**self._request(prompt, system)),
+            tokens=estimate_tokens(prompt, system))
+
+    async def acomplete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
+        return await self._ascheduled(
+            lambda: self.aclient.messages.create(**self._request(prompt, system)),
+            tokens=estimate_tokens(prompt, system))
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        resp, release = get_scheduler(self.provider).hold(
+            lambda: self.client.messages.create(stream=True, **self._request(prompt, system)),
+            tokens=estimate_tokens(prompt, system))
+        parts, usage = [], _estimated_usage(prompt, system, "")
+        try:
+            for event in resp:
+                if event.type == "message_start":
+                    usage.update(_anthropic_usage(event.message.usage, output=0))
+                elif event.type == "content_block_delta" and getattr(event.delta, "text", None):
+                    parts.append(event.delta.text)
+                    yield event.delta.text
+                elif event.type == "message_delta":
+                    usage["output"] = event.usage.output_tokens
+        finally:
+            resp.close()
+            release()
+            if usage["output"] == 0:
+                usage["output"] = estimate_tokens("".join(parts), output=0)
+            _record_usage("anthropic", self.model, usage)
+
+    def _response(self, resp) -> LLMResponse:
         # Anthropics' responses are blocks with text attributes.
         text = "".join([getattr(blk, "text", "") for blk in resp.content])
-        usage = {"input": getattr(resp.usage, "input_tokens", None),
-                 "output": getattr(resp.usage, "output_tokens", None)}
-        _append_token_log("anthropic", self.model, usage)
+        usage = _anthropic_usage(resp.usage)
+        _record_usage("anthropic", self.model, usage)
         return LLMResponse(text=text, token_usage=usage)
 
 class GeminiClient(LLM):
-    def __init__(self, model: Optional[str] = None):
+    provider = "gemini"
+
+    def __init__(self, model: Optional[str] = None, timeout: Optional[float] = None):
         import google.generativeai as genai
         genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
         self.model = model or os.getenv("NMLR_MODEL", "gemini-1.0-pro")
+        # Built once and reused; the SDK keeps its transport on the model.
+        self.client = genai.GenerativeModel(self.model)
+        self._request_options = {"timeout": timeout} if timeout is not None else None
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
-    def complete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
-        import google.generativeai as genai
-        client = genai.GenerativeModel(self.model)
-        full_prompt = prompt
+    @staticmethod
+    def _full_prompt(prompt: str, system: Optional[str]) -> str:
         if system:
-            full_prompt = f"{system}\n\n{prompt}"
-        resp = client.generate_content(full_prompt)
+            return f"{system}\n\n{prompt}"
+        return prompt
+
+    def complete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
+        full_prompt = self._full_prompt(prompt, system)
+        return self._scheduled(
+            lambda: self.client.generate_content(full_prompt, request_options=self._request_options),
+            tokens=estimate_tokens(full_prompt))
+
+    async def acomplete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
+        full_prompt = self._full_prompt(prompt, system)
+        return await self._ascheduled(
+            lambda: self.client.generate_content_async(full_prompt, request_options=self._request_options),
+            tokens=estimate_tokens(full_prompt))
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        full_prompt = self._full_prompt(prompt, system)
+        resp, release = get_scheduler(self.provider).hold(
+            lambda: self.client.generate_content(full_prompt, stream=True, request_options=self._request_options),
+            tokens=estimate_tokens(full_prompt))
+        parts, meta = [], None
+        try:
+            for chunk in resp:
+                meta = getattr(chunk, "usage_metadata", None) or meta
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield chunk.text
+        finally:
+            self._close_stream(resp)
+            release()
+            usage = _estimated_usage(full_prompt, None, "".join(parts))
+            if meta is not None:
+                usage = {"input": getattr(meta, "prompt_token_count", None) or usage["input"],
+                         "output": getattr(meta, "candidates_token_count", None) or usage["output"]}
+                _add_gemini_cached(usage, meta)
+            _record_usage("gemini", self.model, usage)
+
+    @staticmethod
+    def _close_stream(resp) -> None:
+        # The SDK response has no close(); cancel the transport stream under
+        # it (a gRPC call or REST response iterator) so generation stops.
+        stream = getattr(resp, "_iterator", None)
+        close = getattr(stream, "cancel", None) or getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+    def _response(self, resp) -> LLMResponse:
         text = resp.text
         usage = {"input": getattr(resp, "usage_metadata", {}).get("prompt_token_count"), "output": getattr(resp, "usage_metadata", {}).get("candidates_token_count")}
-        _append_token_log("gemini", self.model, usage)
+        _add_gemini_cached(usage, getattr(resp, "usage_metadata", None))
+        _record_usage("gemini", self.model, usage)
         return LLMResponse(text=text, token_usage=usage)
 
-def get_llm(provider: Optional[str] = None, model: Optional[str] = None) -> LLM:
-    provider = (provider or os.getenv("NMLR_PROVIDER", "openai")).lower()
+# Default base URLs for the OpenAI-compatible providers.
+_BASE_URLS = {
+    "xai": "https://api.x.ai/v1",
+    "ollama": "http://localhost:11434/v1",
+}
+
+_registry: Dict[Tuple[str, Optional[str], Optional[str]], LLM] = {}
+_registry_lock = threading.RLock()  # reentrant: building "replay" gets its upstream via get_llm
+_pool_defaults: Dict[str, Optional[float]] = {}
+
+def configure_clients(timeout: Optional[float] = None, max_connections: Optional[int] = None,
+                      max_keepalive: Optional[int] = None) -> None:
+    """Set timeout and connection-pool sizes for clients built by ``get_llm``
+    (defaults: ``NMLR_TIMEOUT``, ``NMLR_MAX_CONNECTIONS``, ``NMLR_MAX_KEEPALIVE``).
+    Drops already-pooled clients so the new settings take effect."""
+    _pool_defaults.update(timeout=timeout, max_connections=max_connections, max_keepalive=max_keepalive)
+    clear_llm_registry()
+
+def clear_llm_registry() -> None:
+    with _registry_lock:
+        _registry.clear()
+
+def _pool_options() -> dict:
+    return {
+        "timeout": _pool_defaults.get("timeout") or _env_number("NMLR_TIMEOUT", float),
+        "max_connections": _pool_defaults.get("max_connections") or _env_number("NMLR_MAX_CONNECTIONS", int),
+        "max_keepalive": _pool_defaults.get("max_keepalive") or _env_number("NMLR_MAX_KEEPALIVE", int),
+    }
+
+def _build_llm(provider: str, model: Optional[str]) -> LLM:
+    pool = _pool_options()
     if provider == "openai":
-        return OpenAIClient(model=model)
+        return OpenAIClient(model=model, **pool)
     if provider == "anthropic":
-        return AnthropicClient(model=model)
+        return AnthropicClient(model=model, **pool)
     if provider == "xai":
-        return OpenAIClient(model=model or "grok-beta", base_url="https://api.x.ai/v1", api_key_env="XAI_API_KEY", provider="xai")
+        return OpenAIClient(model=model or "grok-beta", base_url=_BASE_URLS["xai"], api_key_env="XAI_API_KEY", provider="xai", **pool)
     if provider == "gemini":
-        return GeminiClient(model=model)
+        return GeminiClient(model=model, timeout=pool["timeout"])
     if provider == "ollama":
-        return OpenAIClient(model=model or "llama3.2", base_url="http://localhost:11434/v1", api_key_env=None, provider="ollama")
+        return OpenAIClient(model=model or "llama3.2", base_url=_BASE_URLS["ollama"], api_key_env=None, provider="ollama", **pool)
+    if provider == "replay":
+        from .offline import ReplayLLM
+        mode = os.getenv("NMLR_REPLAY_MODE", "replay")
+        upstream = os.getenv("NMLR_REPLAY_UPSTREAM")
+        return ReplayLLM(path=os.getenv("NMLR_REPLAY_PATH", os.path.join("runs", "replay.jsonl")), mode=mode,
+                         upstream=get_llm(upstream, model) if upstream and mode != "replay" else None)
+    if provider == "simulated":
+        from .offline import SimulatedLLM
+        return SimulatedLLM(model=model, seed=int(os.getenv("NMLR_SIM_SEED", "0")),
+                            latency=float(os.getenv("NMLR_SIM_LATENCY", "0")),
+                            jitter=float(os.getenv("NMLR_SIM_JITTER", "0")))
     raise ValueError(f"Unknown LLM provider: {provider}")
 
+def get_llm(provider: Optional[str] = None, model: Optional[str] = None, reuse: bool = True) -> LLM:
+    """Return the process-wide client for ``(provider, model, base_url)``,
+    building it on first use so SDK clients and their keep-alive connection
+    pools are shared. ``reuse=False`` always builds a fresh, unshared client."""
+    provider = (provider or os.getenv("NMLR_PROVIDER", "openai")).lower()
+    if not reuse:
+        return _build_llm(provider, model)
+    key = (provider, model, _BASE_URLS.get(provider))
+    with _registry_lock:
+        llm = _registry.get(key)
+        if llm is None:
+            llm = _registry[key] = _build_llm(provider, model)
+    return llm
+
+_last_usage: ContextVar[Optional[dict]] = ContextVar("nmlr_last_usage", default=None)
+
+def _record_usage(provider_name: str, model: str, usage: dict):
+    _last_usage.set(usage)
+    _append_token_log(provider_name, model, usage)
+    record_usage(provider_name, model, usage)
+    annotate(**{k: v for k, v in (usage or {}).items() if k in ("input", "output", "cached")})
+
 def _append_token_log(provider_name: str, model: str, usage: dict):
-    try:
-        import os, csv, time
-        os.makedirs("runs", exist_ok=True)
-        with open("runs/token_log.csv", "a", newline="") as f:
-            w = csv.writer(f)
-            w.writerow([int(time.time()), provider_name, model, usage.get("input"), usage.get("output")])
-    except Exception:
-        pass
+    get_accountant().record(provider_name, model, usage)
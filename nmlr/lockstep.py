@@ -0,0 +1,76 @@
+"""Advance many searches layer by layer together.
+
+Running one ``nmlr_search`` per example spreads a dataset's LLM calls over
+``N x depth`` sequential layers. ``lockstep_search`` instead keeps up to
+``window`` searches (default: all) open as ``aiter_nmlr_search`` iterators and
+steps every open search by one layer per wave, so each wave's expansions and
+scorings across all tasks are in flight at once, in ``depth`` waves rather
+than ``N x depth``. As a search finishes, the next job takes its slot. Pair
+it with ``nmlr.batching.BatchingLLM`` to turn each wave into batch
+submissions.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Sequence
+from .candidate import Candidate
+from .search import ExpandFn, ScorerFn, VerifierFn, _Results, aiter_nmlr_search
+from .tracing import current_tracer, trace_span
+
+@dataclass
+class SearchJob:
+    initial: Candidate
+    task: str
+    expand_fn: ExpandFn
+    verifiers: List[VerifierFn]
+    scorer: ScorerFn
+    options: dict = field(default_factory=dict)  # keyword arguments for aiter_nmlr_search
+    max_results: Optional[int] = None
+
+async def _advance(it):
+    try:
+        return await it.__anext__()
+    except StopAsyncIteration:
+        return None
+
+async def lockstep_search(jobs: Sequence[SearchJob], window: Optional[int] = None,
+                          on_done: Optional[Callable[[int, List[Candidate]], None]] = None) -> List[List[Candidate]]:
+    """Run ``jobs`` in lockstep waves and return each job's results (as
+    ``async_nmlr_search`` would) in job order. ``on_done(index, results)``
+    is called as each search finishes."""
+    window = len(jobs) if window is None else max(1, window)
+    tracer = current_tracer()
+    out: List[Optional[List[Candidate]]] = [None] * len(jobs)
+    active = {}
+    queued = iter(range(len(jobs)))
+
+    def fill():
+        for i in queued:
+            job = jobs[i]
+            it = aiter_nmlr_search(job.initial, job.task, job.expand_fn, job.verifiers, job.scorer, **job.options)
+            active[i] = (it, _Results(job.max_results))
+            if len(active) >= window:
+                return
+
+    fill()
+    wave = 0
+    while active:
+        ids = list(active)
+        with trace_span(tracer, "wave", wave=wave, searches=len(ids)):
+            layers = await asyncio.gather(*[_advance(active[i][0]) for i in ids])
+        for i, layer in zip(ids, layers):
+            it, results = active[i]
+            if layer is not None:
+                results.add(layer.frontier)
+                continue
+            del active[i]
+            out[i] = results.items()
+            if on_done is not None:
+                on_done(i, out[i])
+        fill()
+        wave += 1
+    return out
+
+def run_lockstep(jobs: Sequence[SearchJob], window: Optional[int] = None,
+                 on_done: Optional[Callable[[int, List[Candidate]], None]] = None) -> List[List[Candidate]]:
+    """Blocking ``lockstep_search``."""
+    return asyncio.run(lockstep_search(jobs, window=window, on_done=on_done))
@@ -0,0 +1,196 @@
+"""Offline LLM backends for benchmarks and load tests.
+
+``ReplayLLM`` records real completions (text and token usage) to a JSONL
+file and plays them back exactly. ``SimulatedLLM`` makes up deterministic
+outputs in the shapes the NMLR prompts expect, with configurable latency
+and token counts. Both are available via ``get_llm(provider="replay")`` and
+``get_llm(provider="simulated")``.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .llm_adapters import LLM, LLMResponse, _record_usage
+from .tracing import span
+
+def _key(prompt: str, system: Optional[str]) -> str:
+    return hashlib.sha256(json.dumps([system, prompt]).encode("utf-8")).hexdigest()
+
+class ReplayLLM(LLM):
+    """``mode="record"`` forwards to ``upstream`` and appends every response to
+    ``path``; ``mode="replay"`` serves responses from ``path`` only, returning
+    repeated prompts' recordings in order; ``mode="auto"`` replays when it can
+    and records otherwise."""
+
+    provider = "replay"
+
+    def __init__(self, path: str, mode: str = "replay", upstream: Optional[LLM] = None):
+        if mode not in ("record", "replay", "auto"):
+            raise ValueError(f"Unknown replay mode: {mode}")
+        if mode != "replay" and upstream is None:
+            raise ValueError(f"Replay mode {mode!r} needs an upstream LLM to record from")
+        self.path = path
+        self.mode = mode
+        self.upstream = upstream
+        self.model = getattr(upstream, "model", None) or "replay"
+        self._recorded: Dict[str, List[dict]] = defaultdict(list)
+        self._served: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        if mode != "record" and os.path.exists(path):
+            with open(path) as f:
+                for ln in f:
+                    if ln.strip():
+                        row = json.loads(ln)
+                        self._recorded[row["key"]].append(row)
+
+    def _replay(self, key: str) -> Optional[LLMResponse]:
+        with self._lock:
+            rows = self._recorded.get(key)
+            if not rows:
+                return None
+            i = self._served[key]
+            if i >= len(rows) and self.mode == "auto":
+                # Out of recordings: record a fresh sample instead of repeating one.
+                return None
+            self._served[key] = i + 1
+            row = rows[min(i, len(rows) - 1)]
+        model = row.get("model") or self.model
+        with span("llm", provider=self.provider, model=model, retries=0):
+            _record_usage(self.provider, model, row.get("token_usage") or {})
+        return LLMResponse(text=row["text"], token_usage=row.get("token_usage"))
+
+    def _record(self, key: str, prompt: str, system: Optional[str], resp: LLMResponse) -> LLMResponse:
+        row = {"key": key, "provider": getattr(self.upstream, "provider", None), "model": self.model,
+               "system": system, "prompt": prompt, "text": resp.text, "token_usage": resp.token_usage}
+        with self._lock:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(row) + "\n")
+            self._recorded[key].append(row)
+            self._served[key] += 1
+        return resp
+
+    def _missing(self, key: str) -> LookupError:
+        return LookupError(f"No recorded response for prompt {key[:12]} in {self.path}")
+
+    def complete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
+        key = _key(prompt, system)
+        if self.mode != "record":
+            resp = self._replay(key)
+            if resp is not None:
+                return resp
+            if self.mode == "replay":
+                raise self._missing(key)
+        return self._record(key, prompt, system, self.upstream.complete(prompt, system=system))
+
+    async def acomplete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
+        key = _key(prompt, system)
+        if self.mode != "record":
+            resp = self._replay(key)
+            if resp is not None:
+                return resp
+            if self.mode == "replay":
+                raise self._missing(key)
+        return self._record(key, prompt, system, await self.upstream.acomplete(prompt, system=system))
+
+class SimulatedLLM(LLM):
+    """Deterministic synthetic completions.
+
+    The output depends only on ``seed``, the system prompt and the prompt.
+    Scoring prompts that ask for a JSON array get one object per ``[n]``
+    numbered candidate; other prompts mentioning JSON get a single
+    ``{"score", "reason"}`` object; everything else gets ``lines`` short
+    answers drawn from a ``vocabulary``-sized pool (so duplicates recur, as
+    with real models). Each call sleeps ``latency`` seconds plus uniform
+    jitter of up to ``jitter``; reported output tokens are drawn from a
+    normal distribution ``output_tokens=(mean, stdev)``.
+    """
+
+    provider = "simulated"
+
+    def __init__(self, model: Optional[str] = None, seed: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, output_tokens: Tuple[float, float] = (20.0, 5.0),
+                 lines: int = 3, vocabulary: int = 50):
+        self.model = model or "simulated"
+        self.seed = seed
+        self.latency = latency
+        self.jitter = jitter
+        self.output_tokens = output_tokens
+        self.lines = lines
+        self.vocabulary = vocabulary
+
+    def _rng(self, prompt: str, system: Optional[str]) -> random.Random:
+        digest = hashlib.sha256(json.dumps([self.seed, self.model, system, prompt]).encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _generate(self, prompt: str, system: Optional[str]) -> Tuple[LLMResponse, float]:
+        rng = self._rng(prompt, system)
+        instructions = f"{system or ''}\n{prompt}"
+        if "JSON array" in instructions:
+            ids = [int(i) for i in re.findall(r"^\[(\d+)\]", prompt, re.M)]
+            text = json.dumps([{"id": i, "score": round(rng.random(), 3), "reason": "simulated"} for i in ids])
+        elif "JSON" in instructions:
+            text = json.dumps({"score": round(rng.random(), 3), "reason": "simulated"})
+        else:
+            text = "\n".join(f"Answer {rng.randrange(self.vocabulary)}" for _ in range(self.lines))
+        mean, stdev = self.output_tokens
+        usage = {"input": len(prompt) // 4 + len(system or "") // 4,
+                 "output": max(1, int(round(rng.gauss(mean, stdev))))}
+        delay = self.latency + (rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        return LLMResponse(text=text, token_usage=usage), delay
+
+    def complete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
+        resp, delay = self._generate(prompt, system)
+        with span("llm", provider=self.provider, model=self.model, retries=0):
+            if delay:
+                time.sleep(delay)
+            _record_usage(self.provider, self.model, resp.token_usage)
+        return resp
+
+    async def acomplete(self, prompt: str, system: Optional[str] = None) -> LLMResponse:
+        resp, delay = self._generate(prompt, system)
+        with span("llm", provider=self.provider, model=self.model, retries=0):
+            if delay:
+                await asyncio.sleep(delay)
+            _record_usage(self.provider, self.model, resp.token_usage)
+        return resp
+
+    supports_logprobs = True
+
+    def next_token_logprobs(self, prompt: str, system: Optional[str] = None, top: int = 10) -> Dict[str, float]:
+        # A random distribution over the digits 0-9.
+        rng = self._rng(prompt, system)
+        weights = [rng.random() ** 4 for _ in range(10)]
+        total = sum(weights)
+        ranked = sorted(((str(d), math.log(w / total)) for d, w in enumerate(weights)), key=lambda t: -t[1])
+        with span("llm", provider=self.provider, model=self.model, retries=0):
+            if self.latency:
+                time.sleep(self.latency)
+            _record_usage(self.provider, self.model, {"input": len(prompt) // 4 + len(system or "") // 4, "output": 1})
+        return dict(ranked[:top])
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        # Lines arrive at an even pace across the call's latency; usage counts
+        # only the share of output tokens actually streamed.
+        resp, delay = self._generate(prompt, system)
+        lines = resp.text.splitlines(keepends=True) or [""]
+        sent = 0
+        try:
+            for line in lines:
+                if delay:
+                    time.sleep(delay / len(lines))
+                sent += 1
+                yield line
+        finally:
+            usage = dict(resp.token_usage)
+            usage["output"] = max(1, usage["output"] * sent // len(lines))
+            _record_usage(self.provider, self.model, usage)
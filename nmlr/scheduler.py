@@ -0,0 +1,249 @@
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Attempts used by the most recent scheduled call in this context (1 = no retry).
+last_attempts: ContextVar[int] = ContextVar("nmlr_last_attempts", default=0)
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+class TokenBucket:
+    """Refills ``rate_per_minute`` units per minute up to one minute's worth."""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.level = rate_per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` units and return how long to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            self.level -= min(amount, self.capacity)
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+def _parse_duration(value: str) -> Optional[float]:
+    # Accepts "12", "1.5", "250ms", "6m0s", "1h2m3.5s".
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    if value.endswith("ms") and value[:-2].replace(".", "", 1).isdigit():
+        return float(value[:-2]) / 1000.0
+    parts = re.fullmatch(r"(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m)?(?:(\d+(?:\.\d+)?)s)?", value)
+    if not parts or not any(parts.groups()):
+        return None
+    h, m, s = (float(g) if g else 0.0 for g in parts.groups())
+    return h * 3600 + m * 60 + s
+
+def _headers(exc: BaseException) -> dict:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return {str(k).lower(): str(v) for k, v in dict(headers).items()}
+    except (TypeError, ValueError):
+        return {}
+
+def _status(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is None:
+        # google-api-core (Gemini) errors carry the HTTP status in ``code``.
+        status = getattr(exc, "code", None)
+    return status if isinstance(status, int) else None
+
+def classify_error(exc: BaseException) -> Tuple[bool, Optional[float]]:
+    """Return ``(retryable, retry_after_seconds)`` for an SDK exception.
+
+    Rate limits, timeouts, connection errors and 5xx/overloaded responses
+    are retryable; other 4xx (bad request, auth, not found) are not. The
+    delay comes from ``retry-after-ms``, ``retry-after`` or the OpenAI
+    ``x-ratelimit-reset-*`` headers when present.
+    """
+    status = _status(exc)
+    if status is not None:
+        retryable = status in RETRYABLE_STATUS or status >= 500
+    else:
+        name = type(exc).__name__.lower()
+        retryable = any(word in name for word in ("timeout", "connection", "ratelimit", "overloaded", "unavailable"))
+    headers = _headers(exc)
+    retry_after = None
+    if "retry-after-ms" in headers:
+        retry_after = _parse_duration(headers["retry-after-ms"] + "ms")
+    for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        if retry_after is None and name in headers:
+            retry_after = _parse_duration(headers[name])
+    return retryable, retry_after
+
+class RequestScheduler:
+    """Per-provider gate for LLM requests.
+
+    Requests wait on token buckets for requests-per-minute and
+    tokens-per-minute, and on an adaptive concurrency limit that halves on
+    every rate-limit response and creeps back up on success. Retryable errors
+    are retried with jittered exponential backoff, or for exactly as long as
+    the provider's ``Retry-After`` asks; that pause applies to every request
+    sharing the scheduler, so concurrent workers do not stampede together.
+    Non-retryable errors are raised immediately.
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 max_concurrency: Optional[int] = None, max_attempts: int = 4,
+                 base_delay: float = 1.0, max_delay: float = 30.0):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency) if max_concurrency else None
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+        self._sleep = time.sleep
+        self._asleep = asyncio.sleep
+
+    def _admit_delay(self, tokens: int) -> float:
+        delay = max(0.0, self.paused_until - time.monotonic())
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return delay
+
+    def _try_enter(self) -> bool:
+        with self._cond:
+            if self.limit is not None and self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def _leave(self, rate_limited: bool) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if self.limit is not None:
+                if rate_limited:
+                    self.limit = max(1.0, self.limit / 2)
+                else:
+                    self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def _backoff(self, attempt: int, retry_after: Optional[float], rate_limited: bool) -> float:
+        if retry_after is not None:
+            delay = min(retry_after, self.max_delay)
+        else:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if rate_limited:
+            with self._cond:
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        return delay
+
+    def call(self, fn: Callable[[], Any], tokens: int = 0) -> Any:
+        return self._call(fn, tokens, hold=False)[0]
+
+    def hold(self, fn: Callable[[], Any], tokens: int = 0) -> Tuple[Any, Callable[[], None]]:
+        """Like ``call``, but the concurrency slot stays taken after ``fn``
+        returns, e.g. while a streamed response is read. Returns
+        ``(result, release)``; call ``release()`` once done with the result."""
+        return self._call(fn, tokens, hold=True)
+
+    def _release_once(self) -> Callable[[], None]:
+        released = []
+
+        def release() -> None:
+            if not released:
+                released.append(True)
+                self._leave(False)
+        return release
+
+    def _call(self, fn: Callable[[], Any], tokens: int, hold: bool) -> Tuple[Any, Optional[Callable[[], None]]]:
+        for attempt in range(1, self.max_attempts + 1):
+            delay = self._admit_delay(tokens)
+            if delay:
+                self._sleep(delay)
+            with self._cond:
+                while not self._try_enter():
+                    self._cond.wait(0.05)
+            rate_limited = False
+            held = False
+            try:
+                result = fn()
+                last_attempts.set(attempt)
+                if hold:
+                    held = True
+                    return result, self._release_once()
+                return result, None
+            except Exception as exc:
+                retryable, retry_after = classify_error(exc)
+                rate_limited = _status(exc) == 429
+                if not retryable or attempt == self.max_attempts:
+                    last_attempts.set(attempt)
+                    raise
+            finally:
+                if not held:
+                    self._leave(rate_limited)
+            self._sleep(self._backoff(attempt, retry_after, rate_limited))
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], tokens: int = 0) -> Any:
+        for attempt in range(1, self.max_attempts + 1):
+            delay = self._admit_delay(tokens)
+            if delay:
+                await self._asleep(delay)
+            while not self._try_enter():
+                await self._asleep(0.01)
+            rate_limited = False
+            try:
+                result = await fn()
+                last_attempts.set(attempt)
+                return result
+            except Exception as exc:
+                retryable, retry_after = classify_error(exc)
+                rate_limited = _status(exc) == 429
+                if not retryable or attempt == self.max_attempts:
+                    last_attempts.set(attempt)
+                    raise
+            finally:
+                self._leave(rate_limited)
+            await self._asleep(self._backoff(attempt, retry_after, rate_limited))
+
+def estimate_tokens(*texts: Optional[str], output: int = 512) -> int:
+    # ~4 characters per token, plus the expected completion length.
+    return sum(len(t) for t in texts if t) // 4 + output
+
+_schedulers: Dict[str, RequestScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+def _env_limit(name: str, provider: str, cast):
+    value = os.getenv(f"{name}_{provider.upper()}") or os.getenv(name)
+    return cast(value) if value else None
+
+def get_scheduler(provider: str) -> RequestScheduler:
+    """Process-wide scheduler for ``provider``, configured from
+    ``NMLR_RPM``, ``NMLR_TPM`` and ``NMLR_MAX_CONCURRENCY`` (optionally
+    suffixed with the provider name, e.g. ``NMLR_RPM_OPENAI``)."""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(provider)
+        if scheduler is None:
+            scheduler = _schedulers[provider] = RequestScheduler(
+                rpm=_env_limit("NMLR_RPM", provider, float),
+                tpm=_env_limit("NMLR_TPM", provider, float),
+                max_concurrency=_env_limit("NMLR_MAX_CONCURRENCY", provider, int),
+            )
+        return scheduler
+
+def configure_scheduler(provider: str, **kwargs) -> RequestScheduler:
+    """Replace ``provider``'s scheduler; kwargs as for ``RequestScheduler``."""
+    with _schedulers_lock:
+        scheduler = _schedulers[provider] = RequestScheduler(**kwargs)
+        return scheduler
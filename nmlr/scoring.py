@@ -1,40 +1,259 @@
-from typing import Callable, Optional, Tuple
-from .llm_adapters import get_llm
+import asyncio
+import json
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import TYPE_CHECKING, Callable, List, Optional, Sequence, Tuple
+from .llm_adapters import LLM, get_llm
+
+if TYPE_CHECKING:
+    from .cache import ResponseCache
 
 Score = float
 Reason = str
 
+_UNPARSEABLE = "unparseable"
+
 class LLMEvaluator:
+    """Scores a candidate against a task with an LLM.
+
+    ``mode="json"`` asks for a JSON score and reason. ``mode="logprob"``
+    asks for a single 0-9 digit with ``max_tokens=1`` and returns the
+    expected value of the model's digit distribution (renormalized over the
+    digits, scaled to 0-1) with an empty reason; ``explain`` fetches a reason
+    on demand. Logprob mode needs a client with ``supports_logprobs``
+    (the OpenAI-compatible providers, including ollama) and falls back to
+    JSON for a call whose top tokens contain no digit.
+
+    ``llm`` overrides the client built from ``provider`` / ``model``, e.g.
+    a ``nmlr.batching.BatchingLLM``.
+    """
+
     def __init__(self, provider: Optional[str] = None, model: Optional[str] = None,
-                 rubric: Optional[str] = None):
-        self.llm = get_llm(provider=provider, model=model)
+                 rubric: Optional[str] = None, batch_rubric: Optional[str] = None,
+                 max_batch_size: int = 16, max_batch_chars: int = 12000,
+                 cache: Optional["ResponseCache"] = None, mode: str = "json",
+                 logprob_rubric: Optional[str] = None, llm: Optional[LLM] = None):
+        self.llm = llm or get_llm(provider=provider, model=model)
+        self.cache = cache
+        if mode not in ("json", "logprob"):
+            raise ValueError(f"Unknown scoring mode: {mode}")
+        if mode == "logprob" and not getattr(self.llm, "supports_logprobs", False):
+            raise ValueError(f"{getattr(self.llm, 'provider', provider)} does not expose logprobs; use mode='json'")
+        self.mode = mode
         self.rubric = rubric or (
             "You are a verifier. Score the candidate's hypothesis for correctness "
             "given the task. Return a single JSON object: "
             '{"score": number between 0 and 1, "reason": "short justification"}'
         )
+        self.batch_rubric = batch_rubric or (
+            "You are a verifier. Score each numbered candidate's hypothesis for correctness "
+            "given the task, independently of the others. Return a single JSON array with one "
+            "object per candidate, in order: "
+            '[{"id": candidate number, "score": number between 0 and 1, "reason": "short justification"}]'
+        )
+        self.logprob_rubric = logprob_rubric or (
+            "You are a verifier. Rate how likely the candidate's hypothesis is correct "
+            "given the task, from 0 (certainly wrong) to 9 (certainly correct). "
+            "Reply with that single digit only."
+        )
+        self.max_batch_size = max_batch_size
+        self.max_batch_chars = max_batch_chars
+        self.system = "Act as a strict verifier."
 
-    def __call__(self, task: str, candidate_state: str) -> Tuple[Score, Reason]:
-        prompt = f"""Task:
-{task}
+    def _system(self, task: str, rubric: str) -> str:
+        # Everything that is the same for every call in a search goes first,
+        # so providers can cache it as a prompt prefix; only the candidates vary.
+        return f"""{self.system}
 
-Candidate:
-{candidate_state}
+{rubric}
 
-{self.rubric}"""
-        resp = self.llm.complete(prompt, system="Act as a strict verifier.")
-        text = resp.text.strip()
-        import json, re
-        try:
-            obj = json.loads(text)
-        except Exception:
-            m = re.search(r'\\{.*\\}', text, re.S)
-            obj = json.loads(m.group(0)) if m else {"score": 0.0, "reason": "unparseable"}
+Task:
+{task}"""
+
+    def _prompt(self, candidate_state: str) -> str:
+        return f"""Candidate:
+{candidate_state}"""
+
+    def _batch_prompt(self, states: Sequence[str]) -> str:
+        numbered = "\n".join(f"[{i}] {s}" for i, s in enumerate(states, 1))
+        return f"""Candidates:
+{numbered}"""
+
+    @staticmethod
+    def _clamp(obj: dict) -> Tuple[Score, Reason]:
         score = float(obj.get("score", 0.0))
         reason = str(obj.get("reason", ""))
         score = max(0.0, min(1.0, score))
         return score, reason
 
+    def _parse(self, text: str) -> Tuple[Score, Reason]:
+        text = text.strip()
+        try:
+            obj = json.loads(text)
+        except Exception:
+            m = re.search(r'\{.*\}', text, re.S)
+            try:
+                obj = json.loads(m.group(0)) if m else {"score": 0.0, "reason": _UNPARSEABLE}
+            except Exception:
+                obj = {"score": 0.0, "reason": _UNPARSEABLE}
+        return self._clamp(obj)
+
+    @staticmethod
+    def _expected(logprobs: dict) -> Optional[Score]:
+        # Expected digit under the model's distribution, renormalized over
+        # the digit tokens among the top alternatives.
+        mass = [0.0] * 10
+        for token, lp in logprobs.items():
+            t = token.strip()
+            if len(t) == 1 and t.isdigit():
+                mass[int(t)] += math.exp(lp)
+        total = sum(mass)
+        if not total:
+            return None
+        return sum(d * p for d, p in enumerate(mass)) / (9 * total)
+
+    def _parse_batch(self, text: str, n: int) -> dict:
+        # Returns {position: (score, reason)} for the items that parsed; the
+        # caller re-scores anything missing one at a time.
+        text = text.strip()
+        try:
+            items = json.loads(text)
+        except Exception:
+            m = re.search(r'\[.*\]', text, re.S)
+            try:
+                items = json.loads(m.group(0)) if m else []
+            except Exception:
+                items = []
+        if not isinstance(items, list):
+            return {}
+        parsed = {}
+        for pos, obj in enumerate(items):
+            if not isinstance(obj, dict) or "score" not in obj:
+                continue
+            idx = obj.get("id", pos + 1)
+            try:
+                idx = int(idx) - 1
+                parsed.setdefault(idx, self._clamp(obj))
+            except (TypeError, ValueError):
+                continue
+        return {i: v for i, v in parsed.items() if 0 <= i < n}
+
+    def _chunks(self, task: str, states: Sequence[str]) -> List[List[int]]:
+        chunks: List[List[int]] = []
+        current: List[int] = []
+        size = len(task) + len(self.batch_rubric)
+        for i, state in enumerate(states):
+            if current and (len(current) >= self.max_batch_size
+                            or size + len(state) > self.max_batch_chars):
+                chunks.append(current)
+                current = []
+                size = len(task) + len(self.batch_rubric)
+            current.append(i)
+            size += len(state)
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _cache_key(self, task: str, candidate_state: str, batch: bool = False) -> str:
+        # Batch and single prompts score differently, so they are cached apart.
+        if self.mode == "logprob":
+            kind, rubric = "score_logprob", self.logprob_rubric
+        elif batch:
+            kind, rubric = "score_batch", self.batch_rubric
+        else:
+            kind, rubric = "score", self.rubric
+        return self.cache.make_key(kind=kind, provider=getattr(self.llm, "provider", None),
+                                   model=getattr(self.llm, "model", None), rubric=rubric,
+                                   system=self.system, task=task, candidate=candidate_state)
+
+    def _lookup(self, task: str, states: Sequence[str], use_cache: bool,
+                batch: bool = False) -> List[Optional[Tuple[Score, Reason]]]:
+        if self.cache is None or not use_cache:
+            return [None] * len(states)
+        hits = [self.cache.get(self._cache_key(task, s, batch)) for s in states]
+        return [tuple(h) if h is not None else None for h in hits]
+
+    def _store(self, task: str, candidate_state: str, scored: Tuple[Score, Reason],
+               batch: bool = False) -> Tuple[Score, Reason]:
+        # A failed parse is not a score; leave it out so the next run retries.
+        if self.cache is not None and scored[1] != _UNPARSEABLE:
+            self.cache.put(self._cache_key(task, candidate_state, batch), list(scored))
+        return scored
+
+    def _score_json(self, task: str, candidate_state: str) -> Tuple[Score, Reason]:
+        resp = self.llm.complete(self._prompt(candidate_state), system=self._system(task, self.rubric))
+        return self._parse(resp.text)
+
+    def __call__(self, task: str, candidate_state: str, use_cache: bool = True) -> Tuple[Score, Reason]:
+        cached = self._lookup(task, [candidate_state], use_cache)[0]
+        if cached is not None:
+            return cached
+        if self.mode == "logprob":
+            score = self._expected(self.llm.next_token_logprobs(
+                self._prompt(candidate_state), system=self._system(task, self.logprob_rubric)))
+            if score is not None:
+                return self._store(task, candidate_state, (score, ""))
+        return self._store(task, candidate_state, self._score_json(task, candidate_state))
+
+    async def ascore(self, task: str, candidate_state: str, use_cache: bool = True) -> Tuple[Score, Reason]:
+        cached = self._lookup(task, [candidate_state], use_cache)[0]
+        if cached is not None:
+            return cached
+        if self.mode == "logprob":
+            score = self._expected(await self.llm.anext_token_logprobs(
+                self._prompt(candidate_state), system=self._system(task, self.logprob_rubric)))
+            if score is not None:
+                return self._store(task, candidate_state, (score, ""))
+        resp = await self.llm.acomplete(self._prompt(candidate_state), system=self._system(task, self.rubric))
+        return self._store(task, candidate_state, self._parse(resp.text))
+
+    def explain(self, task: str, candidate_state: str) -> Reason:
+        """A short justification for the candidate's score (one JSON-mode call)."""
+        return self._score_json(task, candidate_state)[1]
+
+    def score_batch(self, task: str, states: Sequence[str], use_cache: bool = True) -> List[Tuple[Score, Reason]]:
+        if self.mode == "logprob":
+            # One token per candidate: score them with concurrent calls.
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_batch_size, len(states)))) as pool:
+                futures = [pool.submit(copy_context().run, self, task, s, use_cache) for s in states]
+                return [f.result() for f in futures]
+        results = self._lookup(task, states, use_cache, batch=True)
+        pending = [i for i, r in enumerate(results) if r is None]
+        for chunk in self._chunks(task, [states[i] for i in pending]):
+            if len(chunk) == 1:
+                continue
+            chunk = [pending[j] for j in chunk]
+            resp = self.llm.complete(self._batch_prompt([states[i] for i in chunk]),
+                                     system=self._system(task, self.batch_rubric))
+            for pos, scored in self._parse_batch(resp.text, len(chunk)).items():
+                results[chunk[pos]] = self._store(task, states[chunk[pos]], scored, batch=True)
+        return [r if r is not None else self(task, states[i], use_cache=use_cache)
+                for i, r in enumerate(results)]
+
+    async def ascore_batch(self, task: str, states: Sequence[str], use_cache: bool = True) -> List[Tuple[Score, Reason]]:
+        if self.mode == "logprob":
+            return list(await asyncio.gather(*[self.ascore(task, s, use_cache) for s in states]))
+        results = self._lookup(task, states, use_cache, batch=True)
+        pending = [i for i, r in enumerate(results) if r is None]
+
+        async def run(chunk: List[int]):
+            if len(chunk) == 1:
+                return
+            chunk = [pending[j] for j in chunk]
+            resp = await self.llm.acomplete(self._batch_prompt([states[i] for i in chunk]),
+                                            system=self._system(task, self.batch_rubric))
+            for pos, scored in self._parse_batch(resp.text, len(chunk)).items():
+                results[chunk[pos]] = self._store(task, states[chunk[pos]], scored, batch=True)
+
+        await asyncio.gather(*[run(chunk) for chunk in self._chunks(task, [states[i] for i in pending])])
+        missing = [i for i, r in enumerate(results) if r is None]
+        retried = await asyncio.gather(*[self.ascore(task, states[i], use_cache=use_cache) for i in missing])
+        for i, scored in zip(missing, retried):
+            results[i] = scored
+        return results
+
 def heuristic_len_penalty(candidate_state: str) -> float:
     return max(0.0, 1.0 - (len(candidate_state) / 500.0))
 
@@ -44,3 +263,36 @@ def blended_scorer(task: str, candidate_state: str,
     h = heuristic_len_penalty(candidate_state)
     final = 0.9 * llm_score + 0.1 * h
     return final, reason
+
+def _blend(states: Sequence[str], scored: Sequence[Tuple[Score, Reason]]) -> List[Tuple[Score, Reason]]:
+    return [(0.9 * s + 0.1 * heuristic_len_penalty(state), reason)
+            for state, (s, reason) in zip(states, scored)]
+
+def blended_scorer_batch(task: str, states: Sequence[str],
+                         llm_eval: Callable[[str,str], Tuple[Score,Reason]]) -> List[Tuple[Score,Reason]]:
+    batch = getattr(llm_eval, "score_batch", None)
+    if batch is None:
+        return [blended_scorer(task, s, llm_eval) for s in states]
+    return _blend(states, batch(task, states))
+
+class BlendedScorer:
+    """``blended_scorer`` bound to an evaluator, usable as a search ``scorer``.
+
+    Exposes ``score_batch`` so ``nmlr_search`` scores a whole layer at once
+    whenever the wrapped evaluator supports batching.
+    """
+
+    def __init__(self, llm_eval: Callable[[str,str], Tuple[Score,Reason]]):
+        self.llm_eval = llm_eval
+
+    def __call__(self, task: str, candidate_state: str) -> Tuple[Score,Reason]:
+        return blended_scorer(task, candidate_state, self.llm_eval)
+
+    def score_batch(self, task: str, states: Sequence[str]) -> List[Tuple[Score,Reason]]:
+        return blended_scorer_batch(task, states, self.llm_eval)
+
+    async def ascore_batch(self, task: str, states: Sequence[str]) -> List[Tuple[Score,Reason]]:
+        abatch = getattr(self.llm_eval, "ascore_batch", None)
+        if abatch is None:
+            return await asyncio.to_thread(self.score_batch, task, states)
+        return _blend(states, await abatch(task, states))
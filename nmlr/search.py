@@ -1,35 +1,387 @@
-from typing import Callable, Iterable, List, Tuple
+import asyncio
+import contextvars
+import functools
+import heapq
+import inspect
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, List, Optional, Tuple
+from .budget import Budget, metered
 from .candidate import Candidate
+from .dedup import Deduplicator
+from .tracing import Tracer, current_tracer, trace_span
+from .transposition import TranspositionTable
+from .verifier import VerifierPipeline
 
 ExpandFn = Callable[[str], Iterable[Tuple[str, float]]]
 VerifierFn = Callable[[Candidate], bool]
 ScorerFn = Callable[[str, str], Tuple[float, str]]  # (score, reason)
 
+class _TopK:
+    """Keeps the first ``k`` items ranked by ``key`` (ascending, or descending
+    with ``reverse=True``) in a heap of size ``k``. Ties keep insertion order,
+    so ``items()`` equals ``sorted(pushed, key=key, reverse=reverse)[:k]``."""
+
+    def __init__(self, k: int, key: Callable[[Any], float], reverse: bool = False):
+        self.k = k
+        self.key = key
+        self.sign = -1 if reverse else 1
+        self._heap: list = []
+        self._seq = 0
+
+    def push(self, item: Any) -> None:
+        # The heap root is the worst kept entry: highest rank, latest on ties.
+        entry = (-self.sign * self.key(item), -self._seq, item)
+        self._seq += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif self.k > 0 and entry[0] > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def items(self) -> list:
+        return [entry[2] for entry in sorted(self._heap, reverse=True)]
+
+def _by_score(c: Candidate) -> float:
+    return c.score
+
+def _beam(beam_size: int, scorer) -> _TopK:
+    # The beam keeps the lowest scores; scorers marked ``higher_is_better``
+    # (e.g. ``nmlr.cascade.CascadeScorer``) get the highest instead.
+    return _TopK(beam_size, _by_score, reverse=getattr(scorer, "higher_is_better", False))
+
+@dataclass
+class SearchLayer:
+    step: int
+    frontier: List[Candidate]
+    best: Candidate  # highest-scoring candidate seen so far
+    stop_reason: Optional[str] = None  # "score_threshold", "plateau" or "budget" on the last layer
+
+def _best(best: Optional[Candidate], frontier: List[Candidate]) -> Candidate:
+    top = max(frontier, key=_by_score)
+    return top if best is None or top.score > best.score else best
+
+def _pipeline(verifiers) -> VerifierPipeline:
+    if isinstance(verifiers, VerifierPipeline):
+        return verifiers
+    # Plain verifiers may look at more than the state (history, depth), so
+    # only an explicit ``VerifierPipeline(memoize=True)`` caches verdicts.
+    return VerifierPipeline(verifiers, memoize=False)
+
+def _spent(budget: Optional[Budget]) -> bool:
+    return budget is not None and budget.exhausted
+
+def _dedup(dedup: Optional[Deduplicator], children: List[Tuple[Candidate, float]],
+           tracer: Optional[Tracer]) -> List[Tuple[Candidate, float]]:
+    if dedup is None or len(children) < 2:
+        return children
+    with trace_span(tracer, "dedup", n=len(children)) as dedup_span:
+        kept = dedup.keep([child.state for child, _ in children], [bonus for _, bonus in children])
+        dedup_span.set(kept=len(kept))
+    return [children[i] for i in kept]
+
+class _Stopping:
+    def __init__(self, score_threshold: Optional[float], patience: Optional[int], budget: Optional[Budget]):
+        self.score_threshold = score_threshold
+        self.patience = patience
+        self.budget = budget
+        self.best: Optional[Candidate] = None
+        self.stale = 0
+
+    def layer(self, step: int, frontier: List[Candidate], out_of_budget: bool) -> SearchLayer:
+        best = _best(self.best, frontier)
+        self.stale = 0 if best is not self.best else self.stale + 1
+        self.best = best
+        reason = None
+        if out_of_budget or _spent(self.budget):
+            reason = "budget"
+        elif self.score_threshold is not None and best.score >= self.score_threshold:
+            reason = "score_threshold"
+        elif self.patience is not None and self.stale >= self.patience:
+            reason = "plateau"
+        return SearchLayer(step=step, frontier=frontier, best=best, stop_reason=reason)
+
+def iter_nmlr_search(initial: Candidate,
+                     task: str,
+                     expand_fn: ExpandFn,
+                     verifiers: List[VerifierFn],
+                     scorer: ScorerFn,
+                     max_steps: int = 8,
+                     beam_size: int = 8,
+                     score_threshold: Optional[float] = None,
+                     patience: Optional[int] = None,
+                     budget: Optional[Budget] = None,
+                     dedup: Optional[Deduplicator] = None,
+                     transpositions: bool = False,
+                     tracer: Optional[Tracer] = None) -> Iterator[SearchLayer]:
+    """Run ``nmlr_search`` lazily, yielding a ``SearchLayer`` per layer.
+
+    ``verifiers`` may be a list or a ``VerifierPipeline``; either way the
+    whole layer is verified in one pass before any scorer call, so rejected
+    children never cost an LLM call. Verdicts are only memoized per state
+    when a ``VerifierPipeline`` with ``memoize=True`` is passed. Each layer's surviving frontier is
+    yielded as soon as it is scored; stopping iteration (``break``) skips
+    all remaining layers. The search
+    also stops on its own once the best score reaches ``score_threshold``,
+    after ``patience`` layers without a new best, or when ``budget`` runs out.
+    A budget is checked before every expand and score call; once exhausted,
+    the children scored so far form the final layer.
+
+    With a ``dedup`` (``nmlr.dedup.Deduplicator``), verified children that
+    are duplicates or near-duplicates of each other are collapsed before
+    scoring, keeping the one with the highest local bonus.
+
+    With ``transpositions=True`` each distinct state is kept, scored and
+    expanded at most once per search: identical verified children collapse to
+    the one with the highest local bonus, and states already reached in an
+    earlier layer are dropped; see ``nmlr.transposition``.
+
+    With a ``tracer`` (or inside an active ``Tracer`` span) each layer and
+    its expand, verify and score calls are recorded as spans; see
+    ``nmlr.tracing``.
+    """
+    batch = getattr(scorer, "score_batch", None)
+    pipeline = _pipeline(verifiers)
+    stopping = _Stopping(score_threshold, patience, budget)
+    tracer = tracer or current_tracer()
+    table = TranspositionTable() if transpositions else None
+    if table is not None:
+        table.add_root(initial.state)
+    frontier = [initial]
+
+    for step in range(max_steps):
+        with trace_span(tracer, "layer", layer=step) as layer_span:
+            children: List[Tuple[Candidate, float]] = []
+            out_of_budget = False
+            for cand in frontier:
+                if _spent(budget):
+                    out_of_budget = True
+                    break
+                with metered(budget), trace_span(tracer, "expand"):
+                    expanded = list(expand_fn(cand.state))
+                children.extend((cand.extend(new_state, 0.0), local_bonus) for new_state, local_bonus in expanded)
+
+            with trace_span(tracer, "verify", n=len(children)) as verify_span:
+                verdicts = pipeline.check_many([child for child, _ in children])
+                children = [pair for pair, ok in zip(children, verdicts) if ok]
+                verify_span.set(kept=len(children))
+            if table is not None:
+                children = table.filter(children)
+            children = _dedup(dedup, children, tracer)
+
+            top = _beam(beam_size, scorer)
+            if batch is None:
+                for child, local_bonus in children:
+                    if _spent(budget):
+                        out_of_budget = True
+                        break
+                    with metered(budget), trace_span(tracer, "score"):
+                        s, _ = scorer(task, child.state)
+                    child.score = s + local_bonus
+                    top.push(child)
+            elif children and _spent(budget):
+                out_of_budget = True
+            elif children:
+                with metered(budget), trace_span(tracer, "score", n=len(children)):
+                    scores = batch(task, [child.state for child, _ in children])
+                for (child, local_bonus), (s, _) in zip(children, scores):
+                    child.score = s + local_bonus
+                    top.push(child)
+
+            if not len(top):
+                break
+
+            frontier = top.items()
+            layer = stopping.layer(step, frontier, out_of_budget)
+            layer_span.set(frontier=len(frontier), best=layer.best.score, stop_reason=layer.stop_reason)
+        yield layer
+        if layer.stop_reason:
+            break
+
+class _Results:
+    def __init__(self, max_results: Optional[int]):
+        self._all: List[Candidate] = []
+        self._best = _TopK(max_results, _by_score, reverse=True) if max_results is not None else None
+
+    def add(self, frontier: List[Candidate]) -> None:
+        if self._best is None:
+            self._all.extend(frontier)
+            return
+        for cand in frontier:
+            self._best.push(cand)
+
+    def items(self) -> List[Candidate]:
+        return self._all if self._best is None else self._best.items()
+
 def nmlr_search(initial: Candidate,
                 task: str,
                 expand_fn: ExpandFn,
                 verifiers: List[VerifierFn],
                 scorer: ScorerFn,
                 max_steps: int = 8,
-                beam_size: int = 8) -> List[Candidate]:
+                beam_size: int = 8,
+                max_results: Optional[int] = None,
+                score_threshold: Optional[float] = None,
+                patience: Optional[int] = None,
+                budget: Optional[Budget] = None,
+                dedup: Optional[Deduplicator] = None,
+                transpositions: bool = False,
+                tracer: Optional[Tracer] = None) -> List[Candidate]:
+    """Beam search over ``expand_fn`` children.
+
+    Each layer keeps ``beam_size`` children, ordered by ascending score (or
+    the highest first for a scorer with ``higher_is_better = True``). By
+    default every layer's frontier is appended to the returned list; with
+    ``max_results`` only the ``max_results`` highest-scoring candidates seen
+    are kept (in a bounded heap) and returned highest first. See
+    ``iter_nmlr_search`` for the stopping rules; hitting one returns the
+    results gathered so far.
+    """
+    results = _Results(max_results)
+    for layer in iter_nmlr_search(initial, task, expand_fn, verifiers, scorer,
+                                  max_steps=max_steps, beam_size=beam_size,
+                                  score_threshold=score_threshold, patience=patience,
+                                  budget=budget, dedup=dedup,
+                                  transpositions=transpositions, tracer=tracer):
+        results.add(layer.frontier)
+    return results.items()
+
+async def _expand_list(expand_fn: ExpandFn, state: str, executor: Optional[Executor] = None) -> list:
+    # Materialize generator expand functions inside the metered call.
+    return list(await _call(expand_fn, state, executor=executor))
+
+async def _call(fn: Callable, *args, executor: Optional[Executor] = None) -> Any:
+    # Coroutine functions are awaited directly; blocking callables run in a
+    # worker thread of ``executor`` (asyncio's default pool if None), in a
+    # copy of the caller's context as ``asyncio.to_thread`` would, so they
+    # still overlap with each other.
+    if inspect.iscoroutinefunction(fn) or inspect.iscoroutinefunction(getattr(fn, "__call__", None)):
+        return await fn(*args)
+    ctx = contextvars.copy_context()
+    result = await asyncio.get_running_loop().run_in_executor(executor, functools.partial(ctx.run, fn, *args))
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+def _workers(concurrency: int) -> ThreadPoolExecutor:
+    # One thread per allowed call in flight: asyncio's default pool has
+    # min(32, cpu + 4) threads and would cap ``concurrency`` for sync calls.
+    return ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="nmlr-search")
+
+async def aiter_nmlr_search(initial: Candidate,
+                            task: str,
+                            expand_fn: ExpandFn,
+                            verifiers: List[VerifierFn],
+                            scorer: ScorerFn,
+                            max_steps: int = 8,
+                            beam_size: int = 8,
+                            concurrency: int = 8,
+                            score_threshold: Optional[float] = None,
+                            patience: Optional[int] = None,
+                            budget: Optional[Budget] = None,
+                            dedup: Optional[Deduplicator] = None,
+                            transpositions: bool = False,
+                            tracer: Optional[Tracer] = None) -> AsyncIterator[SearchLayer]:
+    """Async-iterator counterpart of ``iter_nmlr_search``; see
+    ``async_nmlr_search`` for how calls are run concurrently."""
+    sem = asyncio.Semaphore(concurrency)
+    pool = _workers(concurrency)
+    skipped = False
+    tracer = tracer or current_tracer()
+
+    async def limited(phase: str, fn: Callable, *args, **attrs) -> Any:
+        nonlocal skipped
+        async with sem:
+            if _spent(budget):
+                skipped = True
+                return None
+            with metered(budget), trace_span(tracer, phase, **attrs):
+                return await _call(fn, *args, executor=pool)
+
+    abatch = getattr(scorer, "ascore_batch", None) or getattr(scorer, "score_batch", None)
+    pipeline = _pipeline(verifiers)
+    stopping = _Stopping(score_threshold, patience, budget)
+    table = TranspositionTable() if transpositions else None
+    if table is not None:
+        table.add_root(initial.state)
     frontier = [initial]
-    results: List[Candidate] = []
 
-    for _ in range(max_steps):
-        new_frontier: List[Candidate] = []
-        for cand in frontier:
-            for new_state, local_bonus in expand_fn(cand.state):
-                child = cand.extend(new_state, 0.0)
-                if all(v.check(child) for v in verifiers):
-                    s, _ = scorer(task, child.state)
-                    child.score = s + local_bonus
-                    new_frontier.append(child)
+    try:
+        for step in range(max_steps):
+            skipped = False
+            with trace_span(tracer, "layer", layer=step) as layer_span:
+                expansions = await asyncio.gather(*[limited("expand", _expand_list, expand_fn, cand.state, pool)
+                                                    for cand in frontier])
 
-        if not new_frontier:
-            break
+                children = [(cand.extend(new_state, 0.0), local_bonus)
+                            for cand, expanded in zip(frontier, expansions)
+                            for new_state, local_bonus in expanded or ()]
+                with trace_span(tracer, "verify", n=len(children)) as verify_span:
+                    verdicts = pipeline.check_many([child for child, _ in children])
+                    children = [pair for pair, ok in zip(children, verdicts) if ok]
+                    verify_span.set(kept=len(children))
+                if table is not None:
+                    children = table.filter(children)
+                children = _dedup(dedup, children, tracer)
+
+                if not children:
+                    scores = []
+                elif abatch is not None:
+                    scores = await limited("score", abatch, task, [child.state for child, _ in children],
+                                           n=len(children)) or []
+                else:
+                    scores = await asyncio.gather(*[limited("score", scorer, task, child.state) for child, _ in children])
+
+                top = _beam(beam_size, scorer)
+                for (child, local_bonus), scored in zip(children, scores):
+                    if scored is None:
+                        continue
+                    child.score = scored[0] + local_bonus
+                    top.push(child)
+
+                if not len(top):
+                    break
+
+                frontier = top.items()
+                layer = stopping.layer(step, frontier, skipped)
+                layer_span.set(frontier=len(frontier), best=layer.best.score, stop_reason=layer.stop_reason)
+            yield layer
+            if layer.stop_reason:
+                break
+    finally:
+        pool.shutdown(wait=False)
 
-        new_frontier.sort(key=lambda c: c.score)
-        frontier = new_frontier[:beam_size]
-        results.extend(frontier)
+async def async_nmlr_search(initial: Candidate,
+                            task: str,
+                            expand_fn: ExpandFn,
+                            verifiers: List[VerifierFn],
+                            scorer: ScorerFn,
+                            max_steps: int = 8,
+                            beam_size: int = 8,
+                            concurrency: int = 8,
+                            max_results: Optional[int] = None,
+                            score_threshold: Optional[float] = None,
+                            patience: Optional[int] = None,
+                            budget: Optional[Budget] = None,
+                            dedup: Optional[Deduplicator] = None,
+                            transpositions: bool = False,
+                            tracer: Optional[Tracer] = None) -> List[Candidate]:
+    """Concurrent counterpart of ``nmlr_search``.
 
-    return results
+    All expansions of a layer run together, then all scorings of the verified
+    children, with at most ``concurrency`` calls in flight. ``expand_fn`` and
+    ``scorer`` may be plain or ``async`` callables (plain ones run in a pool
+    of ``concurrency`` threads owned by the search); a scorer exposing
+    ``ascore_batch`` or ``score_batch`` scores the layer in one call. Results
+    are ordered exactly as ``nmlr_search`` orders them.
+    """
+    results = _Results(max_results)
+    async for layer in aiter_nmlr_search(initial, task, expand_fn, verifiers, scorer,
+                                         max_steps=max_steps, beam_size=beam_size,
+                                         concurrency=concurrency, score_threshold=score_threshold,
+                                         patience=patience, budget=budget, dedup=dedup,
+                                         transpositions=transpositions, tracer=tracer):
+        results.add(layer.frontier)
+    return results.items()
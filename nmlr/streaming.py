@@ -0,0 +1,58 @@
+"""Stop conditions for ``LLM.complete_until``.
+
+A stop condition is called with the text streamed so far and returns the
+length to keep once enough has arrived, or ``None`` to keep reading. The
+stream is closed as soon as it fires, so the provider stops generating (and
+billing) the rest of the completion. ``key`` identifies the condition in
+cache keys.
+"""
+from typing import Optional
+
+class StopAfterLines:
+    """Stop once ``n`` non-empty lines are complete."""
+
+    def __init__(self, n: int):
+        self.n = n
+        self.key = f"lines:{n}"
+
+    def __call__(self, text: str) -> Optional[int]:
+        seen = 0
+        start = 0
+        while True:
+            end = text.find("\n", start)
+            if end < 0:
+                return None
+            if text[start:end].strip():
+                seen += 1
+                if seen >= self.n:
+                    return end
+            start = end + 1
+
+class StopAfterMarker:
+    """Stop at the end of the line after the first ``marker``: the rest of the
+    marker's own line, or the next non-empty line if the marker ends its line.
+    A chain of thought that uses the marker before its final answer is cut
+    at that first use."""
+
+    def __init__(self, marker: str = "Answer:"):
+        self.marker = marker
+        self.key = f"marker:{marker}"
+
+    def __call__(self, text: str) -> Optional[int]:
+        at = text.find(self.marker)
+        if at < 0:
+            return None
+        start = at + len(self.marker)
+        while True:
+            end = text.find("\n", start)
+            if end < 0:
+                return None
+            if text[start:end].strip():
+                return end
+            start = end + 1
+
+def stop_after_lines(n: int) -> StopAfterLines:
+    return StopAfterLines(n)
+
+def stop_after_marker(marker: str = "Answer:") -> StopAfterMarker:
+    return StopAfterMarker(marker)
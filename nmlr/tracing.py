@@ -0,0 +1,175 @@
+"""Per-phase spans for searches and LLM requests.
+
+Pass a ``Tracer`` to ``nmlr_search`` (or open ``tracer.span(...)`` around a
+call) and every layer, expansion, verification pass, scoring call and LLM
+request inside it is recorded with its duration and attributes: LLM spans
+carry provider, model, input/output tokens and retry count. Spans nest
+through a ContextVar, so they follow threads started with
+``asyncio.to_thread`` and asyncio tasks. With no tracer active, ``span`` is
+one ContextVar lookup returning a shared no-op.
+"""
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+# Spans whose durations are summed per layer by ``Tracer.summary``.
+PHASES = ("expand", "verify", "dedup", "score", "llm")
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "id", "parent", "start", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: dict, parent: Optional["Span"]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.id = next(tracer._ids)
+        self.parent = parent.id if parent is not None else None
+        if parent is not None and "layer" not in attrs and "layer" in parent.attrs:
+            attrs["layer"] = parent.attrs["layer"]
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        end = time.perf_counter()
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._finish(self, end)
+        return False
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+_NOOP = _NoopSpan()
+_current: ContextVar[Optional[Span]] = ContextVar("nmlr_current_span", default=None)
+
+def _lane() -> int:
+    # Concurrent asyncio tasks share a thread; give each its own trace lane.
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return id(task) if task is not None else threading.get_ident()
+
+class Tracer:
+    """Collects finished spans as event dicts.
+
+    Each event has ``name``, ``id``, ``parent``, ``ts`` and ``dur`` (seconds
+    since the tracer was created), ``lane`` and the span's attributes.
+    ``callback`` is called with every event as it finishes; ``keep=False``
+    skips storing events, for callback-only use.
+    """
+
+    def __init__(self, callback: Optional[Callable[[dict], None]] = None, keep: bool = True):
+        self.callback = callback
+        self.keep = keep
+        self.events: List[dict] = []
+        self.origin = time.perf_counter()
+        self._ids = itertools.count(1)
+
+    def span(self, name: str, **attrs) -> Span:
+        parent = _current.get()
+        return Span(self, name, attrs, parent if parent is not None and parent.tracer is self else None)
+
+    def _finish(self, span: Span, end: float) -> None:
+        event = {"name": span.name, "id": span.id, "parent": span.parent,
+                 "ts": span.start - self.origin, "dur": end - span.start, "lane": _lane()}
+        event.update(span.attrs)
+        if self.keep:
+            self.events.append(event)
+        if self.callback is not None:
+            self.callback(event)
+
+    def summary(self) -> List[dict]:
+        """Per-layer totals: wall time, summed seconds per phase, LLM calls,
+        retries and tokens. Phase times of concurrent calls add up, so they
+        can exceed the layer's wall time in the async search."""
+        layers: Dict[int, dict] = OrderedDict()
+        for ev in sorted(self.events, key=lambda e: e["ts"]):
+            step = ev.get("layer")
+            if step is None:
+                continue
+            row = layers.get(step)
+            if row is None:
+                row = layers[step] = {"layer": step, "wall_s": 0.0, **{f"{p}_s": 0.0 for p in PHASES},
+                                      "llm_calls": 0, "retries": 0, "input_tokens": 0, "output_tokens": 0,
+                                      "cached_tokens": 0}
+            if ev["name"] == "layer":
+                row["wall_s"] += ev["dur"]
+            elif ev["name"] in PHASES:
+                row[f"{ev['name']}_s"] += ev["dur"]
+            if ev["name"] == "llm":
+                row["llm_calls"] += 1
+                row["retries"] += ev.get("retries") or 0
+                row["input_tokens"] += ev.get("input") or 0
+                row["output_tokens"] += ev.get("output") or 0
+                row["cached_tokens"] += ev.get("cached") or 0
+        return [layers[k] for k in sorted(layers)]
+
+    def export_jsonl(self, path: str) -> None:
+        _makedirs(path)
+        with open(path, "w") as w:
+            for ev in self.events:
+                w.write(json.dumps(ev, default=str) + "\n")
+
+    def export_chrome(self, path: str) -> None:
+        """Write a Chrome trace (open in chrome://tracing or Perfetto)."""
+        pid = os.getpid()
+        lanes: Dict[int, int] = {}
+        trace = []
+        for ev in self.events:
+            args = {k: v for k, v in ev.items() if k not in ("name", "ts", "dur", "lane")}
+            trace.append({"name": ev["name"], "cat": ev["name"], "ph": "X", "pid": pid,
+                          "tid": lanes.setdefault(ev["lane"], len(lanes) + 1),
+                          "ts": ev["ts"] * 1e6, "dur": ev["dur"] * 1e6, "args": args})
+        _makedirs(path)
+        with open(path, "w") as w:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, w, default=str)
+
+def _makedirs(path: str) -> None:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+def current_tracer() -> Optional[Tracer]:
+    parent = _current.get()
+    return parent.tracer if parent is not None else None
+
+def span(name: str, **attrs):
+    """Open a child span of the active span, or a no-op if none is active."""
+    parent = _current.get()
+    if parent is None:
+        return _NOOP
+    return Span(parent.tracer, name, attrs, parent)
+
+def trace_span(tracer: Optional[Tracer], name: str, **attrs):
+    """``tracer.span(...)`` when tracing, else the shared no-op."""
+    if tracer is None:
+        return _NOOP
+    return tracer.span(name, **attrs)
+
+def annotate(**attrs) -> None:
+    """Add attributes to the active span, if any."""
+    parent = _current.get()
+    if parent is not None:
+        parent.attrs.update(attrs)
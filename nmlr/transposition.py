@@ -0,0 +1,95 @@
+"""Transposition table for ``nmlr_search`` and a memoizing ``expand_fn`` wrapper.
+
+Expansion prompts usually depend only on the current state, and different
+parents keep proposing the same short answers. With ``transpositions=True``
+a search keeps one node per distinct state: duplicates within a layer merge
+into the copy with the highest local bonus, and a state already reached in
+an earlier (shallower) layer is dropped, since it was scored then and, if
+it made the beam, expanded too. Each distinct state is therefore scored and
+expanded at most once per search, along its best (shortest, then
+highest-bonus) path.
+"""
+import inspect
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Set, Tuple
+
+class TranspositionTable:
+    def __init__(self):
+        self.seen: Set[str] = set()
+        self.collapsed = 0
+
+    def add_root(self, state: str) -> None:
+        self.seen.add(state)
+
+    def filter(self, children: List[tuple]) -> List[tuple]:
+        """Collapse ``(candidate, local_bonus)`` pairs to one per unseen state,
+        in first-seen order, and mark those states as seen."""
+        kept: List[tuple] = []
+        at: Dict[str, int] = {}
+        for pair in children:
+            state = pair[0].state
+            if state in self.seen and state not in at:
+                self.collapsed += 1
+                continue
+            i = at.get(state)
+            if i is None:
+                at[state] = len(kept)
+                kept.append(pair)
+                continue
+            self.collapsed += 1
+            if pair[1] > kept[i][1]:
+                kept[i] = pair
+        self.seen.update(at)
+        return kept
+
+def memoize_expand(expand_fn: Callable, maxsize: int = 4096) -> Callable:
+    """Wrap ``expand_fn`` (plain or ``async``) so each state is expanded once,
+    keeping the ``maxsize`` most recently used expansions. Share one wrapper
+    across searches whose expansions do not depend on the task. The wrapper
+    has ``cache_info()`` and ``cache_clear()``; concurrent first calls for the
+    same state may both reach ``expand_fn``."""
+    cache: "OrderedDict[str, Tuple[tuple, ...]]" = OrderedDict()
+    lock = threading.Lock()
+    stats = {"hits": 0, "misses": 0}
+
+    def lookup(state: str):
+        with lock:
+            hit = cache.get(state)
+            if hit is None:
+                stats["misses"] += 1
+                return None
+            cache.move_to_end(state)
+            stats["hits"] += 1
+            return list(hit)
+
+    def store(state: str, expanded) -> list:
+        expanded = tuple(expanded)
+        with lock:
+            cache[state] = expanded
+            cache.move_to_end(state)
+            while len(cache) > maxsize:
+                cache.popitem(last=False)
+        return list(expanded)
+
+    if inspect.iscoroutinefunction(expand_fn):
+        async def wrapper(state: str):
+            hit = lookup(state)
+            return hit if hit is not None else store(state, await expand_fn(state))
+    else:
+        def wrapper(state: str):
+            hit = lookup(state)
+            return hit if hit is not None else store(state, expand_fn(state))
+
+    def cache_info() -> dict:
+        with lock:
+            return {"hits": stats["hits"], "misses": stats["misses"], "size": len(cache), "maxsize": maxsize}
+
+    def cache_clear() -> None:
+        with lock:
+            cache.clear()
+
+    wrapper.cache_info = cache_info
+    wrapper.cache_clear = cache_clear
+    wrapper.__wrapped__ = expand_fn
+    return wrapper
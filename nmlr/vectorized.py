@@ -0,0 +1,107 @@
+"""Array-level scoring for whole frontiers.
+
+An array scorer is called as ``scorer(task, states)`` with a sequence (or
+NumPy string array) of states and returns a float array with one score per
+state. The built-ins below run as NumPy string ufuncs instead of one Python
+call per child; ``Blend`` combines several of them with weights, and
+``from_scalar`` / ``as_scorer`` adapt between array scorers and the scalar
+``(task, state) -> (score, reason)`` scorers ``nmlr_search`` takes.
+``length_blend`` is ``blended_scorer`` in this form.
+"""
+import re
+from typing import Callable, List, Sequence, Tuple, Union
+import numpy as np
+from .scoring import Reason, Score
+
+States = Union[Sequence[str], np.ndarray]
+ArrayScorer = Callable[[str, States], np.ndarray]
+
+def as_array(states: States) -> np.ndarray:
+    """``states`` as a NumPy unicode array (converted once per layer)."""
+    if isinstance(states, np.ndarray) and states.dtype.kind == "U":
+        return states
+    return np.array(list(states), dtype=str)
+
+class LengthPenalty:
+    """``heuristic_len_penalty`` for every state: ``max(0, 1 - len / scale)``."""
+
+    def __init__(self, scale: float = 500.0):
+        self.scale = scale
+
+    def __call__(self, task: str, states: States) -> np.ndarray:
+        lengths = np.char.str_len(as_array(states)).astype(float)
+        return np.maximum(0.0, 1.0 - lengths / self.scale)
+
+class KeywordFeature:
+    """Share of ``keywords`` each state contains (case-insensitive unless
+    ``case_sensitive``)."""
+
+    def __init__(self, keywords: Sequence[str], case_sensitive: bool = False):
+        self.case_sensitive = case_sensitive
+        self.keywords = [k if case_sensitive else k.lower() for k in keywords]
+
+    def __call__(self, task: str, states: States) -> np.ndarray:
+        arr = as_array(states)
+        if not self.case_sensitive:
+            arr = np.char.lower(arr)
+        hits = np.zeros(len(arr))
+        for k in self.keywords:
+            hits += np.char.find(arr, k) >= 0
+        return hits / max(len(self.keywords), 1)
+
+class RegexFeature:
+    """1.0 where ``pattern`` matches the state (``re.search``), else 0.0."""
+
+    def __init__(self, pattern: str, flags: int = 0):
+        self.pattern = re.compile(pattern, flags)
+
+    def __call__(self, task: str, states: States) -> np.ndarray:
+        search = self.pattern.search
+        return np.fromiter((search(s) is not None for s in as_array(states).tolist()),
+                           dtype=float, count=len(states))
+
+class Blend:
+    """Weighted sum of score columns: ``sum(w * scorer(task, states))``."""
+
+    def __init__(self, scorers: Sequence[ArrayScorer], weights: Sequence[float]):
+        if len(scorers) != len(weights):
+            raise ValueError("need one weight per scorer")
+        self.scorers = list(scorers)
+        self.weights = np.asarray(weights, dtype=float)
+
+    def __call__(self, task: str, states: States) -> np.ndarray:
+        arr = as_array(states)
+        if not len(arr):
+            return np.zeros(0)
+        columns = np.column_stack([np.asarray(s(task, arr), dtype=float) for s in self.scorers])
+        return columns @ self.weights
+
+def from_scalar(scorer: Callable[[str, str], Tuple[Score, Reason]]) -> ArrayScorer:
+    """Array scorer over a scalar ``(task, state) -> (score, reason)`` scorer,
+    using its ``score_batch`` when it has one. Reasons are dropped."""
+    def array_scorer(task: str, states: States) -> np.ndarray:
+        states = as_array(states).tolist()
+        batch = getattr(scorer, "score_batch", None)
+        scored = batch(task, states) if batch is not None else [scorer(task, s) for s in states]
+        return np.fromiter((s for s, _ in scored), dtype=float, count=len(states))
+    return array_scorer
+
+def length_blend(llm_eval: Callable[[str, str], Tuple[Score, Reason]]) -> Blend:
+    """``blended_scorer``'s 0.9 * LLM + 0.1 * length-penalty blend."""
+    return Blend([from_scalar(llm_eval), LengthPenalty()], [0.9, 0.1])
+
+class ArrayScorerAdapter:
+    """Scalar search ``scorer`` over an array scorer; ``score_batch`` scores
+    a layer in one array call, which is what ``nmlr_search`` uses."""
+
+    def __init__(self, array_scorer: ArrayScorer):
+        self.array_scorer = array_scorer
+
+    def __call__(self, task: str, candidate_state: str) -> Tuple[Score, Reason]:
+        return self.score_batch(task, [candidate_state])[0]
+
+    def score_batch(self, task: str, states: Sequence[str]) -> List[Tuple[Score, Reason]]:
+        return [(s, "") for s in np.asarray(self.array_scorer(task, states), dtype=float).tolist()]
+
+def as_scorer(array_scorer: ArrayScorer) -> ArrayScorerAdapter:
+    return ArrayScorerAdapter(array_scorer)
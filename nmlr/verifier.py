@@ -1,15 +1,113 @@
+import re
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Iterable, List, Sequence
+
 class Verifier:
     def check(self, candidate) -> bool:
         raise NotImplementedError
 
+    def check_many(self, candidates: Sequence) -> List[bool]:
+        return [self.check(c) for c in candidates]
+
 class NonEmptyAnswer(Verifier):
     def check(self, candidate) -> bool:
         return bool(str(candidate.state).strip())
 
+    def check_many(self, candidates: Sequence) -> List[bool]:
+        return [bool(str(c.state).strip()) for c in candidates]
+
 class NoContradiction(Verifier):
+    _pattern = re.compile("contradiction", re.IGNORECASE)
+
     def check(self, candidate) -> bool:
-        return "contradiction" not in str(candidate.state).lower()
+        return self._pattern.search(str(candidate.state)) is None
+
+    def check_many(self, candidates: Sequence) -> List[bool]:
+        # One regex pass over all states joined by NULs, mapping each match
+        # back to the candidate whose text it falls in.
+        texts = [str(c.state) for c in candidates]
+        starts, offset = [], 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + 1
+        ok = [True] * len(texts)
+        for m in self._pattern.finditer("\0".join(texts)):
+            ok[bisect_right(starts, m.start()) - 1] = False
+        return ok
 
 class AlwaysTrue(Verifier):
     def check(self, candidate) -> bool:
         return True
+
+    def check_many(self, candidates: Sequence) -> List[bool]:
+        return [True] * len(candidates)
+
+class VerifierPipeline(Verifier):
+    """Runs several verifiers over a whole list of candidates at once.
+
+    Verifiers are applied cheapest-and-most-selective first, ranked by their
+    measured time per candidate divided by their rejection rate, and each one
+    only sees the candidates every earlier verifier accepted. Verdicts are
+    memoized per state (set ``memoize=False`` for verifiers that look at more
+    than ``candidate.state``).
+    """
+
+    def __init__(self, verifiers: Iterable[Verifier], memoize: bool = True, max_memo: int = 100_000):
+        self.verifiers = list(verifiers)
+        self.memoize = memoize
+        self.max_memo = max_memo
+        # Per verifier: [candidates checked, candidates rejected, seconds spent].
+        self.stats = [[0, 0, 0.0] for _ in self.verifiers]
+        self._memo: "OrderedDict[object, bool]" = OrderedDict()
+
+    def _rank(self, i: int) -> float:
+        checked, rejected, seconds = self.stats[i]
+        if not checked:
+            return 0.0
+        rejection_rate = (rejected + 1) / (checked + 2)
+        return (seconds / checked) / rejection_rate
+
+    def order(self) -> List[Verifier]:
+        return [self.verifiers[i] for i in sorted(range(len(self.verifiers)), key=self._rank)]
+
+    def check(self, candidate) -> bool:
+        return self.check_many([candidate])[0]
+
+    def check_many(self, candidates: Sequence) -> List[bool]:
+        verdicts: List[object] = [None] * len(candidates)
+        pending: "OrderedDict[object, List[int]]" = OrderedDict()
+        for i, c in enumerate(candidates):
+            key = c.state if self.memoize else i
+            if self.memoize and key in self._memo:
+                verdicts[i] = self._memo[key]
+            else:
+                pending.setdefault(key, []).append(i)
+
+        alive = [idx[0] for idx in pending.values()]
+        for vi in sorted(range(len(self.verifiers)), key=self._rank):
+            if not alive:
+                break
+            verifier = self.verifiers[vi]
+            t0 = time.perf_counter()
+            batch = [candidates[i] for i in alive]
+            check_many = getattr(verifier, "check_many", None)
+            oks = check_many(batch) if check_many is not None else [verifier.check(c) for c in batch]
+            stats = self.stats[vi]
+            stats[2] += time.perf_counter() - t0
+            stats[0] += len(alive)
+            survivors = [i for i, ok in zip(alive, oks) if ok]
+            stats[1] += len(alive) - len(survivors)
+            alive = survivors
+
+        passed = set(alive)
+        for key, idx in pending.items():
+            ok = idx[0] in passed
+            for i in idx:
+                verdicts[i] = ok
+            if self.memoize:
+                self._memo[key] = ok
+                if len(self._memo) > self.max_memo:
+                    self._memo.popitem(last=False)
+        return verdicts
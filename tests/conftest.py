@@ -0,0 +1,9 @@
+import pytest
+from nmlr.llm_adapters import clear_llm_registry
+
+@pytest.fixture(autouse=True)
+def _fresh_llm_registry():
+    # get_llm pools clients per process; keep tests from sharing mocked SDKs.
+    clear_llm_registry()
+    yield
+    clear_llm_registry()
@@ -0,0 +1,93 @@
+import csv
+import gc
+import multiprocessing
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from nmlr.accounting import TokenAccountant, configure_accounting, get_accountant
+from nmlr.llm_adapters import _append_token_log
+
+def test_accountant_aggregates_and_flushes(tmp_path):
+    sink = tmp_path / "nested" / "token_log.csv"
+    acc = TokenAccountant(sink_path=str(sink), flush_interval=60)
+    acc.record("openai", "m1", {"input": 10, "output": 5}, run="r1")
+    acc.record("openai", "m2", {"input": 1, "output": None}, run="r1")
+    acc.record("anthropic", "m3", {"input": 2, "output": 2}, run="r2")
+
+    assert acc.totals() == {"calls": 3, "input": 13, "output": 7}
+    assert acc.totals(provider="openai") == {"calls": 2, "input": 11, "output": 5}
+    assert acc.totals(run="r2", model="m3") == {"calls": 1, "input": 2, "output": 2}
+    assert not sink.exists()
+
+    acc.close()
+    rows = list(csv.reader(open(sink)))
+    assert [r[1:] for r in rows] == [["openai", "m1", "10", "5", "r1"],
+                                     ["openai", "m2", "1", "", "r1"],
+                                     ["anthropic", "m3", "2", "2", "r2"]]
+
+def test_accountant_is_thread_safe(tmp_path):
+    sink = tmp_path / "token_log.csv"
+    acc = TokenAccountant(sink_path=str(sink), flush_interval=0.001, max_pending=7)
+
+    def worker():
+        for _ in range(500):
+            acc.record("openai", "m", {"input": 1, "output": 2})
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    acc.close()
+
+    assert acc.totals() == {"calls": 4000, "input": 4000, "output": 8000}
+    rows = list(csv.reader(open(sink)))
+    assert len(rows) == 4000
+    assert all(len(r) == 6 for r in rows)
+
+def test_flush_failure_keeps_rows(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    acc = TokenAccountant(sink_path=str(blocker / "token_log.csv"), flush_interval=60)
+    acc.record("openai", "m", {"input": 1, "output": 1})
+    acc.flush()
+    assert len(acc._pending) == 1
+
+def test_append_token_log_feeds_process_accountant(tmp_path):
+    acc = configure_accounting(sink_path=str(tmp_path / "log.csv"), run="test-run")
+    _append_token_log("openai", "m", {"input": 3, "output": 4})
+    assert get_accountant() is acc
+    assert acc.totals(run="test-run") == {"calls": 1, "input": 3, "output": 4}
+    acc.close()
+
+def _record_in_worker(i):
+    get_accountant().record("openai", "m", {"input": i, "output": 1})
+
+def test_worker_processes_flush_on_exit(tmp_path):
+    sink = tmp_path / "token_log.csv"
+    for method in ("fork", "spawn"):
+        ctx = multiprocessing.get_context(method)
+        with ProcessPoolExecutor(2, mp_context=ctx, initializer=configure_accounting,
+                                 initargs=(str(sink), 60)) as pool:
+            list(pool.map(_record_in_worker, range(6)))
+    assert len(list(csv.reader(open(sink)))) == 12
+
+def _child_totals(queue):
+    get_accountant().record("openai", "m", {"input": 1, "output": 1})
+    queue.put(get_accountant().totals())
+
+def test_replaced_accountants_are_released_and_forks_start_empty(tmp_path):
+    old = weakref.ref(configure_accounting(sink_path=str(tmp_path / "a.csv"), flush_interval=60))
+    acc = configure_accounting(sink_path=str(tmp_path / "b.csv"), flush_interval=60)
+    gc.collect()
+    assert old() is None
+
+    acc.record("openai", "m", {"input": 5, "output": 5})
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    child = ctx.Process(target=_child_totals, args=(queue,))
+    child.start()
+    assert queue.get(timeout=10) == {"calls": 1, "input": 1, "output": 1}
+    child.join()
+    acc.close()
+    assert len(list(csv.reader(open(tmp_path / "b.csv")))) == 2
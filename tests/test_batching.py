@@ -0,0 +1,179 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesParser
+from email.policy import default
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+import pytest
+from nmlr.batching import BatchingLLM, OpenAIBatchSubmitter
+from nmlr.budget import Budget, metered
+from nmlr.llm_adapters import LLMResponse
+
+def _echo(batches):
+    def submit(requests):
+        batches.append(len(requests))
+        return [LLMResponse(f"re: {p}", {"input": 1, "output": 1}) for p, _ in requests]
+    return submit
+
+@patch('nmlr.llm_adapters._append_token_log')
+def test_concurrent_calls_share_one_submission(mock_log):
+    batches = []
+    llm = BatchingLLM(_echo(batches), model="m", linger=0.2)
+    budget = Budget()
+
+    def call(i):
+        with metered(budget):
+            return llm.complete(f"p{i}").text
+
+    with ThreadPoolExecutor(8) as pool:
+        assert list(pool.map(call, range(8))) == [f"re: p{i}" for i in range(8)]
+    assert batches == [8]
+    assert budget.calls == 8
+
+@patch('nmlr.llm_adapters._append_token_log')
+def test_max_batch_splits_and_errors_reach_every_caller(mock_log):
+    batches = []
+    llm = BatchingLLM(_echo(batches), model="m", max_batch=3, linger=0.2)
+    with ThreadPoolExecutor(6) as pool:
+        list(pool.map(llm.complete, ["a", "b", "c", "d", "e", "f"]))
+    assert batches == [3, 3]
+
+    failing = BatchingLLM(lambda reqs: [], model="m", linger=0.01)
+    with pytest.raises(RuntimeError):
+        failing.complete("x")
+
+def _completion(text):
+    return {"id": "c", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7}}
+
+@patch('openai.OpenAI')
+def test_openai_batch_submitter_round_trip(mock_openai):
+    client = mock_openai.return_value
+    client.files.create.return_value = Mock(id="file-in")
+    client.batches.create.return_value = Mock(id="b1", status="in_progress")
+    client.batches.retrieve.return_value = Mock(id="b1", status="completed", output_file_id="file-out")
+    out = [{"custom_id": "req-1", "response": {"status_code": 200, "body": _completion("second")}},
+           {"custom_id": "req-0", "response": {"status_code": 200, "body": _completion("first")}}]
+    client.files.content.return_value = Mock(text="\n".join(json.dumps(r) for r in out))
+
+    submit = OpenAIBatchSubmitter(model="gpt-4o-mini", base_url="http://localhost:8000/v1", poll_interval=0)
+    responses = submit([("p0", "sys"), ("p1", None)])
+
+    assert mock_openai.call_args.kwargs["base_url"] == "http://localhost:8000/v1"
+    assert [r.text for r in responses] == ["first", "second"]
+    assert responses[0].token_usage == {"input": 5, "output": 2}
+    lines = [json.loads(ln) for ln in client.files.create.call_args.kwargs["file"][1].decode().splitlines()]
+    assert lines[0]["body"]["messages"][0] == {"role": "system", "content": "sys"}
+    assert lines[1]["custom_id"] == "req-1" and len(lines[1]["body"]["messages"]) == 1
+    assert client.batches.create.call_args.kwargs["input_file_id"] == "file-in"
+
+@patch('openai.OpenAI')
+def test_failed_batch_raises(mock_openai):
+    client = mock_openai.return_value
+    client.batches.create.return_value = Mock(id="b1", status="failed", output_file_id=None)
+    with pytest.raises(RuntimeError):
+        OpenAIBatchSubmitter(poll_interval=0)([("p", None)])
+
+@patch('nmlr.llm_adapters._append_token_log')
+def test_missing_responses_fail_alone_or_fall_back(mock_log):
+    def submit(requests):
+        return [None if p == "bad" else LLMResponse(f"re: {p}", {"input": 1, "output": 1}) for p, _ in requests]
+
+    llm = BatchingLLM(submit, model="m", linger=0.2)
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(llm.complete, p) for p in ("a", "bad", "b")]
+    assert [futures[0].result().text, futures[2].result().text] == ["re: a", "re: b"]
+    with pytest.raises(RuntimeError):
+        futures[1].result()
+
+    fallback = Mock()
+    fallback.complete.return_value = LLMResponse("direct", {"input": 2, "output": 2})
+    llm = BatchingLLM(submit, model="m", linger=0.01, fallback=fallback)
+    assert llm.complete("bad", "sys").text == "direct"
+    fallback.complete.assert_called_once_with("bad", "sys")
+
+class _BatchServer(ThreadingHTTPServer):
+    """Local stand-in for the Batch API endpoints ``OpenAIBatchSubmitter``
+    uses. Requests whose prompt is "bad" come back as errored lines."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _BatchHandler)
+        self.files, self.batches = {}, {}
+
+    def run(self, input_text):
+        rows = []
+        for ln in input_text.splitlines():
+            req = json.loads(ln)
+            prompt = req["body"]["messages"][-1]["content"]
+            if prompt == "bad":
+                rows.append({"custom_id": req["custom_id"], "response": {"status_code": 400, "body": {"error": {}}}})
+            else:
+                rows.append({"custom_id": req["custom_id"],
+                             "response": {"status_code": 200, "body": _completion(f"re: {prompt}")}})
+        return "\n".join(json.dumps(r) for r in rows)
+
+class _BatchHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _json(self, obj):
+        data = json.dumps(obj).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        srv = self.server
+        if self.path == "/v1/files":
+            msg = BytesParser(policy=default).parsebytes(
+                b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + body)
+            part = next(p for p in msg.iter_parts() if p.get_param("name", header="content-disposition") == "file")
+            fid = f"file-{len(srv.files)}"
+            srv.files[fid] = part.get_payload(decode=True).decode()
+            self._json({"id": fid, "object": "file", "bytes": len(body), "created_at": 0,
+                        "filename": "nmlr_batch.jsonl", "purpose": "batch", "status": "processed"})
+        elif self.path == "/v1/batches":
+            req = json.loads(body)
+            out = f"file-{len(srv.files)}"
+            srv.files[out] = srv.run(srv.files[req["input_file_id"]])
+            bid = f"batch-{len(srv.batches)}"
+            srv.batches[bid] = {"id": bid, "object": "batch", "endpoint": req["endpoint"], "created_at": 0,
+                                "input_file_id": req["input_file_id"], "completion_window": req["completion_window"],
+                                "status": "in_progress", "output_file_id": out}
+            self._json({**srv.batches[bid], "output_file_id": None})
+        else:
+            self.send_error(404)
+
+    def do_GET(self):
+        srv = self.server
+        parts = self.path.strip("/").split("/")
+        if parts[:2] == ["v1", "batches"]:
+            self._json({**srv.batches[parts[2]], "status": "completed"})
+        elif parts[:2] == ["v1", "files"] and parts[3:] == ["content"]:
+            data = srv.files[parts[2]].encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self.send_error(404)
+
+@patch('nmlr.llm_adapters._append_token_log')
+def test_batch_round_trip_against_local_server(mock_log, monkeypatch):
+    server = _BatchServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("NMLR_TEST_KEY", "local")
+    try:
+        submit = OpenAIBatchSubmitter(model="gpt-4o-mini", base_url=f"http://127.0.0.1:{server.server_port}/v1",
+                                      api_key_env="NMLR_TEST_KEY", poll_interval=0)
+        responses = submit([("a", "sys"), ("bad", None), ("b", None)])
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert [r and r.text for r in responses] == ["re: a", None, "re: b"]
+    assert responses[0].token_usage == {"input": 5, "output": 2}
@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+SCRIPT = os.path.join(ROOT, "benchmarks", "bench_search.py")
+
+def _run(out, seed, *extra):
+    env = dict(os.environ, PYTHONHASHSEED=str(seed), PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, SCRIPT, "--beams", "4", "--branching", "3", "--depths", "3",
+                           "--micro-n", "50", "--repeat", "1", "--out", out, *extra],
+                          env=env, capture_output=True, text=True, timeout=120)
+
+def _calls(path):
+    with open(path) as f:
+        return {r["name"]: r["llm_calls"] for r in json.load(f)["results"]}
+
+def test_benchmark_smoke_is_reproducible_across_processes(tmp_path):
+    a, b = str(tmp_path / "a.json"), str(tmp_path / "b.json")
+    assert _run(a, 1).returncode == 0
+    proc = _run(b, 2, "--compare", a, "--threshold", "1000")
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    assert _calls(a) == _calls(b)
+    assert _calls(a)["search/sync/b4_k3_d3"] > 0
+
+def test_synthetic_workload_does_not_depend_on_hash_seed():
+    code = ("import bench_search as b; t = b.PhaseTimer(); "
+            "print(b.synthetic_expand(4, 0, t)('root'), b.synthetic_scorer(0, t)('task', 'root|1'))")
+    outs = set()
+    for seed in (1, 2):
+        env = dict(os.environ, PYTHONHASHSEED=str(seed), PYTHONPATH=os.pathsep.join([ROOT, os.path.dirname(SCRIPT)]))
+        outs.add(subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                                check=True).stdout)
+    assert len(outs) == 1
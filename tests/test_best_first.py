@@ -0,0 +1,53 @@
+import asyncio
+from collections import Counter
+from nmlr.best_first import async_best_first_search, best_first_search
+from nmlr.budget import Budget, record_usage
+from nmlr.candidate import Candidate
+from nmlr.tracing import Tracer
+
+SCORES = {"a": 0.9, "b": 0.1, "aa": 0.5, "ab": 0.95, "ba": 1.0, "bb": 0.0}
+
+def _expand(calls):
+    def expand_fn(state):
+        calls[state] += 1
+        return [(state + "a", 0.0), (state + "b", 0.0)] if len(state) < 3 else []
+    return expand_fn
+
+def _scorer(task, state):
+    return SCORES.get(state, 0.2), ""
+
+def test_expands_most_promising_candidate_first():
+    calls = Counter()
+    results = best_first_search(Candidate(""), "t", _expand(calls), [], _scorer, max_expansions=3)
+    assert list(calls) == ["", "a", "ab"]
+    assert [c.state for c in results[:3]] == ["ab", "a", "aa"]
+    assert results[0].history == ["", "a"]
+
+def test_heuristic_and_max_depth_shape_the_search():
+    calls = Counter()
+    best_first_search(Candidate(""), "t", _expand(calls), [], _scorer, max_expansions=10,
+                      heuristic=lambda c: 1.0 if c.state.startswith("b") else 0.0, max_depth=2)
+    assert list(calls) == ["", "b", "a"]
+
+def test_stops_at_score_threshold_and_budget():
+    calls = Counter()
+    results = best_first_search(Candidate(""), "t", _expand(calls), [], _scorer,
+                                score_threshold=0.9, max_results=1)
+    assert list(calls) == [""] and results[0].state == "a"
+
+    def metered_scorer(task, state):
+        record_usage("openai", "m", {"input": 1, "output": 1})
+        return _scorer(task, state)
+
+    budget = Budget(max_calls=3)
+    results = best_first_search(Candidate(""), "t", _expand(Counter()), [], metered_scorer, budget=budget)
+    assert budget.calls == 3
+    assert [c.state for c in results] == ["a", "aa", "b"]
+
+def test_async_matches_sync_and_traces_expansions():
+    tracer = Tracer()
+    sync = best_first_search(Candidate(""), "t", _expand(Counter()), [], _scorer, max_expansions=5)
+    res = asyncio.run(async_best_first_search(Candidate(""), "t", _expand(Counter()), [], _scorer,
+                                              max_expansions=5, tracer=tracer))
+    assert [(c.state, c.score) for c in res] == [(c.state, c.score) for c in sync]
+    assert sum(e["name"] == "layer" for e in tracer.events) == 5
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import pytest
+from nmlr.budget import Budget, estimate_cost, metered, record_usage
+from nmlr.candidate import Candidate
+from nmlr.search import nmlr_search, iter_nmlr_search, async_nmlr_search
+
+def test_budget_records_only_inside_metered_block():
+    budget = Budget(max_tokens=100)
+    record_usage("openai", "gpt-4o-mini", {"input": 50, "output": 50})
+    assert budget.calls == 0
+    with metered(budget):
+        record_usage("openai", "gpt-4o-mini", {"input": 40, "output": 10})
+    assert budget.spent() == {"calls": 1, "tokens": 50, "usd": estimate_cost("openai", "gpt-4o-mini", {"input": 40, "output": 10})}
+    assert not budget.exhausted
+    with metered(budget):
+        record_usage("openai", "gpt-4o-mini", {"input": 50, "output": None})
+    assert budget.exhausted
+
+def test_metered_is_thread_local():
+    budget = Budget()
+    with metered(budget):
+        t = threading.Thread(target=record_usage, args=("openai", "m", {"input": 1, "output": 1}))
+        t.start()
+        t.join()
+    assert budget.calls == 0
+
+def _llm_like(state_suffixes, score_of):
+    def expand(state):
+        record_usage("openai", "m", {"input": 1, "output": 1})
+        return [(state + suffix, 0.0) for suffix in state_suffixes]
+
+    def scorer(task, state):
+        record_usage("openai", "m", {"input": 1, "output": 1})
+        return score_of(state), "reason"
+
+    return expand, scorer
+
+def test_search_stops_at_score_threshold():
+    expand, scorer = _llm_like(["a", "b"], lambda s: len(s) / 10)
+    layers = list(iter_nmlr_search(Candidate(state=""), "t", expand, [], scorer,
+                                   max_steps=10, beam_size=2, score_threshold=0.3))
+    assert len(layers) == 3
+    assert layers[-1].stop_reason == "score_threshold"
+
+def test_search_stops_on_plateau():
+    expand, scorer = _llm_like(["a"], lambda s: 0.5)
+    layers = list(iter_nmlr_search(Candidate(state=""), "t", expand, [], scorer,
+                                   max_steps=10, beam_size=1, patience=2))
+    assert len(layers) == 3
+    assert layers[-1].stop_reason == "plateau"
+
+def test_search_budget_returns_partial_results():
+    expand, scorer = _llm_like(["a", "b", "c"], lambda s: 0.5)
+    budget = Budget(max_calls=9)
+    results = nmlr_search(Candidate(state=""), "t", expand, [], scorer, max_steps=10, beam_size=3, budget=budget)
+    # layer 1: 1 expand + 3 scores; layer 2: 3 expands + 2 scores, then out of calls
+    assert [c.state for c in results] == ["a", "b", "c", "aa", "ab"]
+    assert budget.calls == 9
+
+def test_async_search_respects_budget():
+    expand, scorer = _llm_like(["a", "b"], lambda s: 0.5)
+    budget = Budget(max_calls=3)
+    results = asyncio.run(async_nmlr_search(Candidate(state=""), "t", expand, [], scorer,
+                                            max_steps=10, beam_size=2, concurrency=1, budget=budget))
+    assert [c.state for c in results] == ["a", "b"]
+    assert budget.calls == 3
+
+def test_estimate_cost_discounts_cached_input():
+    prices = {("anthropic", "m", "input"): 1.0, ("anthropic", "m", "output"): 0.0,
+              ("openai", "m", "input"): 1.0, ("openai", "m", "cached"): 0.25}
+    assert estimate_cost("anthropic", "m", {"input": 1000, "output": 0, "cached": 800}, prices) == pytest.approx(0.2 + 0.08)
+    assert estimate_cost("openai", "m", {"input": 2000, "output": 0, "cached": 1000}, prices) == pytest.approx(1.25)
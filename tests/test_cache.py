@@ -0,0 +1,99 @@
+import time
+from unittest.mock import Mock, patch
+from nmlr.cache import ResponseCache, CachedLLM
+from nmlr.llm_adapters import LLMResponse
+from nmlr.scoring import LLMEvaluator
+
+def test_response_cache_roundtrip_and_stats(tmp_path):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"))
+    key = ResponseCache.make_key(provider="openai", model="m", prompt="p")
+    assert cache.get(key) is None
+    cache.put(key, {"text": "hello"})
+    assert cache.get(key) == {"text": "hello"}
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+def test_response_cache_shared_between_connections(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    key = ResponseCache.make_key(prompt="p")
+    ResponseCache(path).put(key, [0.5, "ok"])
+    assert ResponseCache(path).get(key) == [0.5, "ok"]
+
+def test_response_cache_age_and_size_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), memory_size=1, max_entries=2, max_age=60)
+    for i in range(3):
+        cache.put(str(i), i)
+    cache.evict()
+    assert ResponseCache(cache.path).get("0") is None
+    assert cache.get("2") == 2
+
+    cache._memory.clear()
+    cache._conn.execute("UPDATE entries SET created = ?", (time.time() - 120,))
+    assert cache.get("2") is None
+
+def test_cached_llm_hits_and_bypass(tmp_path):
+    inner = Mock()
+    inner.provider = "openai"
+    inner.model = "m"
+    inner.complete.return_value = LLMResponse(text="out", token_usage={"input": 1, "output": 1})
+    llm = CachedLLM(inner, ResponseCache(str(tmp_path / "c.sqlite")))
+
+    assert llm.complete("p", system="s").text == "out"
+    assert llm.complete("p", system="s").text == "out"
+    assert inner.complete.call_count == 1
+    llm.complete("p", system="s", use_cache=False)
+    assert inner.complete.call_count == 2
+    llm.complete("p", system="other")
+    assert inner.complete.call_count == 3
+
+@patch('nmlr.scoring.get_llm')
+def test_llm_evaluator_uses_cache(mock_get_llm, tmp_path):
+    mock_llm = Mock()
+    mock_llm.complete.return_value = Mock(text='{"score": 0.8, "reason": "Good"}')
+    mock_get_llm.return_value = mock_llm
+    cache = ResponseCache(str(tmp_path / "c.sqlite"))
+
+    evaluator = LLMEvaluator(cache=cache)
+    assert evaluator("task", "cand") == (0.8, "Good")
+    assert evaluator("task", "cand") == (0.8, "Good")
+    assert evaluator.score_batch("task", ["cand"]) == [(0.8, "Good")]
+    assert mock_llm.complete.call_count == 1
+
+    evaluator("task", "cand", use_cache=False)
+    assert mock_llm.complete.call_count == 2
+    assert LLMEvaluator(cache=cache, rubric="other")("task", "cand") == (0.8, "Good")
+    assert mock_llm.complete.call_count == 3
+
+@patch('nmlr.scoring.get_llm')
+def test_llm_evaluator_keeps_batch_and_fallback_scores_out_of_the_cache(mock_get_llm, tmp_path):
+    mock_llm = Mock()
+    mock_llm.complete.return_value = Mock(text='[{"id": 1, "score": 0.2}, {"id": 2, "score": 0.4}]')
+    mock_get_llm.return_value = mock_llm
+    cache = ResponseCache(str(tmp_path / "c.sqlite"))
+    evaluator = LLMEvaluator(cache=cache)
+
+    assert [s for s, _ in evaluator.score_batch("task", ["a", "b"])] == [0.2, 0.4]
+    assert [s for s, _ in evaluator.score_batch("task", ["a", "b"])] == [0.2, 0.4]
+    assert mock_llm.complete.call_count == 1
+
+    mock_llm.complete.return_value = Mock(text='not json')
+    assert evaluator("task", "a") == (0.0, "unparseable")
+    mock_llm.complete.return_value = Mock(text='{"score": 0.9, "reason": "ok"}')
+    assert evaluator("task", "a") == (0.9, "ok")
+    assert mock_llm.complete.call_count == 3
+
+def test_cached_llm_sample_bypasses_cache(tmp_path):
+    inner = Mock()
+    inner.sample.return_value = [LLMResponse("x"), LLMResponse("y")]
+    llm = CachedLLM(inner, ResponseCache(str(tmp_path / "c.sqlite")))
+    assert [r.text for r in llm.sample("p", n=2)] == ["x", "y"]
+    inner.sample.assert_called_once_with("p", system=None, n=2)
+
+@patch('nmlr.llm_adapters._append_token_log')
+def test_cached_llm_keeps_logprob_scoring(mock_log, tmp_path):
+    from nmlr.offline import SimulatedLLM
+    inner = SimulatedLLM()
+    llm = CachedLLM(inner, ResponseCache(str(tmp_path / "c.sqlite")))
+    assert llm.supports_logprobs
+    assert llm.next_token_logprobs("Rate this", top=5) == inner.next_token_logprobs("Rate this", top=5)
+    evaluator = LLMEvaluator(mode="logprob", llm=llm)
+    assert 0.0 <= evaluator("t", "state")[0] <= 1.0
@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from nmlr.cascade import CascadeScorer, CascadeStage, state_scorer
+from nmlr.candidate import Candidate
+from nmlr.search import iter_nmlr_search, nmlr_search
+
+class _Judge:
+    def __init__(self):
+        self.seen = []
+
+    def score_batch(self, task, states):
+        self.seen.append(list(states))
+        return [(0.5 if "good" in s else 0.1, f"judged {s}") for s in states]
+
+    def __call__(self, task, state):
+        return self.score_batch(task, [state])[0]
+
+def _cascade(judge, keep=0.5):
+    return CascadeScorer([CascadeStage(state_scorer(lambda s: 1.0 - len(s) / 10), keep=keep),
+                          CascadeStage(judge, name="judge")])
+
+def test_only_survivors_reach_the_judge_and_scores_stay_comparable():
+    judge = _Judge()
+    states = ["good", "bad", "a long bad", "goodish", "x"]
+    scored = _cascade(judge).score_batch("t", states)
+    assert judge.seen == [["good", "bad", "x"]]
+    assert [s for s, _ in scored] == pytest.approx([0.75, 0.55, 0.0, 0.15, 0.55])
+    assert scored[0][1] == "judged good" and scored[2][1] == ""
+    assert min(scored[i][0] for i in (0, 1, 4)) > max(scored[i][0] for i in (2, 3))
+
+def test_single_state_runs_every_stage_and_calls_are_counted():
+    judge = _Judge()
+    cascade = _cascade(judge)
+    assert cascade("t", "good")[0] == pytest.approx(0.75)
+    cascade.score_batch("t", ["a", "b", "c", "d"])
+    assert cascade.calls == [5, 3]
+
+def test_async_cascade_matches_sync():
+    states = ["good", "bad", "a long bad", "goodish", "x"]
+    assert asyncio.run(_cascade(_Judge()).ascore_batch("t", states)) == _cascade(_Judge()).score_batch("t", states)
+
+def test_search_uses_cascade_batch():
+    judge = _Judge()
+    expand = lambda state: [("good", 0.0), ("bad idea", 0.0), ("good plan b", 0.0), ("meh", 0.0)]
+    nmlr_search(Candidate(""), "t", expand, [], _cascade(judge), max_steps=1, beam_size=4)
+    assert judge.seen == [["good", "meh"]]
+    with pytest.raises(ValueError):
+        CascadeStage(judge, keep=0.0)
+
+def test_search_beam_keeps_the_judges_survivors():
+    # "x" survives the length stage but its -1.0 local bonus is a penalty.
+    expand = lambda state: [("good", 0.0), ("bad idea", 0.0), ("good plan b", 0.0), ("meh", 0.0), ("x", -1.0)]
+    layers = list(iter_nmlr_search(Candidate(""), "t", expand, [], _cascade(_Judge(), keep=0.6),
+                                   max_steps=1, beam_size=2))
+    assert [c.state for c in layers[0].frontier] == ["good", "meh"]
+    assert layers[0].best.state == "good"
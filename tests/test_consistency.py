@@ -0,0 +1,44 @@
+import random
+from collections import Counter
+from nmlr.consistency import decided, majority_vote, self_consistency
+
+def _drawer(answers):
+    it = iter(answers)
+    waves = []
+
+    def draw(n):
+        waves.append(n)
+        return [next(it) for _ in range(n)]
+
+    return draw, waves
+
+def test_majority_vote_ties_go_to_first_seen_then_shortest():
+    assert majority_vote(["B", "a", "b ", "A."]) == "B"
+    assert majority_vote(["Yes ", "no", "yes"]) == "yes"
+
+def test_decided():
+    assert decided(Counter({"a": 3}), 2)
+    assert not decided(Counter({"a": 3}), 4)
+    assert decided(Counter({"a": 3, "b": 1}), 2)
+    assert not decided(Counter({"a": 3, "b": 1}), 3)
+
+def test_stops_once_leader_cannot_be_overtaken():
+    draw, waves = _drawer(["x", "x", "x", "y", "y"])
+    assert self_consistency(draw, 5) == ("x", ["x", "x", "x"])
+    assert waves == [3]
+
+def test_early_stop_matches_full_vote():
+    rng = random.Random(0)
+    for _ in range(300):
+        k = rng.randint(1, 9)
+        answers = [rng.choice("aabc") for _ in range(k)]
+        draw, _ = _drawer(answers)
+        pred, outs = self_consistency(draw, k)
+        assert outs == answers[:len(outs)]
+        assert pred == majority_vote(answers)
+
+def test_confidence_threshold_stops_early():
+    draw, _ = _drawer(["x", "x", "y", "x", "x", "y", "y", "y", "y"])
+    pred, outs = self_consistency(draw, 9, confidence=0.7, min_samples=3)
+    assert pred == "x"
+    assert len(outs) == 4
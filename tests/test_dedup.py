@@ -0,0 +1,45 @@
+from nmlr.candidate import Candidate
+from nmlr.dedup import Deduplicator, normalize
+from nmlr.search import nmlr_search
+from nmlr.tracing import Tracer
+
+def test_normalize_ignores_case_punctuation_and_spacing():
+    assert normalize("  The Butler, did it! ") == normalize("the butler did   it") == "the butler did it"
+
+def test_exact_duplicates_keep_highest_bonus():
+    states = ["Paris", "paris.", "London", "PARIS"]
+    assert Deduplicator(threshold=1.0).keep(states, [0.0, 0.2, 0.0, 0.1]) == [1, 2]
+
+def test_near_duplicates_collapse_above_threshold():
+    states = [
+        "The answer is that the butler committed the crime",
+        "The answer is that the butler committed the crime in the library",
+        "It was the gardener, acting alone",
+    ]
+    bonuses = [0.0, 0.0, 0.0]
+    assert Deduplicator(threshold=0.6).keep(states, bonuses) == [0, 2]
+    assert Deduplicator(threshold=0.95).keep(states, bonuses) == [0, 1, 2]
+
+def test_signatures_estimate_jaccard():
+    d = Deduplicator(num_perm=256)
+    sigs = d.signatures(["abcdefgh", "abcdefgh", "zyxwvuts"])
+    sim = d.similarity(sigs, slice(0, 3))
+    assert sim[0, 1] == 1.0
+    assert sim[0, 2] < 0.1
+
+def test_search_scores_each_distinct_child_once():
+    scored = []
+
+    def expand(state):
+        return [(state + " yes", 0.0), (state + " Yes!", 0.1), (state + " no", 0.0)]
+
+    def scorer(task, state):
+        scored.append(state)
+        return 0.0, ""
+
+    tracer = Tracer()
+    results = nmlr_search(Candidate(state="x"), "t", expand, [], scorer, max_steps=1, beam_size=8,
+                          dedup=Deduplicator(threshold=1.0), tracer=tracer)
+    assert scored == ["x Yes!", "x no"]
+    assert [c.state for c in results] == ["x no", "x Yes!"]
+    assert tracer.summary()[0]["dedup_s"] > 0
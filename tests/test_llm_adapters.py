@@ -1,6 +1,7 @@
+import asyncio
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-from nmlr.llm_adapters import get_llm, OpenAIClient, AnthropicClient, GeminiClient
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
+from nmlr.llm_adapters import LLM, LLMResponse, get_llm, configure_clients, OpenAIClient, AnthropicClient, GeminiClient
 
 @patch('openai.OpenAI')
 def test_get_llm_openai(mock_openai):
@@ -47,3 +48,136 @@ def test_openai_complete(mock_log, mock_openai):
     assert result.text == "Test response"
     assert result.token_usage == {"input": 10, "output": 5}
     mock_log.assert_called_once_with("openai", "gpt-4o-mini", {"input": 10, "output": 5})
+
+@patch('openai.AsyncOpenAI')
+@patch('openai.OpenAI')
+@patch('nmlr.llm_adapters._append_token_log')
+def test_openai_acomplete(mock_log, mock_openai, mock_async_openai):
+    mock_response = Mock()
+    mock_response.choices = [Mock()]
+    mock_response.choices[0].message.content = "Async response"
+    mock_response.usage = Mock()
+    mock_response.usage.prompt_tokens = 7
+    mock_response.usage.completion_tokens = 3
+    mock_async_client = Mock()
+    mock_async_client.chat.completions.create = AsyncMock(return_value=mock_response)
+    mock_async_openai.return_value = mock_async_client
+
+    llm = OpenAIClient(model="gpt-4o-mini")
+    result = asyncio.run(llm.acomplete("prompt", "system"))
+
+    assert result.text == "Async response"
+    assert result.token_usage == {"input": 7, "output": 3}
+    mock_openai.return_value.chat.completions.create.assert_not_called()
+
+@patch('openai.AsyncOpenAI')
+@patch('openai.OpenAI')
+def test_async_client_is_kept_per_event_loop(mock_openai, mock_async_openai):
+    mock_async_openai.side_effect = lambda **kwargs: Mock()
+    llm = OpenAIClient(model="gpt-4o-mini")
+
+    async def twice():
+        return llm.aclient, llm.aclient
+
+    first, again = asyncio.run(twice())
+    second, _ = asyncio.run(twice())
+    assert first is again
+    assert first is not second
+    assert mock_async_openai.call_count == 2
+
+@patch('openai.OpenAI')
+def test_get_llm_reuses_pooled_client(mock_openai):
+    a = get_llm(provider="openai", model="m")
+    b = get_llm(provider="OpenAI", model="m")
+    c = get_llm(provider="openai", model="other")
+    d = get_llm(provider="openai", model="m", reuse=False)
+
+    assert a is b
+    assert c is not a and d is not a
+    assert mock_openai.call_count == 3
+
+@patch('openai.OpenAI')
+def test_configure_clients_sets_timeout(mock_openai):
+    configure_clients(timeout=12.5)
+    try:
+        get_llm(provider="ollama")
+        assert mock_openai.call_args.kwargs["timeout"] == 12.5
+        assert mock_openai.call_args.kwargs["base_url"] == "http://localhost:11434/v1"
+    finally:
+        configure_clients()
+
+@patch('google.generativeai.GenerativeModel')
+def test_gemini_builds_model_once(mock_genai):
+    mock_genai.return_value.generate_content.return_value = Mock(
+        text="hi", usage_metadata={"prompt_token_count": 1, "candidates_token_count": 1})
+    llm = GeminiClient(model="gemini-test")
+    with patch('nmlr.llm_adapters._append_token_log'):
+        llm.complete("a")
+        llm.complete("b", system="s")
+    mock_genai.assert_called_once_with("gemini-test")
+    assert mock_genai.return_value.generate_content.call_count == 2
+
+@patch('openai.OpenAI')
+@patch('nmlr.llm_adapters._append_token_log')
+def test_openai_sample_uses_n_choices(mock_log, mock_openai):
+    resp = Mock()
+    resp.choices = [Mock(), Mock(), Mock()]
+    for i, choice in enumerate(resp.choices):
+        choice.message.content = f"answer {i}"
+    resp.usage.prompt_tokens = 10
+    resp.usage.completion_tokens = 30
+    mock_openai.return_value.chat.completions.create.return_value = resp
+
+    out = OpenAIClient(model="gpt-4o-mini").sample("prompt", "system", n=3)
+
+    assert [r.text for r in out] == ["answer 0", "answer 1", "answer 2"]
+    mock_openai.return_value.chat.completions.create.assert_called_once()
+    assert mock_openai.return_value.chat.completions.create.call_args.kwargs["n"] == 3
+    mock_log.assert_called_once_with("openai", "gpt-4o-mini", {"input": 10, "output": 30})
+
+def test_default_sample_runs_concurrent_completions():
+    llm = LLM()
+    llm.complete = Mock(side_effect=lambda prompt, system=None: LLMResponse(prompt))
+    assert [r.text for r in llm.sample("p", n=4)] == ["p"] * 4
+    assert llm.complete.call_count == 4
+
+@patch('anthropic.Anthropic')
+@patch('nmlr.llm_adapters._append_token_log')
+def test_anthropic_caches_system_prefix_and_reports_cached_tokens(mock_log, mock_anthropic):
+    resp = Mock()
+    resp.content = [Mock(text="ok")]
+    resp.usage = Mock(input_tokens=20, output_tokens=5, cache_read_input_tokens=900, cache_creation_input_tokens=0)
+    mock_anthropic.return_value.messages.create.return_value = resp
+
+    result = AnthropicClient().complete("candidate", system="rubric and task")
+
+    request = mock_anthropic.return_value.messages.create.call_args.kwargs
+    assert request["system"] == [{"type": "text", "text": "rubric and task", "cache_control": {"type": "ephemeral"}}]
+    assert result.token_usage == {"input": 920, "output": 5, "cached": 900}
+
+@patch('openai.OpenAI')
+@patch('nmlr.llm_adapters._append_token_log')
+def test_openai_reports_cached_prompt_tokens(mock_log, mock_openai):
+    resp = Mock()
+    resp.choices = [Mock()]
+    resp.choices[0].message.content = "ok"
+    resp.usage = Mock(prompt_tokens=1500, completion_tokens=5)
+    resp.usage.prompt_tokens_details.cached_tokens = 1024
+    mock_openai.return_value.chat.completions.create.return_value = resp
+
+    assert OpenAIClient().complete("p", "s").token_usage == {"input": 1500, "output": 5, "cached": 1024}
+
+@patch('openai.OpenAI')
+@patch('nmlr.llm_adapters._append_token_log')
+def test_openai_next_token_logprobs(mock_log, mock_openai):
+    first = Mock(token="8", logprob=-0.2)
+    first.top_logprobs = [Mock(token="8", logprob=-0.2), Mock(token="7", logprob=-1.8)]
+    resp = Mock()
+    resp.choices = [Mock()]
+    resp.choices[0].logprobs.content = [first]
+    resp.usage = Mock(prompt_tokens=100, completion_tokens=1)
+    mock_openai.return_value.chat.completions.create.return_value = resp
+
+    assert OpenAIClient().next_token_logprobs("p", "s", top=5) == {"8": -0.2, "7": -1.8}
+    request = mock_openai.return_value.chat.completions.create.call_args.kwargs
+    assert (request["max_tokens"], request["logprobs"], request["top_logprobs"]) == (1, True, 5)
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+import time
+from nmlr.candidate import Candidate
+from nmlr.lockstep import SearchJob, lockstep_search, run_lockstep
+from nmlr.search import nmlr_search
+
+def _job(task, steps=3):
+    expand = lambda state: [(state + "a", 0.0), (state + "b", 0.1)]
+    scorer = lambda t, state: (len(state) + (0.5 if t in state else 0.0), "")
+    return SearchJob(Candidate(""), task, expand, [], scorer, options={"max_steps": steps, "beam_size": 2})
+
+def test_results_match_independent_searches():
+    jobs = [_job("a"), _job("ab", steps=2), _job("b", steps=1)]
+    done = []
+    results = run_lockstep(jobs, on_done=lambda i, res: done.append(i))
+    for job, res in zip(jobs, results):
+        expected = nmlr_search(job.initial, job.task, job.expand_fn, job.verifiers, job.scorer, **job.options)
+        assert [(c.state, c.score) for c in res] == [(c.state, c.score) for c in expected]
+    assert done == [2, 1, 0]
+
+def test_each_wave_runs_every_open_search_concurrently():
+    in_flight, peak, lock = [0], [0], threading.Lock()
+
+    def expand(state):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        return [(state + "x", 0.0)]
+
+    jobs = [SearchJob(Candidate(""), str(i), expand, [], lambda t, s: (0.0, ""), options={"max_steps": 2})
+            for i in range(6)]
+    start = time.perf_counter()
+    run_lockstep(jobs)
+    assert peak[0] == 6
+    assert time.perf_counter() - start < 0.5
+
+def test_window_limits_open_searches():
+    jobs = [_job(str(i), steps=2) for i in range(5)]
+    started = []
+
+    async def main():
+        return await lockstep_search(jobs, window=2, on_done=lambda i, res: started.append(i))
+
+    results = asyncio.run(main())
+    assert started == [0, 1, 2, 3, 4]
+    assert all(len(r) == 4 for r in results)
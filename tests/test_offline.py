@@ -0,0 +1,85 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import Mock, patch
+from nmlr.llm_adapters import LLMResponse, get_llm
+from nmlr.offline import ReplayLLM, SimulatedLLM
+from nmlr.scoring import LLMEvaluator
+
+@patch('nmlr.llm_adapters._append_token_log')
+def test_replay_records_then_plays_back(mock_log, tmp_path):
+    path = str(tmp_path / "replay.jsonl")
+    upstream = Mock()
+    upstream.provider = "openai"
+    upstream.model = "real-model"
+    upstream.complete.side_effect = [LLMResponse("first", {"input": 3, "output": 1}),
+                                     LLMResponse("second", {"input": 3, "output": 2})]
+
+    recorder = ReplayLLM(path, mode="record", upstream=upstream)
+    recorder.complete("p", system="s")
+    recorder.complete("p", system="s")
+
+    player = ReplayLLM(path)
+    assert player.complete("p", system="s") == LLMResponse("first", {"input": 3, "output": 1})
+    assert asyncio.run(player.acomplete("p", system="s")) == LLMResponse("second", {"input": 3, "output": 2})
+    assert player.complete("p", system="s").text == "second"
+    with pytest.raises(LookupError):
+        player.complete("p", system="other")
+
+@patch('nmlr.llm_adapters._append_token_log')
+def test_auto_mode_records_new_samples_once_recordings_run_out(mock_log, tmp_path):
+    path = str(tmp_path / "replay.jsonl")
+    upstream = Mock(provider="openai", model="m")
+    upstream.complete.side_effect = [LLMResponse("a"), LLMResponse("b")]
+    ReplayLLM(path, mode="record", upstream=upstream).complete("p")
+
+    auto = ReplayLLM(path, mode="auto", upstream=upstream)
+    assert [auto.complete("p").text, auto.complete("p").text] == ["a", "b"]
+    assert upstream.complete.call_count == 2
+    player = ReplayLLM(path)
+    assert [player.complete("p").text, player.complete("p").text] == ["a", "b"]
+
+def test_replay_requires_upstream_to_record(tmp_path):
+    with pytest.raises(ValueError):
+        ReplayLLM(str(tmp_path / "r.jsonl"), mode="record")
+
+@patch('nmlr.llm_adapters._append_token_log')
+def test_simulated_is_deterministic(mock_log):
+    llm = SimulatedLLM(seed=1)
+    a = llm.complete("Propose alternatives", system="s")
+    assert a == SimulatedLLM(seed=1).complete("Propose alternatives", system="s")
+    assert a != SimulatedLLM(seed=2).complete("Propose alternatives", system="s")
+    assert len(a.text.splitlines()) == 3
+    assert a.token_usage["output"] >= 1
+
+@patch('nmlr.llm_adapters._append_token_log')
+def test_simulated_answers_scoring_prompts(mock_log):
+    with patch('nmlr.scoring.get_llm', return_value=SimulatedLLM()):
+        evaluator = LLMEvaluator()
+        score, reason = evaluator("task", "cand")
+        batch = evaluator.score_batch("task", ["a", "b", "c"])
+    assert 0.0 <= score <= 1.0 and reason == "simulated"
+    assert len(batch) == 3 and all(r == "simulated" for _, r in batch)
+
+@patch('nmlr.llm_adapters._append_token_log')
+def test_simulated_latency_overlaps_when_async(mock_log):
+    llm = SimulatedLLM(latency=0.05)
+
+    async def burst():
+        await asyncio.gather(*[llm.acomplete(f"p{i}") for i in range(10)])
+
+    t0 = time.perf_counter()
+    asyncio.run(burst())
+    assert time.perf_counter() - t0 < 0.3
+
+def test_get_llm_offline_providers(tmp_path, monkeypatch):
+    monkeypatch.setenv("NMLR_REPLAY_PATH", str(tmp_path / "r.jsonl"))
+    assert isinstance(get_llm(provider="simulated"), SimulatedLLM)
+    assert isinstance(get_llm(provider="replay"), ReplayLLM)
+
+def test_get_llm_replay_records_through_shared_upstream(tmp_path, monkeypatch):
+    monkeypatch.setenv("NMLR_REPLAY_PATH", str(tmp_path / "r.jsonl"))
+    monkeypatch.setenv("NMLR_REPLAY_MODE", "record")
+    monkeypatch.setenv("NMLR_REPLAY_UPSTREAM", "simulated")
+    llm = get_llm(provider="replay")
+    assert isinstance(llm, ReplayLLM) and llm.upstream is get_llm(provider="simulated")
@@ -1,5 +1,5 @@
 from nmlr.candidate import Candidate
-from nmlr.verifier import NonEmptyAnswer, NoContradiction, AlwaysTrue
+from nmlr.verifier import Verifier, VerifierPipeline, NonEmptyAnswer, NoContradiction, AlwaysTrue
 
 def test_non_empty():
     v = NonEmptyAnswer()
@@ -15,3 +15,62 @@ def test_always_true():
     v = AlwaysTrue()
     assert v.check(Candidate("anything"))
     assert v.check(Candidate(""))
+
+def test_check_many_matches_check():
+    cands = [Candidate(s) for s in ["ok", "", "  ", "A CONTRADICTION here", "contra", "x contradiction", "fine"]]
+    for v in (NonEmptyAnswer(), NoContradiction(), AlwaysTrue()):
+        assert v.check_many(cands) == [v.check(c) for c in cands]
+
+class CountingVerifier(Verifier):
+    def __init__(self, reject):
+        self.reject = reject
+        self.seen = []
+
+    def check(self, candidate) -> bool:
+        self.seen.append(candidate.state)
+        return candidate.state not in self.reject
+
+def test_pipeline_short_circuits_and_memoizes():
+    first = CountingVerifier({"a"})
+    second = CountingVerifier({"b"})
+    pipeline = VerifierPipeline([first, second])
+
+    verdicts = pipeline.check_many([Candidate(s) for s in ["a", "b", "c", "c"]])
+    assert verdicts == [False, False, True, True]
+    assert first.seen == ["a", "b", "c"]
+    assert second.seen == ["b", "c"]
+
+    assert pipeline.check(Candidate("b")) is False
+    assert first.seen == ["a", "b", "c"]
+
+def test_pipeline_orders_selective_verifiers_first():
+    lenient = CountingVerifier(set())
+    strict = CountingVerifier({str(i) for i in range(100)})
+    pipeline = VerifierPipeline([lenient, strict], memoize=False)
+    pipeline.check_many([Candidate(str(i)) for i in range(100)])
+    assert pipeline.order() == [strict, lenient]
+
+def test_search_never_scores_rejected_children():
+    from nmlr.search import nmlr_search
+
+    scored = []
+
+    def scorer(task, state):
+        scored.append(state)
+        return 0.5, "reason"
+
+    nmlr_search(Candidate(""), "t", lambda s: [("ok", 0.0), ("contradiction", 0.0), ("", 0.0)],
+                [NonEmptyAnswer(), NoContradiction()], scorer, max_steps=1)
+    assert scored == ["ok"]
+
+def test_search_does_not_memoize_plain_verifier_lists():
+    from nmlr.search import nmlr_search
+
+    class ShallowOnly(Verifier):
+        def check(self, candidate):
+            return candidate.depth < 2
+
+    # Every layer re-reaches the same state at a new depth.
+    results = nmlr_search(Candidate(""), "t", lambda s: [("same", 0.0)], [ShallowOnly()],
+                          lambda task, state: (0.5, ""), max_steps=3)
+    assert [c.depth for c in results] == [1]
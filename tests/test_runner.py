@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+import threading
+import time
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "experiments", "ambiguous_logic"))
+import runner  # noqa: E402
+from runner import load_done, run_dataset  # noqa: E402
+
+EXAMPLES = [{"id": f"q{i}", "prompt": str(i)} for i in range(6)]
+
+def _solve(ex):
+    return {"id": ex["id"], "pred": ex["prompt"]}
+
+def _rows(path):
+    with open(path) as f:
+        return [json.loads(ln) for ln in f]
+
+def test_rows_are_rewritten_in_dataset_order(tmp_path):
+    out = str(tmp_path / "out.jsonl")
+    rows = run_dataset(EXAMPLES, _solve, out, workers=4)
+    assert [r["id"] for r in rows] == [ex["id"] for ex in EXAMPLES]
+    assert _rows(out) == rows
+
+def test_resume_skips_done_ids_and_drops_truncated_tail(tmp_path):
+    out = str(tmp_path / "out.jsonl")
+    with open(out, "w") as w:
+        w.write(json.dumps({"id": "q3", "pred": "old"}) + "\n")
+        w.write('{"id": "q4", "pr')
+    assert list(load_done(out)) == ["q3"]
+    solved = []
+    rows = run_dataset(EXAMPLES, lambda ex: solved.append(ex["id"]) or _solve(ex), out)
+    assert solved == ["q0", "q1", "q2", "q4", "q5"]
+    assert rows[3] == {"id": "q3", "pred": "old"}
+    assert [r["id"] for r in _rows(out)] == [ex["id"] for ex in EXAMPLES]
+
+def test_crash_while_resuming_keeps_done_rows(tmp_path, monkeypatch):
+    out = str(tmp_path / "out.jsonl")
+    run_dataset(EXAMPLES[:3], _solve, out)
+    real_dumps, written = json.dumps, []
+
+    def dumps(row):
+        # Die after the first row of the resume rewrite.
+        if written:
+            raise KeyboardInterrupt
+        written.append(row)
+        return real_dumps(row)
+
+    monkeypatch.setattr(runner.json, "dumps", dumps)
+    with pytest.raises(KeyboardInterrupt):
+        run_dataset(EXAMPLES, _solve, out)
+    monkeypatch.undo()
+    assert list(load_done(out)) == ["q0", "q1", "q2"]
+
+def test_failure_keeps_finished_rows_and_cancels_the_rest(tmp_path):
+    out = str(tmp_path / "out.jsonl")
+    examples = [{"id": f"q{i}", "prompt": str(i)} for i in range(40)]
+    started = []
+    first_done = threading.Event()
+
+    def solve(ex):
+        started.append(ex["id"])
+        if ex["id"] == "q1":
+            first_done.wait(1)
+            raise RuntimeError("boom")
+        if ex["id"] == "q0":
+            first_done.set()
+        else:
+            time.sleep(0.05)
+        return _solve(ex)
+
+    with pytest.raises(RuntimeError):
+        run_dataset(examples, solve, out, workers=2)
+    assert len(started) < 10
+    assert "q0" in load_done(out)
+
+def test_solve_many_streams_rows(tmp_path):
+    out = str(tmp_path / "out.jsonl")
+
+    def solve_many(todo, record):
+        for ex in reversed(todo):
+            record(_solve(ex))
+
+    rows = run_dataset(EXAMPLES, None, out, solve_many=solve_many)
+    assert [r["id"] for r in rows] == [ex["id"] for ex in EXAMPLES]
@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+from unittest.mock import Mock
+from nmlr.scheduler import RequestScheduler, TokenBucket, classify_error
+
+class FakeAPIError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"status {status}")
+        self.status_code = status
+        self.response = Mock(status_code=status, headers=headers or {})
+
+class APITimeoutError(Exception):
+    pass
+
+def _scheduler(**kwargs):
+    scheduler = RequestScheduler(**kwargs)
+    scheduler.sleeps = []
+    scheduler._sleep = scheduler.sleeps.append
+
+    async def asleep(delay):
+        scheduler.sleeps.append(delay)
+
+    scheduler._asleep = asleep
+    return scheduler
+
+def test_classify_error():
+    assert classify_error(FakeAPIError(429, {"Retry-After": "7"})) == (True, 7.0)
+    assert classify_error(FakeAPIError(429, {"retry-after-ms": "250"})) == (True, 0.25)
+    assert classify_error(FakeAPIError(429, {"x-ratelimit-reset-requests": "1m30s"})) == (True, 90.0)
+    assert classify_error(FakeAPIError(503)) == (True, None)
+    assert classify_error(FakeAPIError(400)) == (False, None)
+    assert classify_error(FakeAPIError(401)) == (False, None)
+    assert classify_error(APITimeoutError()) == (True, None)
+    assert classify_error(ValueError("bad")) == (False, None)
+
+def test_classify_gemini_errors_by_code():
+    gexc = pytest.importorskip("google.api_core.exceptions")
+    assert classify_error(gexc.ResourceExhausted("quota")) == (True, None)
+    assert classify_error(gexc.InternalServerError("oops")) == (True, None)
+    assert classify_error(gexc.DeadlineExceeded("slow")) == (True, None)
+    assert classify_error(gexc.InvalidArgument("bad")) == (False, None)
+
+def test_gemini_rate_limit_halves_concurrency():
+    gexc = pytest.importorskip("google.api_core.exceptions")
+    scheduler = _scheduler(max_concurrency=8)
+    fn = Mock(side_effect=[gexc.ResourceExhausted("quota"), "ok"])
+    assert scheduler.call(fn) == "ok"
+    assert scheduler.limit == pytest.approx(4.0 + 1 / 4.0)
+
+def test_non_retryable_errors_are_raised_at_once():
+    scheduler = _scheduler()
+    fn = Mock(side_effect=FakeAPIError(400))
+    with pytest.raises(FakeAPIError):
+        scheduler.call(fn)
+    assert fn.call_count == 1
+    assert scheduler.sleeps == []
+
+def test_retry_after_is_honored_and_shared():
+    scheduler = _scheduler(max_concurrency=8)
+    fn = Mock(side_effect=[FakeAPIError(429, {"retry-after": "3"}), "ok"])
+    assert scheduler.call(fn) == "ok"
+    assert fn.call_count == 2
+    assert scheduler.sleeps[0] == 3.0
+    assert scheduler.paused_until > 0
+    assert scheduler.limit == pytest.approx(4.0 + 1 / 4.0)
+
+def test_gives_up_after_max_attempts():
+    scheduler = _scheduler(max_attempts=3)
+    fn = Mock(side_effect=FakeAPIError(500))
+    with pytest.raises(FakeAPIError):
+        scheduler.call(fn)
+    assert fn.call_count == 3
+    assert len(scheduler.sleeps) == 2
+
+def test_async_call_retries():
+    scheduler = _scheduler()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            raise FakeAPIError(529)
+        return "ok"
+
+    assert asyncio.run(scheduler.acall(fn)) == "ok"
+    assert len(calls) == 2
+
+def test_token_bucket_waits_when_empty():
+    bucket = TokenBucket(rate_per_minute=60)
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(30) == pytest.approx(30.0, abs=0.1)
+
+def test_rpm_limit_delays_requests():
+    scheduler = _scheduler(rpm=2)
+    for _ in range(3):
+        scheduler.call(lambda: "ok")
+    assert len(scheduler.sleeps) == 1
+    assert scheduler.sleeps[0] == pytest.approx(30.0, abs=0.1)
+
+def test_hold_keeps_slot_until_released():
+    scheduler = _scheduler(max_concurrency=2)
+    result, release = scheduler.hold(lambda: "stream")
+    assert (result, scheduler.in_flight) == ("stream", 1)
+    release()
+    release()
+    assert scheduler.in_flight == 0
@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import Mock, patch
-from nmlr.scoring import LLMEvaluator, blended_scorer, heuristic_len_penalty
+from nmlr.scoring import LLMEvaluator, BlendedScorer, blended_scorer, heuristic_len_penalty
 
 @patch('nmlr.scoring.get_llm')
 def test_llm_evaluator(mock_get_llm):
@@ -48,3 +48,97 @@ def test_heuristic_len_penalty():
     long_text = "a" * 600
     penalty = heuristic_len_penalty(long_text)
     assert penalty < 1.0  # Penalty applied
+
+@patch('nmlr.scoring.get_llm')
+def test_llm_evaluator_score_batch_single_call(mock_get_llm):
+    mock_llm = Mock()
+    mock_llm.complete.return_value = Mock(
+        text='[{"id": 1, "score": 0.2, "reason": "a"}, {"id": 2, "score": 0.9, "reason": "b"}, {"id": 3, "score": 1.5, "reason": "c"}]')
+    mock_get_llm.return_value = mock_llm
+
+    evaluator = LLMEvaluator()
+    scores = evaluator.score_batch("Is 7 prime?", ["x", "y", "z"])
+
+    assert scores == [(0.2, "a"), (0.9, "b"), (1.0, "c")]
+    mock_llm.complete.assert_called_once()
+    prompt = mock_llm.complete.call_args[0][0]
+    system = mock_llm.complete.call_args.kwargs["system"]
+    assert system.count("Is 7 prime?") == 1 and "Is 7 prime?" not in prompt
+    assert "[1] x" in prompt and "[3] z" in prompt
+    assert system == evaluator._system("Is 7 prime?", evaluator.batch_rubric)
+
+@patch('nmlr.scoring.get_llm')
+def test_llm_evaluator_score_batch_falls_back_for_missing_items(mock_get_llm):
+    mock_llm = Mock()
+    mock_llm.complete.side_effect = [
+        Mock(text='[{"id": 1, "score": 0.4, "reason": "first"}]'),
+        Mock(text='{"score": 0.6, "reason": "second"}'),
+    ]
+    mock_get_llm.return_value = mock_llm
+
+    evaluator = LLMEvaluator()
+    scores = evaluator.score_batch("task", ["x", "y"])
+
+    assert scores == [(0.4, "first"), (0.6, "second")]
+    assert mock_llm.complete.call_count == 2
+
+@patch('nmlr.scoring.get_llm')
+def test_llm_evaluator_score_batch_chunks(mock_get_llm):
+    mock_llm = Mock()
+    mock_llm.complete.return_value = Mock(text='[{"id": 1, "score": 0.5, "reason": ""}, {"id": 2, "score": 0.5, "reason": ""}]')
+    mock_get_llm.return_value = mock_llm
+
+    evaluator = LLMEvaluator(max_batch_size=2)
+    scores = evaluator.score_batch("task", ["a", "b", "c", "d"])
+
+    assert len(scores) == 4
+    assert mock_llm.complete.call_count == 2
+
+def test_blended_scorer_uses_batch():
+    evaluator = Mock()
+    evaluator.score_batch.return_value = [(0.8, "r1"), (0.0, "r2")]
+
+    scorer = BlendedScorer(evaluator)
+    scores = scorer.score_batch("task", ["short", ""])
+
+    assert scores[0][0] == pytest.approx(0.9 * 0.8 + 0.1 * 0.99)
+    assert scores[1] == (pytest.approx(0.1), "r2")
+    evaluator.assert_not_called()
+
+@patch('nmlr.scoring.get_llm')
+def test_llm_evaluator_parses_json_wrapped_in_prose(mock_get_llm):
+    mock_llm = Mock()
+    mock_llm.complete.return_value = Mock(text='Sure. {"score": 0.7, "reason": "plausible"} Hope that helps.')
+    mock_get_llm.return_value = mock_llm
+    assert LLMEvaluator()("task", "candidate") == (0.7, "plausible")
+
+@patch('nmlr.scoring.get_llm')
+def test_llm_evaluator_logprob_mode_expected_digit(mock_get_llm):
+    import math
+    mock_llm = Mock(supports_logprobs=True)
+    mock_llm.next_token_logprobs.return_value = {"9": math.log(0.5), " 0": math.log(0.25), "x": math.log(0.25)}
+    mock_get_llm.return_value = mock_llm
+
+    evaluator = LLMEvaluator(mode="logprob")
+    score, reason = evaluator("task", "candidate")
+
+    assert score == pytest.approx((9 * 0.5) / (9 * 0.75))
+    assert reason == ""
+    mock_llm.complete.assert_not_called()
+    assert evaluator.score_batch("task", ["a", "b"]) == [(pytest.approx(2 / 3), "")] * 2
+
+@patch('nmlr.scoring.get_llm')
+def test_llm_evaluator_logprob_mode_falls_back_to_json(mock_get_llm):
+    mock_llm = Mock(supports_logprobs=True)
+    mock_llm.next_token_logprobs.return_value = {"Yes": -0.1}
+    mock_llm.complete.return_value = Mock(text='{"score": 0.4, "reason": "r"}')
+    mock_get_llm.return_value = mock_llm
+    evaluator = LLMEvaluator(mode="logprob")
+    assert evaluator("task", "candidate") == (0.4, "r")
+    assert evaluator.explain("task", "candidate") == "r"
+
+@patch('nmlr.scoring.get_llm')
+def test_llm_evaluator_logprob_mode_needs_support(mock_get_llm):
+    mock_get_llm.return_value = Mock(supports_logprobs=False)
+    with pytest.raises(ValueError):
+        LLMEvaluator(mode="logprob")
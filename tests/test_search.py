@@ -1,6 +1,9 @@
+import asyncio
+import threading
+import time
 import pytest
 from unittest.mock import Mock, patch
-from nmlr.search import nmlr_search
+from nmlr.search import nmlr_search, async_nmlr_search, iter_nmlr_search, aiter_nmlr_search
 from nmlr.candidate import Candidate
 from nmlr.verifier import NonEmptyAnswer, NoContradiction
 
@@ -52,3 +55,147 @@ def test_nmlr_search_no_expansion():
     results = nmlr_search(initial, "test", mock_expand, verifiers, mock_scorer, max_steps=1, beam_size=1)
     
     assert len(results) == 0
+
+def test_async_nmlr_search_matches_serial():
+    def mock_expand(state):
+        return [(state + "a", 0.1), (state + "b", 0.2), (state + "c", 0.0)]
+
+    def mock_scorer(task, state):
+        return len(state) * 0.1 + (0.05 if state.endswith("b") else 0.0), "reason"
+
+    verifiers = [NonEmptyAnswer(), NoContradiction()]
+    serial = nmlr_search(Candidate(state="x"), "t", mock_expand, verifiers, mock_scorer, max_steps=3, beam_size=2)
+    concurrent = asyncio.run(async_nmlr_search(Candidate(state="x"), "t", mock_expand, verifiers, mock_scorer,
+                                               max_steps=3, beam_size=2, concurrency=4))
+
+    assert [c.state for c in concurrent] == [c.state for c in serial]
+    assert [c.score for c in concurrent] == [c.score for c in serial]
+
+def test_async_nmlr_search_runs_layer_concurrently():
+    in_flight = 0
+    peak = 0
+
+    async def slow_expand(state):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return [(state + "a", 0.0), (state + "b", 0.0), (state + "c", 0.0)]
+
+    async def scorer(task, state):
+        await asyncio.sleep(0.01)
+        return 0.5, "reason"
+
+    results = asyncio.run(async_nmlr_search(Candidate(state="x"), "t", slow_expand, [], scorer,
+                                            max_steps=2, beam_size=3, concurrency=2))
+
+    assert len(results) == 6
+    assert peak == 2
+
+def test_async_search_runs_sync_calls_up_to_concurrency():
+    # asyncio's default executor has at most 32 threads.
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+
+    def scorer(task, state):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.2)
+        with lock:
+            in_flight -= 1
+        return 0.5, "reason"
+
+    expand = lambda state: [(f"{state}{i}", 0.0) for i in range(64)]
+    asyncio.run(async_nmlr_search(Candidate(state="x"), "t", expand, [], scorer,
+                                  max_steps=1, beam_size=4, concurrency=64))
+    assert peak == 64
+
+def test_nmlr_search_uses_score_batch():
+    class BatchScorer:
+        def __init__(self):
+            self.batches = []
+
+        def __call__(self, task, state):
+            raise AssertionError("per-item scoring should not be used")
+
+        def score_batch(self, task, states):
+            self.batches.append(list(states))
+            return [(0.1 * len(s), "reason") for s in states]
+
+    def mock_expand(state):
+        return [(state + "a", 0.0), (state + "bb", 0.0)]
+
+    scorer = BatchScorer()
+    results = nmlr_search(Candidate(state="x"), "t", mock_expand, [NonEmptyAnswer()], scorer, max_steps=2, beam_size=2)
+
+    assert len(scorer.batches) == 2
+    assert scorer.batches[0] == ["xa", "xbb"]
+    assert [c.state for c in results[:2]] == ["xa", "xbb"]
+
+def test_top_k_matches_stable_sort():
+    import random
+    from nmlr.search import _TopK
+
+    rng = random.Random(0)
+    items = [(rng.randint(0, 5), i) for i in range(200)]
+    for k in (0, 1, 7, 200, 300):
+        for reverse in (False, True):
+            top = _TopK(k, key=lambda it: it[0], reverse=reverse)
+            for it in items:
+                top.push(it)
+            assert top.items() == sorted(items, key=lambda it: it[0], reverse=reverse)[:k]
+
+def test_nmlr_search_max_results_keeps_global_best():
+    def mock_expand(state):
+        return [(state + "a", 0.0), (state + "bb", 0.0), (state + "ccc", 0.0)]
+
+    def mock_scorer(task, state):
+        return float(len(state)), "reason"
+
+    unbounded = nmlr_search(Candidate(state=""), "t", mock_expand, [], mock_scorer, max_steps=3, beam_size=2)
+    bounded = nmlr_search(Candidate(state=""), "t", mock_expand, [], mock_scorer, max_steps=3, beam_size=2, max_results=3)
+
+    assert len(unbounded) == 6
+    assert [c.score for c in bounded] == sorted((c.score for c in unbounded), reverse=True)[:3]
+
+def test_iter_nmlr_search_yields_layers_and_stops_early():
+    calls = []
+
+    def mock_expand(state):
+        calls.append(state)
+        return [(state + "a", 0.0), (state + "bb", 0.0)]
+
+    def mock_scorer(task, state):
+        return float(len(state)), "reason"
+
+    layers = []
+    for layer in iter_nmlr_search(Candidate(state=""), "t", mock_expand, [], mock_scorer, max_steps=5, beam_size=2):
+        layers.append(layer)
+        if layer.step == 1:
+            break
+
+    assert [layer.step for layer in layers] == [0, 1]
+    assert [c.state for c in layers[0].frontier] == ["a", "bb"]
+    assert layers[1].best.state == "abb"
+    assert len(calls) == 3  # root + two layer-1 nodes; layer 2 never expanded
+
+    full = nmlr_search(Candidate(state=""), "t", mock_expand, [], mock_scorer, max_steps=2, beam_size=2)
+    assert [c.state for c in full] == [c.state for layer in layers for c in layer.frontier]
+
+def test_aiter_nmlr_search_yields_layers():
+    def mock_expand(state):
+        return [(state + "a", 0.0)]
+
+    def mock_scorer(task, state):
+        return 0.5, "reason"
+
+    async def collect():
+        return [layer async for layer in aiter_nmlr_search(Candidate(state=""), "t", mock_expand, [], mock_scorer,
+                                                            max_steps=3, beam_size=1)]
+
+    layers = asyncio.run(collect())
+    assert [layer.frontier[0].state for layer in layers] == ["a", "aa", "aaa"]
@@ -0,0 +1,116 @@
+from unittest.mock import Mock, patch
+from nmlr.cache import CachedLLM, ResponseCache
+from nmlr.llm_adapters import GeminiClient, LLM, LLMResponse, OpenAIClient
+from nmlr.offline import SimulatedLLM
+from nmlr.scheduler import get_scheduler
+from nmlr.streaming import stop_after_lines, stop_after_marker
+from nmlr.tracing import Tracer
+
+def test_stop_after_lines_counts_complete_non_empty_lines():
+    stop = stop_after_lines(2)
+    assert stop("one\n\n") is None
+    assert stop("one\n\ntwo") is None
+    assert stop("one\n\ntwo\nthree") == len("one\n\ntwo")
+
+def test_stop_after_marker_waits_for_answer_line():
+    stop = stop_after_marker("Answer:")
+    assert stop("Step 1\nStep 2\n") is None
+    assert stop("Step 1\nAnswer: Paris") is None
+    assert stop("Step 1\nAnswer: Paris\nbecause") == len("Step 1\nAnswer: Paris")
+    assert stop("Answer:\n\n") is None
+    assert stop("Answer:\n\nParis\nmore") == len("Answer:\n\nParis")
+
+class _Streaming(LLM):
+    provider = "fake"
+    model = "m"
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.sent = 0
+        self.closed = False
+
+    def stream(self, prompt, system=None):
+        try:
+            for chunk in self.chunks:
+                self.sent += 1
+                yield chunk
+        finally:
+            self.closed = True
+
+def test_complete_until_closes_stream_once_stop_fires():
+    llm = _Streaming(["a\nb", "\nc\n", "d\n", "e\n"])
+    tracer = Tracer()
+    with tracer.span("run"):
+        resp = llm.complete_until("p", stop=stop_after_lines(2))
+    assert resp.text == "a\nb"
+    assert (llm.sent, llm.closed) == (2, True)
+    assert tracer.events[0]["stopped_early"] is True
+
+def test_complete_until_without_streaming_truncates_full_completion():
+    llm = LLM()
+    llm.complete = Mock(return_value=LLMResponse("x\ny\nz\n"))
+    assert llm.complete_until("p", stop=stop_after_lines(1)).text == "x"
+
+@patch('openai.OpenAI')
+@patch('nmlr.llm_adapters._append_token_log')
+def test_openai_stream_closes_and_estimates_usage(mock_log, mock_openai):
+    def chunk(text):
+        c = Mock(usage=None)
+        c.choices = [Mock()]
+        c.choices[0].delta.content = text
+        return c
+
+    scheduler = get_scheduler("openai")
+    held = []
+
+    def chunks():
+        for text in ("1\n", "2\n", "3\n", "4\n"):
+            held.append(scheduler.in_flight)
+            yield chunk(text)
+
+    stream = Mock()
+    stream.__iter__ = Mock(return_value=chunks())
+    mock_openai.return_value.chat.completions.create.return_value = stream
+
+    resp = OpenAIClient(model="gpt-4o-mini").complete_until("prompt", stop=stop_after_lines(2))
+
+    assert resp.text == "1\n2"
+    assert held and all(n == 1 for n in held)
+    assert scheduler.in_flight == 0
+    assert resp.token_usage == mock_log.call_args.args[2]
+    assert mock_openai.return_value.chat.completions.create.call_args.kwargs["stream"] is True
+    stream.close.assert_called_once()
+    provider, model, usage = mock_log.call_args.args
+    assert (provider, model, usage["output"]) == ("openai", "gpt-4o-mini", 1)
+
+@patch('google.generativeai.GenerativeModel')
+@patch('nmlr.llm_adapters._append_token_log')
+def test_gemini_stream_cancels_transport_on_early_stop(mock_log, mock_model):
+    resp = Mock()
+    resp.__iter__ = Mock(return_value=iter([Mock(text=t, usage_metadata=None) for t in ("1\n", "2\n", "3\n", "4\n")]))
+    mock_model.return_value.generate_content.return_value = resp
+
+    assert GeminiClient(model="gemini-test").complete_until("prompt", stop=stop_after_lines(2)).text == "1\n2"
+    resp._iterator.cancel.assert_called_once()
+    assert get_scheduler("gemini").in_flight == 0
+
+@patch('nmlr.llm_adapters._append_token_log')
+def test_simulated_stream_bills_only_streamed_lines(mock_log):
+    llm = SimulatedLLM(lines=4, output_tokens=(40, 0))
+    assert llm.complete_until("Propose", stop=stop_after_lines(1)).text == llm.complete("Propose").text.splitlines()[0]
+    assert mock_log.call_args_list[0].args[2]["output"] == 10
+
+def test_complete_until_returns_usage_in_both_paths():
+    streamed = SimulatedLLM(lines=4, output_tokens=(40, 0))
+    assert streamed.complete_until("Propose", stop=stop_after_lines(1)).token_usage["output"] == 10
+    llm = LLM()
+    llm.complete = Mock(return_value=LLMResponse("x\ny\n", token_usage={"input": 3, "output": 2}))
+    assert llm.complete_until("p", stop=stop_after_lines(1)).token_usage == {"input": 3, "output": 2}
+
+def test_cached_complete_until_keys_on_stop_condition(tmp_path):
+    inner = _Streaming(["a\n", "b\n", "c\n"])
+    llm = CachedLLM(inner, ResponseCache(str(tmp_path / "c.sqlite")))
+    assert llm.complete_until("p", stop=stop_after_lines(1)).text == "a"
+    inner.chunks = ["x\n", "y\n"]
+    assert llm.complete_until("p", stop=stop_after_lines(1)).text == "a"
+    assert llm.complete_until("p", stop=stop_after_lines(2)).text == "x\ny"
@@ -11,3 +11,20 @@ def test_history_list():
     c = Candidate("x")
     d = c.extend("y", 0.0)
     assert isinstance(d.history, list)
+
+def test_history_follows_parent_chain():
+    c = Candidate("a")
+    d = c.extend("b", 0.0).extend("c", 0.0)
+    assert d.history == ["a", "b"]
+    assert d.depth == 2
+    assert d.parent.state == "b"
+
+def test_explicit_history_is_kept():
+    c = Candidate("c", history=["a", "b"])
+    d = c.extend("d", 1.0)
+    assert c.history == ["a", "b"]
+    assert d.history == ["a", "b", "c"]
+    assert d.depth == 3
+
+def test_candidate_has_no_instance_dict():
+    assert not hasattr(Candidate("x"), "__dict__")
@@ -0,0 +1,103 @@
+import asyncio
+import json
+from unittest.mock import Mock, patch
+from nmlr.candidate import Candidate
+from nmlr.llm_adapters import OpenAIClient
+from nmlr.offline import SimulatedLLM
+from nmlr.scheduler import configure_scheduler
+from nmlr.search import async_nmlr_search, nmlr_search
+from nmlr.tracing import Tracer, span
+
+def _search_fns(llm):
+    def expand(state):
+        llm.complete("Propose")
+        return [(state + "a", 0.0), (state + "b", 0.0)]
+
+    def scorer(task, state):
+        llm.complete("Return JSON")
+        return len(state) / 10, "reason"
+
+    return expand, scorer
+
+def test_span_is_noop_without_tracer():
+    with span("llm", provider="openai") as s:
+        s.set(input=1)
+    assert Tracer().events == []
+
+@patch('nmlr.llm_adapters._append_token_log')
+def test_search_records_phase_spans_and_layer_summary(mock_log):
+    expand, scorer = _search_fns(SimulatedLLM())
+    tracer = Tracer()
+    nmlr_search(Candidate(state=""), "t", expand, [], scorer, max_steps=2, beam_size=2, tracer=tracer)
+
+    names = [ev["name"] for ev in tracer.events]
+    assert names.count("layer") == 2
+    assert names.count("expand") == 1 + 2
+    assert names.count("verify") == 2
+    assert names.count("score") == 2 + 4
+    assert names.count("llm") == 3 + 6
+
+    by_id = {ev["id"]: ev for ev in tracer.events}
+    llm = [ev for ev in tracer.events if ev["name"] == "llm"]
+    assert {by_id[ev["parent"]]["name"] for ev in llm} == {"expand", "score"}
+    assert all(ev["provider"] == "simulated" and ev["retries"] == 0 and ev["output"] >= 1 for ev in llm)
+
+    summary = tracer.summary()
+    assert [row["layer"] for row in summary] == [0, 1]
+    assert [row["llm_calls"] for row in summary] == [3, 6]
+    assert summary[1]["input_tokens"] == sum(ev["input"] for ev in llm if ev["layer"] == 1)
+    assert summary[0]["wall_s"] >= summary[0]["expand_s"]
+
+@patch('nmlr.llm_adapters._append_token_log')
+def test_async_search_inherits_active_span(mock_log):
+    expand, scorer = _search_fns(SimulatedLLM())
+    tracer = Tracer()
+
+    async def run():
+        with tracer.span("run"):
+            await async_nmlr_search(Candidate(state=""), "t", expand, [], scorer, max_steps=2, beam_size=2)
+
+    asyncio.run(run())
+    llm = [ev for ev in tracer.events if ev["name"] == "llm"]
+    assert len(llm) == 9
+    assert {ev["layer"] for ev in llm} == {0, 1}
+
+@patch('openai.OpenAI')
+@patch('nmlr.llm_adapters._append_token_log')
+def test_llm_span_counts_retries(mock_log, mock_openai):
+    class RateLimited(Exception):
+        status_code = 429
+
+    resp = Mock()
+    resp.choices = [Mock()]
+    resp.choices[0].message.content = "ok"
+    resp.usage.prompt_tokens = 10
+    resp.usage.completion_tokens = 5
+    mock_openai.return_value.chat.completions.create.side_effect = [RateLimited(), resp]
+    scheduler = configure_scheduler("openai", base_delay=0.0)
+    scheduler._sleep = lambda s: None
+
+    tracer = Tracer()
+    with tracer.span("run"):
+        OpenAIClient(model="gpt-4o-mini").complete("prompt")
+    llm = tracer.events[0]
+    assert (llm["name"], llm["model"], llm["retries"], llm["input"], llm["output"]) == ("llm", "gpt-4o-mini", 1, 10, 5)
+    configure_scheduler("openai")
+
+@patch('nmlr.llm_adapters._append_token_log')
+def test_trace_exports(mock_log, tmp_path):
+    expand, scorer = _search_fns(SimulatedLLM())
+    seen = []
+    tracer = Tracer(callback=seen.append)
+    nmlr_search(Candidate(state=""), "t", expand, [], scorer, max_steps=1, beam_size=2, tracer=tracer)
+    assert seen == tracer.events
+
+    tracer.export_jsonl(str(tmp_path / "trace.jsonl"))
+    with open(tmp_path / "trace.jsonl") as f:
+        assert [json.loads(ln)["name"] for ln in f] == [ev["name"] for ev in tracer.events]
+
+    tracer.export_chrome(str(tmp_path / "trace.json"))
+    with open(tmp_path / "trace.json") as f:
+        trace = json.load(f)["traceEvents"]
+    assert len(trace) == len(tracer.events)
+    assert all(ev["ph"] == "X" and ev["dur"] >= 0 for ev in trace)
@@ -0,0 +1,64 @@
+import asyncio
+from collections import Counter
+from nmlr.candidate import Candidate
+from nmlr.search import async_nmlr_search, nmlr_search
+from nmlr.transposition import TranspositionTable, memoize_expand
+
+GRAPH = {"": ["a", "b", "a"], "a": ["b", "c"], "b": ["a", "c"], "c": ["a", "d"], "d": []}
+
+def _expand(calls):
+    def expand_fn(state):
+        calls[state] += 1
+        return [(s, 0.0) for s in GRAPH[state]]
+    return expand_fn
+
+def _scorer(calls):
+    def scorer(task, state):
+        calls[state] += 1
+        return 0.0, ""
+    return scorer
+
+def test_filter_keeps_highest_bonus_and_drops_seen_states():
+    table = TranspositionTable()
+    table.add_root("")
+    children = [(Candidate("a"), 0.0), (Candidate(""), 0.0), (Candidate("a"), 0.5), (Candidate("b"), 0.0)]
+    kept = table.filter(children)
+    assert [(c.state, b) for c, b in kept] == [("a", 0.5), ("b", 0.0)]
+    assert table.filter([(Candidate("b"), 1.0), (Candidate("c"), 0.0)])[0][0].state == "c"
+    assert table.collapsed == 3
+
+def test_search_scores_and_expands_each_state_once():
+    expands, scores = Counter(), Counter()
+    results = nmlr_search(Candidate(""), "t", _expand(expands), [], _scorer(scores),
+                          max_steps=4, beam_size=8, transpositions=True)
+    assert set(expands.values()) == {1} and set(scores.values()) == {1}
+    assert sorted(c.state for c in results) == ["a", "b", "c", "d"]
+    assert next(c for c in results if c.state == "d").history == ["", "a", "c"]
+
+def test_async_search_matches_sync_with_transpositions():
+    expands = Counter()
+    sync = nmlr_search(Candidate(""), "t", _expand(Counter()), [], _scorer(Counter()),
+                       max_steps=4, transpositions=True)
+    res = asyncio.run(async_nmlr_search(Candidate(""), "t", _expand(expands), [], _scorer(Counter()),
+                                        max_steps=4, transpositions=True))
+    assert [c.state for c in res] == [c.state for c in sync]
+    assert set(expands.values()) == {1}
+
+def test_memoize_expand_evicts_least_recently_used():
+    calls = Counter()
+    expand_fn = memoize_expand(_expand(calls), maxsize=2)
+    for state in ["a", "b", "a", "c", "b"]:
+        assert expand_fn(state) == [(s, 0.0) for s in GRAPH[state]]
+    assert calls == Counter({"a": 1, "b": 2, "c": 1})
+    assert expand_fn.cache_info() == {"hits": 1, "misses": 4, "size": 2, "maxsize": 2}
+
+def test_memoize_expand_wraps_async_functions():
+    calls = Counter()
+
+    async def expand_fn(state):
+        calls[state] += 1
+        return [(state + "!", 0.0)]
+
+    memo = memoize_expand(expand_fn)
+    assert asyncio.run(memo("x")) == asyncio.run(memo("x")) == [("x!", 0.0)]
+    assert calls["x"] == 1
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from nmlr.candidate import Candidate
+from nmlr.scoring import blended_scorer, heuristic_len_penalty
+from nmlr.search import nmlr_search
+from nmlr.vectorized import (Blend, KeywordFeature, LengthPenalty, RegexFeature, as_scorer,
+                             from_scalar, length_blend)
+
+STATES = ["The butler did it", "x" * 600, "", "It was the Gardener, 42 times"]
+
+def test_length_penalty_matches_scalar_heuristic():
+    assert LengthPenalty()("t", STATES) == pytest.approx([heuristic_len_penalty(s) for s in STATES])
+
+def test_keyword_and_regex_features():
+    assert KeywordFeature(["butler", "gardener"])("t", STATES).tolist() == [0.5, 0.0, 0.0, 0.5]
+    assert KeywordFeature(["Gardener"], case_sensitive=True)("t", STATES).tolist() == [0.0, 0.0, 0.0, 1.0]
+    assert RegexFeature(r"\d+")("t", STATES).tolist() == [0.0, 0.0, 0.0, 1.0]
+
+def test_length_blend_matches_blended_scorer():
+    llm_eval = lambda task, state: (len(state) % 3 / 2, "r")
+    expected = [blended_scorer("t", s, llm_eval)[0] for s in STATES]
+    assert length_blend(llm_eval)("t", STATES) == pytest.approx(expected)
+    assert Blend([], [])("t", []).shape == (0,)
+    with pytest.raises(ValueError):
+        Blend([LengthPenalty()], [0.5, 0.5])
+
+def test_from_scalar_prefers_score_batch():
+    class Batched:
+        def score_batch(self, task, states):
+            return [(float(len(s)), "") for s in states]
+    assert from_scalar(Batched())("t", ["ab", "c"]).tolist() == [2.0, 1.0]
+
+def test_adapter_scores_search_layers_in_one_call():
+    calls = []
+
+    def array_scorer(task, states):
+        calls.append(len(states))
+        return np.arange(len(states), dtype=float)
+
+    expand = lambda state: [("a", 0.0), ("b", 0.5)]
+    results = nmlr_search(Candidate(""), "t", expand, [], as_scorer(array_scorer), max_steps=1, beam_size=2)
+    assert calls == [2]
+    assert [(c.state, c.score) for c in results] == [("a", 0.0), ("b", 1.5)]